@@ -76,9 +76,10 @@ class Plotting:
         total_rotation = np.radians(earths_rotation_rate * time_elapsed)
 
         # The point on the earth which is where that collision point would be equal to.
-        # Connecting a non rotating reference frame to earths actual ref. frame
-        point_on_earth[0] = x_sphere * np.cos(total_rotation) - y_sphere * np.sin(total_rotation)
-        point_on_earth[1] = x_sphere * np.cos(total_rotation) + y_sphere * np.cos(total_rotation)
+        # Connecting a non rotating reference frame to earths actual ref. frame, which has
+        # turned (eastward) by total_rotation since they lined up, so the point is rotated back.
+        point_on_earth[0] = x_sphere * np.cos(total_rotation) + y_sphere * np.sin(total_rotation)
+        point_on_earth[1] = -x_sphere * np.sin(total_rotation) + y_sphere * np.cos(total_rotation)
         point_on_earth[2] = z_sphere
 
         r = np.linalg.norm(point_on_earth)
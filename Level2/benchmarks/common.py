@@ -0,0 +1,71 @@
+
+import subprocess
+import time
+
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from src.config.configuration_manager import ConfigurationManager
+from src.spacecraft import Spacecraft
+from src.planet import Planet
+from src.physics import Physics
+
+
+LEVEL2_DIRECTORY = Path(__file__).resolve().parent.parent
+CONFIG_PATH = LEVEL2_DIRECTORY / "config" / "config.yaml"
+
+
+def load_config(**integrator_settings) -> ConfigurationManager:
+    """
+    The Level 2 config file, with any integrator settings (type, fast_path, ...) overridden.
+    """
+    config = ConfigurationManager(CONFIG_PATH)
+    for name, value in integrator_settings.items():
+        setattr(config.simulation.integrator, name, value)
+
+    return config
+
+
+def build(config: ConfigurationManager) -> Tuple[Spacecraft, Planet, Physics]:
+    """
+    The spacecraft, planet and physics objects of a single run.
+    """
+    spacecraft = Spacecraft(config.spacecraft)
+    planet = Planet(config.planet)
+    physics = Physics(config.physics, planet, spacecraft)
+
+    return spacecraft, planet, physics
+
+
+def rate(function: Callable[[], object], repeats: int) -> float:
+    """
+    How many times per second function() runs, best of 3.
+    """
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            function()
+        best = min(best, time.perf_counter() - start)
+
+    return repeats / best
+
+
+def wall_time(function: Callable[[], object]) -> float:
+    """
+    How long (seconds) one call of function() takes.
+    """
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def current_commit() -> Optional[str]:
+    """
+    The git commit the code is at, if it is in a git repository.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=LEVEL2_DIRECTORY,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,289 @@
+# Level 2 - accuracy versus cost of the integrator settings
+
+# Sweeps the step size (RK4) and the tolerances (DOPRI45) on two cases, and reports the error
+# against a trusted solution next to the wall time as a Pareto table:
+#
+#   vacuum: the Level 1 case (no atmosphere), run by Level 1 itself and by the Level 2 integrators,
+#           against the analytic two-body (Kepler) solution. Energy should be conserved exactly.
+#   drag:   the Level 2 config file case, against a DOPRI45 run with very tight tolerances.
+#
+# so the cheapest settings that still meet a landing accuracy budget can be picked, instead of
+# guessing a time_step_size.
+#
+# Run from the Level2 directory with:  python -m benchmarks.convergence [--quick] [--budget 10]
+
+
+import argparse
+import json
+import subprocess
+import sys
+
+import numpy as np
+import yaml
+
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.kepler import propagate
+from src.planet import GRAVITATIONAL_CONSTANT
+from src.simulation import Simulation
+
+from .common import build, load_config, wall_time
+from .suite import LEVEL1_DIRECTORY
+
+
+# The settings swept. RK4 steps are seconds, DOPRI45 settings are relative tolerances
+# (the absolute tolerance is kept at relative * 1 m, the size of the smallest error of interest).
+VACUUM_STEPS = [400, 200, 100, 50, 20, 10]
+DRAG_STEPS = [1.0, 0.5, 0.2, 0.1, 0.05, 0.02, 0.01]
+TOLERANCES = [1e-4, 1e-5, 1e-6, 1e-7, 1e-8, 1e-9, 1e-10]
+
+# The settings of the reference solution of the drag case
+REFERENCE_TOLERANCE = 1e-12
+REFERENCE_MAX_STEP = 1.0
+
+
+@dataclass
+class ConvergenceResult:
+    """
+    One run of the sweep.
+
+    Attributes:
+        case (str): "vacuum" or "drag".
+        solver (str): which code and integrator did the run (e.g. "Level2 RK4").
+        setting (str): the step size or tolerance it was run with.
+        steps (int): accepted integrator steps.
+        seconds (float): wall time of the run.
+        position_error (float): meters from the reference final (landing) position.
+        time_error (float): seconds from the reference landing time (zero for the vacuum case,
+            which runs to a fixed end time).
+        energy_error (float): relative error of the final specific orbital energy. For the vacuum
+            case this is the energy drift (it should stay at its initial value), for the drag
+            case the difference from the reference.
+        pareto (bool): whether no other run of the case is both faster and more accurate.
+    """
+    case: str
+    solver: str
+    setting: str
+    steps: int
+    seconds: float
+    position_error: float
+    time_error: float
+    energy_error: float
+    pareto: bool = False
+
+
+def specific_energy(position: np.ndarray, velocity: np.ndarray, mu: float) -> float:
+    return 0.5 * float(np.dot(velocity, velocity)) - mu / float(np.linalg.norm(position))
+
+
+def run_level2(config, configure: Callable) -> Dict[str, object]:
+    """
+    One Level 2 run of the given config, after letting configure(config) change the settings.
+    """
+    configure(config)
+    spacecraft, planet, physics = build(config)
+    simulation = Simulation(config.simulation, spacecraft=spacecraft, planet=planet, physics=physics)
+
+    seconds = wall_time(simulation.run)
+
+    return {"seconds": seconds,
+            "steps": simulation.integrator.accepted_steps,
+            "time": float(simulation.get_times()[-1]),
+            "position": spacecraft.position.copy(),
+            "velocity": spacecraft.velocity.copy()}
+
+
+def integrator_settings(steps: List[float], tolerances: List[float]):
+    """
+    The (solver, setting, configure function) of every integrator setting in the sweep.
+    """
+    for step in steps:
+        def configure(config, step=step):
+            config.simulation.integrator.type = "RK4"
+            config.simulation.time_step_size = step
+        yield "Level2 RK4", f"dt={step:g}", configure
+
+    for tolerance in tolerances:
+        def configure(config, tolerance=tolerance):
+            config.simulation.integrator.type = "DOPRI45"
+            config.simulation.integrator.relative_tolerance = tolerance
+            config.simulation.integrator.absolute_tolerance = tolerance
+        yield "Level2 DOPRI45", f"rtol={tolerance:g}", configure
+
+
+# Level 1 has its own `src` package, so it runs in a separate interpreter from its own directory.
+# It is handed the step sizes and prints one JSON line per run.
+LEVEL1_SCRIPT = """
+import json, sys, time
+from src.config.configuration_manager import ConfigurationManager
+from src.spacecraft import Spacecraft
+from src.planet import Planet
+from src.simulation import Simulation
+
+for step in json.loads(sys.argv[1]):
+    config = ConfigurationManager("config/config.yaml")
+    config.simulation.time_step_size = step
+    spacecraft = Spacecraft(config.spacecraft)
+    simulation = Simulation(config.simulation, spacecraft=spacecraft, planet=Planet(config.planet))
+    start = time.perf_counter()
+    simulation.run()
+    seconds = time.perf_counter() - start
+    print(json.dumps({"step": step, "seconds": seconds, "steps": len(simulation.get_times()),
+                      "time": float(simulation.get_times()[-1]),
+                      "position": spacecraft.position.tolist(), "velocity": spacecraft.velocity.tolist()}))
+"""
+
+
+def run_level1(steps: List[float]) -> List[dict]:
+    """
+    Runs the Level 1 simulation with each of the step sizes (nothing if Level 1 isnt there).
+    """
+    if not LEVEL1_DIRECTORY.is_dir():
+        return []
+
+    output = subprocess.run([sys.executable, "-c", LEVEL1_SCRIPT, json.dumps(steps)], cwd=LEVEL1_DIRECTORY,
+                            capture_output=True, text=True, check=True).stdout
+
+    return [json.loads(line) for line in output.splitlines() if line.startswith("{")]
+
+
+def vacuum_case(quick: bool) -> List[ConvergenceResult]:
+    """
+    The Level 1 initial state with no atmosphere, over the Level 1 end time, against the
+    analytic Kepler solution. Its run by Level 1 and by the Level 2 integrators (with drag off).
+    """
+    with open(LEVEL1_DIRECTORY / "config" / "config.yaml") as f:
+        level1_config = yaml.safe_load(f)
+
+    initial_position = np.array(level1_config["spacecraft"]["initial_state"]["position"], dtype=float)
+    initial_velocity = np.array(level1_config["spacecraft"]["initial_state"]["velocity"], dtype=float)
+    mu = GRAVITATIONAL_CONSTANT * float(level1_config["planet"]["mass"])
+    initial_energy = specific_energy(initial_position, initial_velocity, mu)
+
+    steps = VACUUM_STEPS[:4] if quick else VACUUM_STEPS
+    tolerances = TOLERANCES[:4] if quick else TOLERANCES
+
+    def result(solver, setting, run):
+        exact_position, _ = propagate(initial_position, initial_velocity, run["time"], mu)
+        energy = specific_energy(np.asarray(run["position"]), np.asarray(run["velocity"]), mu)
+        return ConvergenceResult("vacuum", solver, setting, run["steps"], run["seconds"],
+                                 float(np.linalg.norm(np.asarray(run["position"]) - exact_position)),
+                                 0.0, abs(energy / initial_energy - 1))
+
+    results = [result("Level1 RK4", f"dt={run['step']:g}", run) for run in run_level1(steps)]
+
+    def vacuum(config):
+        config.spacecraft.position = initial_position.tolist()
+        config.spacecraft.velocity = initial_velocity.tolist()
+        config.planet.mass = float(level1_config["planet"]["mass"])
+        config.planet.radius = float(level1_config["planet"]["radius"])
+        config.physics.include_drag = False
+        config.simulation.coast.enabled = False
+        config.simulation.start_time = 0
+        config.simulation.end_time = level1_config["simulation"]["end_time"]
+
+    for solver, setting, configure in integrator_settings(steps, tolerances):
+        run = run_level2(load_config(), lambda config: (vacuum(config), configure(config)))
+        results.append(result(solver, setting, run))
+
+    return results
+
+
+def drag_case(quick: bool) -> List[ConvergenceResult]:
+    """
+    The Level 2 config file case (with drag), down to the landing, against a tight tolerance
+    DOPRI45 reference.
+    """
+    def reference_settings(config):
+        config.simulation.integrator.type = "DOPRI45"
+        config.simulation.integrator.relative_tolerance = REFERENCE_TOLERANCE
+        config.simulation.integrator.absolute_tolerance = REFERENCE_TOLERANCE
+        config.simulation.integrator.max_step_size = REFERENCE_MAX_STEP
+
+    config = load_config()
+    mu = GRAVITATIONAL_CONSTANT * config.planet.mass
+    reference = run_level2(config, reference_settings)
+    reference_energy = specific_energy(reference["position"], reference["velocity"], mu)
+
+    steps = DRAG_STEPS[:5] if quick else DRAG_STEPS
+    tolerances = TOLERANCES[:4] if quick else TOLERANCES
+
+    results = []
+    for solver, setting, configure in integrator_settings(steps, tolerances):
+        run = run_level2(load_config(), configure)
+        energy = specific_energy(run["position"], run["velocity"], mu)
+        results.append(ConvergenceResult("drag", solver, setting, run["steps"], run["seconds"],
+                                         float(np.linalg.norm(run["position"] - reference["position"])),
+                                         abs(run["time"] - reference["time"]), abs(energy / reference_energy - 1)))
+
+    return results
+
+
+def mark_pareto(results: List[ConvergenceResult]) -> None:
+    """
+    Flags the runs no other run of the same case beats on both wall time and position error.
+    """
+    for result in results:
+        result.pareto = not any(other.case == result.case and
+                                other.seconds <= result.seconds and other.position_error <= result.position_error and
+                                (other.seconds < result.seconds or other.position_error < result.position_error)
+                                for other in results)
+
+
+def cheapest_within(results: List[ConvergenceResult], case: str, budget: float) -> Optional[ConvergenceResult]:
+    """
+    The fastest run of the case with a position error within the budget (meters).
+    """
+    candidates = [result for result in results if result.case == case and result.position_error <= budget]
+    return min(candidates, key=lambda result: result.seconds, default=None)
+
+
+def print_table(results: List[ConvergenceResult], case: str) -> None:
+
+    print(f"\n{case} case, fastest first (* = Pareto optimal)")
+    print(f"  {'solver':16}{'setting':14}{'steps':>9}{'wall time (s)':>15}{'position error (m)':>20}{'time error (s)':>16}{'energy error':>14}")
+    for result in sorted((result for result in results if result.case == case), key=lambda result: result.seconds):
+        print(f"{'*' if result.pareto else ' '} {result.solver:16}{result.setting:14}{result.steps:9d}"
+              f"{result.seconds:15.4f}{result.position_error:20.4g}{result.time_error:16.3g}{result.energy_error:14.3g}")
+
+
+CASES = {"vacuum": vacuum_case, "drag": drag_case}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    parser = argparse.ArgumentParser(description="Accuracy versus cost of the integrator settings")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--quick", action="store_true", help="leave out the smallest steps and tolerances")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="landing accuracy budget (meters): also report the cheapest settings that meet it")
+    parser.add_argument("--output", type=Path, default=None, help="also write the results to this JSON file")
+    arguments = parser.parse_args(argv)
+
+    results: List[ConvergenceResult] = []
+    for case in arguments.cases:
+        results += CASES[case](arguments.quick)
+    mark_pareto(results)
+
+    for case in arguments.cases:
+        print_table(results, case)
+
+        if arguments.budget is not None:
+            cheapest = cheapest_within(results, case, arguments.budget)
+            if cheapest is None:
+                print(f"  Nothing met the {arguments.budget:g} m budget.")
+            else:
+                print(f"  Cheapest within {arguments.budget:g} m: {cheapest.solver} {cheapest.setting} "
+                      f"({cheapest.seconds:.4f} s, {cheapest.position_error:.3g} m)")
+
+    if arguments.output is not None:
+        with open(arguments.output, "w") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# Level 2 - benchmark of the single spacecraft fast path
+
+# Times the acceleration evaluations, the RK4 steps and a whole simulation with the regular
+# array path and with the float fast path (integrator fast_path option), and checks that
+# both give bit-for-bit the same trajectory.
+#
+# Run from the Level2 directory with:  python -m benchmarks.fast_path
+
+
+import time
+
+import numpy as np
+
+from src.integrators import create_integrator
+from src.simulation import Simulation
+
+from .common import build, load_config, rate
+
+
+def main():
+
+    results = {}
+    for fast_path in (False, True):
+        config = load_config(type="RK4", fast_path=fast_path)
+        spacecraft, planet, physics = build(config)
+        integrator = create_integrator(config.simulation.integrator,
+                                       physics.get_acceleration,
+                                       physics.get_acceleration_components if physics.has_fast_path() else None)
+
+        position = spacecraft.position
+        velocity = spacecraft.velocity
+        dt = config.simulation.time_step_size
+
+        evaluations = rate(lambda: integrator.evaluate(position, velocity), 20000)
+        steps = rate(lambda: integrator.step(position, velocity, dt), 5000)
+
+        simulation = Simulation(config.simulation, spacecraft=spacecraft, planet=planet, physics=physics)
+        start = time.perf_counter()
+        simulation.run()
+        run_time = time.perf_counter() - start
+        simulation_steps = simulation.integrator.accepted_steps
+
+        results[fast_path] = (evaluations, steps, simulation_steps / run_time, simulation.get_trajectory().copy())
+
+    reference, fast = results[False], results[True]
+
+    print(f"{'':28}{'array path':>14}{'fast path':>14}{'speedup':>10}")
+    for i, name in enumerate(["acceleration evaluations/s", "RK4 steps/s", "simulation steps/s"]):
+        print(f"{name:28}{reference[i]:14.0f}{fast[i]:14.0f}{fast[i] / reference[i]:9.2f}x")
+
+    identical = reference[3].shape == fast[3].shape and np.array_equal(reference[3], fast[3])
+    print(f"Trajectories bit-for-bit identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
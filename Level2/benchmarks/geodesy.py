@@ -0,0 +1,145 @@
+# Level 2 - benchmark of the vectorized impact latitude/longitude conversion
+
+# Checks geodesy.impact_latitude_longitude against points whose latitude and longitude can be
+# worked out by hand (e.g. the +x axis is at longitude 0 when the frames line up and at -90
+# degrees a quarter turn of the Earth later) and the geodetic latitude against points put on
+# the WGS 84 ellipsoid at known latitudes, then times the conversion of 1M impact points
+# against a one point at a time loop with scalar trig.
+#
+# Run from the Level2 directory with:  python -m benchmarks.geodesy [--points 1000000]
+
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from src.geodesy import (EARTH_ROTATION_RATE, WGS84_FLATTENING, WGS84_SEMI_MAJOR_AXIS,
+                         impact_latitude_longitude)
+
+
+def single_point(position: np.ndarray, time_elapsed: float):
+    """
+    The scalar conversion of one point, the loop the vectorized conversion is timed against.
+    """
+    rotation = EARTH_ROTATION_RATE * time_elapsed
+    x = position[0] * math.cos(rotation) + position[1] * math.sin(rotation)
+    y = -position[0] * math.sin(rotation) + position[1] * math.cos(rotation)
+    z = position[2]
+
+    latitude = math.asin(z / math.sqrt(x**2 + y**2 + z**2))
+    longitude = math.atan2(y, x)
+
+    return math.degrees(latitude), math.degrees(longitude)
+
+
+def random_impacts(points: int, rng: np.random.Generator):
+    """
+    Random points on the surface of a spherical Earth and random flight times.
+    """
+    directions = rng.normal(size=(points, 3))
+    positions = 6371000 * directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    times = rng.uniform(0.0, 3000.0, points)
+
+    return positions, times
+
+
+# Seconds for the Earth to turn a quarter of the way round
+QUARTER_TURN = 0.5 * np.pi / EARTH_ROTATION_RATE
+
+# (position, time, obliquity, latitude, longitude) of points worked out by hand. The Earth
+# turns eastward under the simulation frame, so a fixed point of the frame drifts west.
+KNOWN_POINTS = [([6371000.0, 0.0, 0.0], 0.0, 0.0, 0.0, 0.0),
+                ([0.0, 6371000.0, 0.0], 0.0, 0.0, 0.0, 90.0),
+                ([6371000.0, 0.0, 0.0], QUARTER_TURN, 0.0, 0.0, -90.0),
+                ([0.0, 6371000.0, 0.0], QUARTER_TURN, 0.0, 0.0, 0.0),
+                ([6371000.0, 0.0, 0.0], 2 * QUARTER_TURN, 0.0, 0.0, 180.0),
+                ([0.0, -6371000.0, 0.0], 3 * QUARTER_TURN, 0.0, 0.0, 0.0),
+                ([4505000.0, 0.0, 4505000.0], 0.0, 0.0, 45.0, 0.0),
+                ([0.0, 4505000.0, -4505000.0], QUARTER_TURN, 0.0, -45.0, 0.0),
+                ([0.0, 0.0, 6371000.0], 1234.5, 0.0, 90.0, None),
+                # The pole of the ecliptic is 90 - 23.5 degrees up, over longitude -90 at time 0
+                ([0.0, 0.0, 6371000.0], 0.0, 23.5, 66.5, -90.0)]
+
+
+def check_known_points() -> float:
+    """
+    Largest difference (degrees) from the hand worked KNOWN_POINTS, converting them one at a
+    time and all in one array.
+    """
+    worst = 0.0
+    for obliquity in sorted({point[2] for point in KNOWN_POINTS}):
+        points = [point for point in KNOWN_POINTS if point[2] == obliquity]
+        positions = np.array([point[0] for point in points])
+        times = np.array([point[1] for point in points])
+
+        latitudes, longitudes = impact_latitude_longitude(positions, times, obliquity=obliquity)
+        for i, (position, time_elapsed, _, latitude, longitude) in enumerate(points):
+            single_latitude, single_longitude = impact_latitude_longitude(np.array(position), time_elapsed,
+                                                                          obliquity=obliquity)
+            for found_latitude, found_longitude in [(latitudes[i], longitudes[i]), (single_latitude, single_longitude)]:
+                worst = max(worst, abs(found_latitude - latitude))
+                # The longitude of a pole is undefined, and 180 is the same as -180
+                if longitude is not None:
+                    worst = max(worst, abs((found_longitude - longitude + 180.0) % 360.0 - 180.0))
+
+    return float(worst)
+
+
+def check_geodetic(rng: np.random.Generator, points: int = 10000) -> float:
+    """
+    Largest error (degrees) of the geodetic latitude of points at known geodetic latitudes
+    and heights above the WGS 84 ellipsoid.
+    """
+    latitudes = rng.uniform(-90.0, 90.0, points)
+    longitudes = rng.uniform(-180.0, 180.0, points)
+    heights = rng.uniform(-10000.0, 100000.0, points)
+
+    eccentricity_squared = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+    latitude, longitude = np.radians(latitudes), np.radians(longitudes)
+    prime_vertical_radius = WGS84_SEMI_MAJOR_AXIS / np.sqrt(1 - eccentricity_squared * np.sin(latitude)**2)
+    positions = np.stack([(prime_vertical_radius + heights) * np.cos(latitude) * np.cos(longitude),
+                          (prime_vertical_radius + heights) * np.cos(latitude) * np.sin(longitude),
+                          (prime_vertical_radius * (1 - eccentricity_squared) + heights) * np.sin(latitude)], axis=1)
+
+    found, _ = impact_latitude_longitude(positions, 0.0, geodetic=True)
+    return float(np.max(np.abs(found - latitudes)))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--points", type=int, default=1000000, help="impact points to convert")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    print(f"Largest error at the hand worked points: {check_known_points():.2e} deg")
+    print(f"Largest geodetic latitude error: {check_geodetic(rng):.2e} deg\n")
+
+    positions, times = random_impacts(args.points, rng)
+
+    start = time.perf_counter()
+    impact_latitude_longitude(positions, times)
+    vectorized = time.perf_counter() - start
+
+    start = time.perf_counter()
+    impact_latitude_longitude(positions, times, geodetic=True)
+    geodetic = time.perf_counter() - start
+
+    # The one point at a time loop is timed on a slice and scaled up
+    sample = min(args.points, 20000)
+    start = time.perf_counter()
+    for position, time_elapsed in zip(positions[:sample], times[:sample]):
+        single_point(position, time_elapsed)
+    loop = (time.perf_counter() - start) * args.points / sample
+
+    print(f"{args.points} points:")
+    print(f"  one point at a time      {loop:8.3f} s")
+    print(f"  vectorized (geocentric)  {vectorized:8.3f} s   {loop / vectorized:6.1f}x")
+    print(f"  vectorized (geodetic)    {geodetic:8.3f} s   {loop / geodetic:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
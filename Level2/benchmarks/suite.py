@@ -0,0 +1,300 @@
+# Level 2 - performance benchmark suite
+
+# Times the hot functions (micro benchmarks), whole single runs of the Level 1 and Level 2
+# configs (end to end) and the ensemble throughput at 1, 100 and 10k members, entirely offline.
+# Every run is appended to a JSON history file and compared against the previous entry, so
+# a regression between commits shows up straight away.
+#
+# Run from the Level2 directory with:  python -m benchmarks.suite [--quick] [--groups micro ensemble ...]
+
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.batch_simulation import BatchSimulation
+from src.events import StepInterpolant
+from src.geodesy import impact_latitude_longitude
+from src.integrators import create_integrator
+from src.physics import Physics
+from src.planet import Planet
+from src.simulation import Simulation
+from src.spacecraft import SpacecraftEnsemble
+
+from .common import LEVEL2_DIRECTORY, build, current_commit, load_config, rate, wall_time
+from .geodesy import random_impacts
+
+
+LEVEL1_DIRECTORY = LEVEL2_DIRECTORY.parent / "Level1"
+DEFAULT_HISTORY = LEVEL2_DIRECTORY / "benchmarks" / "history.json"
+
+# Slowdown (as a fraction) from the previous entry that gets flagged as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+@dataclass
+class Measurement:
+    """
+    One benchmark result. Units ending in "/s" are rates (higher is better), anything
+    else is a duration or a cost (lower is better).
+    """
+    value: float
+    unit: str
+
+    @property
+    def higher_is_better(self) -> bool:
+        return self.unit.endswith("/s")
+
+
+# The groups of benchmarks that can be run, each a function (quick) -> {name: Measurement}
+BENCHMARK_GROUPS: Dict[str, Callable[[bool], Dict[str, Measurement]]] = {}
+
+
+def benchmark_group(name: str):
+    """
+    Decorator adding a group of benchmarks to BENCHMARK_GROUPS.
+    """
+    def decorator(function):
+        BENCHMARK_GROUPS[name] = function
+        return function
+    return decorator
+
+
+@benchmark_group("micro")
+def micro_benchmarks(quick: bool) -> Dict[str, Measurement]:
+    """
+    Calls per second of the functions every integrator step goes through.
+    """
+    repeats = 2000 if quick else 20000
+    results = {}
+
+    config = load_config(type="RK4")
+    spacecraft, planet, physics = build(config)
+    position = spacecraft.position.copy()
+    velocity = spacecraft.velocity.copy()
+    dt = config.simulation.time_step_size
+
+    results["planet.calculate_gravity"] = Measurement(rate(lambda: planet.calculate_gravity(position), repeats), "calls/s")
+    results["density exponential_decay"] = Measurement(rate(lambda: planet.get_atmospheric_density(position), repeats), "calls/s")
+
+    config.planet.atmospheric_model = "us_standard_1976"
+    tabulated_planet = Planet(config.planet)
+    results["density us_standard_1976"] = Measurement(
+        rate(lambda: tabulated_planet.get_atmospheric_density(position), repeats), "calls/s")
+
+    results["physics.get_acceleration"] = Measurement(
+        rate(lambda: physics.get_acceleration(position, velocity), repeats), "calls/s")
+    state = (*position.tolist(), *velocity.tolist())
+    results["physics.get_acceleration_components"] = Measurement(
+        rate(lambda: physics.get_acceleration_components(*state), repeats), "calls/s")
+
+    # One step of each integrator
+    for name, settings in [("RK4 step (arrays)", dict(type="RK4", fast_path=False)),
+                           ("RK4 step (fast path)", dict(type="RK4", fast_path=True)),
+                           ("DOPRI45 step", dict(type="DOPRI45"))]:
+        step_config = load_config(**settings)
+        _, _, step_physics = build(step_config)
+        integrator = create_integrator(step_config.simulation.integrator,
+                                       step_physics.get_acceleration,
+                                       step_physics.get_acceleration_components)
+        results[name] = Measurement(rate(lambda: integrator.step(position, velocity, dt), repeats // 4), "steps/s")
+
+    # Looking for the events of the config file within one step (that no event happens in)
+    simulation = Simulation(config.simulation, spacecraft=spacecraft, planet=planet, physics=physics)
+    result = simulation.integrator.step(position, velocity, dt)
+    acceleration = physics.get_acceleration(position, velocity)
+    interpolant = StepInterpolant(0.0, dt, position, velocity, acceleration, result.position, result.velocity,
+                                  physics.get_acceleration(result.position, result.velocity))
+    results["event location"] = Measurement(rate(lambda: simulation._locate_events(interpolant), repeats // 4), "steps/s")
+
+    # The vectorized acceleration of a large ensemble, per member
+    members = 1000 if quick else 10000
+    ensemble = SpacecraftEnsemble.from_config(config.spacecraft, members)
+    ensemble_physics = Physics(config.physics, planet, ensemble)
+    ensemble_rate = rate(lambda: ensemble_physics.get_acceleration(ensemble.position, ensemble.velocity), 20)
+    results[f"ensemble get_acceleration ({members} members)"] = Measurement(ensemble_rate * members, "members/s")
+
+    # Impact latitude/longitude of a whole dispersions worth of landings at once
+    points = 100000 if quick else 1000000
+    impacts, impact_times = random_impacts(points, np.random.default_rng(0))
+    results[f"impact_latitude_longitude ({points} points)"] = Measurement(
+        rate(lambda: impact_latitude_longitude(impacts, impact_times), 1) * points, "points/s")
+
+    return results
+
+
+@benchmark_group("end_to_end")
+def end_to_end_benchmarks(quick: bool) -> Dict[str, Measurement]:
+    """
+    Whole single runs of the Level 2 config (with both integrators) and of the Level 1 config.
+    """
+    results = {}
+
+    for name, settings in [("Level2 RK4", dict(type="RK4")), ("Level2 DOPRI45", dict(type="DOPRI45"))]:
+        config = load_config(**settings)
+        if quick and settings["type"] == "RK4":
+            config.simulation.time_step_size = 0.1
+        spacecraft, planet, physics = build(config)
+        simulation = Simulation(config.simulation, spacecraft=spacecraft, planet=planet, physics=physics)
+
+        seconds = wall_time(simulation.run)
+        results[f"{name} run"] = Measurement(seconds, "s")
+        results[f"{name} steps"] = Measurement(simulation.integrator.accepted_steps / seconds, "steps/s")
+
+    level1 = run_level1()
+    if level1 is not None:
+        results["Level1 run"] = Measurement(level1["seconds"], "s")
+        results["Level1 steps"] = Measurement(level1["steps"] / level1["seconds"], "steps/s")
+
+    return results
+
+
+# Level 1 has its own `src` package, so it is timed in a separate interpreter from its own directory
+LEVEL1_SCRIPT = """
+import json, time
+from src.config.configuration_manager import ConfigurationManager
+from src.spacecraft import Spacecraft
+from src.planet import Planet
+from src.simulation import Simulation
+
+config = ConfigurationManager("config/config.yaml")
+simulation = Simulation(config.simulation, spacecraft=Spacecraft(config.spacecraft), planet=Planet(config.planet))
+start = time.perf_counter()
+simulation.run()
+print(json.dumps({"seconds": time.perf_counter() - start, "steps": len(simulation.get_times())}))
+"""
+
+
+def run_level1() -> Optional[dict]:
+    """
+    Times one run of the Level 1 simulation. Nothing if Level 1 isnt next to Level 2.
+    """
+    if not LEVEL1_DIRECTORY.is_dir():
+        return None
+
+    output = subprocess.run([sys.executable, "-c", LEVEL1_SCRIPT], cwd=LEVEL1_DIRECTORY,
+                            capture_output=True, text=True, check=True).stdout
+
+    # The result is the last line, anything before it is Level 1s own printing
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@benchmark_group("ensemble")
+def ensemble_benchmarks(quick: bool) -> Dict[str, Measurement]:
+    """
+    Trajectories per second of BatchSimulation (adaptive, so the ensemble shares its steps)
+    with 1, 100 and 10k members, each with a slightly different initial velocity.
+    """
+    results = {}
+    rng = np.random.default_rng(0)
+
+    for members in (1, 100, 1000 if quick else 10000):
+        config = load_config(type="DOPRI45")
+        ensemble = SpacecraftEnsemble.from_config(config.spacecraft, members)
+        ensemble.velocity += rng.normal(0.0, 50.0, ensemble.velocity.shape)
+
+        planet = Planet(config.planet)
+        physics = Physics(config.physics, planet, ensemble)
+        simulation = BatchSimulation(config.simulation, ensemble, planet, physics)
+
+        seconds = wall_time(simulation.run)
+        results[f"ensemble {members} members"] = Measurement(members / seconds, "trajectories/s")
+
+    return results
+
+
+def load_history(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_history(path: Path, history: List[dict]) -> None:
+    with open(path, "w") as f:
+        json.dump(history, f, indent=2)
+
+
+def previous_results(history: List[dict], name: str, quick: bool) -> Optional[Measurement]:
+    """
+    The most recent result of a benchmark in the history (from a run of the same size).
+    """
+    for entry in reversed(history):
+        if entry["quick"] == quick and name in entry["results"]:
+            return Measurement(**entry["results"][name])
+    return None
+
+
+def report(results: Dict[str, Measurement], history: List[dict], quick: bool,
+           threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """
+    Prints the results next to the previous ones, and returns the names of the benchmarks
+    that got slower by more than the threshold (a fraction).
+    """
+    regressions = []
+
+    print(f"{'benchmark':48}{'result':>16}  {'unit':16}{'previous':>14}{'change':>10}")
+    for name, measurement in results.items():
+        previous = previous_results(history, name, quick)
+
+        line = f"{name:48}{measurement.value:16.6g}  {measurement.unit:16}"
+        if previous is not None and previous.value > 0:
+            change = measurement.value / previous.value - 1
+            slowdown = -change if measurement.higher_is_better else change
+            flag = "  REGRESSION" if slowdown > threshold else ""
+            line += f"{previous.value:14.6g}{change:+10.1%}{flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+
+    parser = argparse.ArgumentParser(description="Level 2 performance benchmark suite")
+    parser.add_argument("--groups", nargs="+", choices=list(BENCHMARK_GROUPS), default=list(BENCHMARK_GROUPS),
+                        help="which groups of benchmarks to run (all of them by default)")
+    parser.add_argument("--quick", action="store_true", help="smaller problem sizes, for a fast check")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="JSON file the results are added to")
+    parser.add_argument("--no-history", action="store_true", help="dont read or write the history file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown (fraction) from the previous entry reported as a regression")
+    parser.add_argument("--label", default="", help="note stored with this entry in the history")
+    arguments = parser.parse_args(argv)
+
+    results: Dict[str, Measurement] = {}
+    for group in arguments.groups:
+        results.update(BENCHMARK_GROUPS[group](arguments.quick))
+
+    history = [] if arguments.no_history else load_history(arguments.history)
+    regressions = report(results, history, arguments.quick, arguments.threshold)
+
+    if not arguments.no_history:
+        history.append({"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                        "commit": current_commit(),
+                        "label": arguments.label,
+                        "quick": arguments.quick,
+                        "python": platform.python_version(),
+                        "numpy": np.__version__,
+                        "machine": platform.machine(),
+                        "results": {name: asdict(measurement) for name, measurement in results.items()}})
+        save_history(arguments.history, history)
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) more than {arguments.threshold:.0%} slower than the previous entry.")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,48 +4,55 @@
 # Date started: 02 December 2024
 
 
-import yaml
+import argparse
 
+from pathlib import Path
 
-from src.spacecraft import Spacecraft
-from src.planet import Planet
-from src.simulation import Simulation
+from src.cache import ResultCache, run_simulation
 from src.plotting import Plotting
-from src.physics import Physics
 
 from src.config.configuration_manager import ConfigurationManager
+from src.config.overrides import parse_assignment
+
+
+LEVEL_DIRECTORY = Path(__file__).resolve().parent
 
 
 
 def main():
 
-    config = ConfigurationManager("config/config.yaml")
-    
-    
-    spacecraft = Spacecraft(config.spacecraft)
-    planet = Planet(config.planet)
-    physics = Physics(config.physics, planet, spacecraft)
-    simulation = Simulation(config.simulation,
-                            spacecraft = spacecraft,
-                            planet = planet,
-                            physics= physics)
+    # Many configurations at once: run_batch.py
+    parser = argparse.ArgumentParser(description="Runs one simulation and plots it.")
+    parser.add_argument("config", type=Path, nargs="?", default=LEVEL_DIRECTORY / "config" / "config.yaml",
+                        help="config file (default: config/config.yaml next to this script)")
+    parser.add_argument("--set", dest="settings", action="append", default=[], metavar="KEY=VALUE",
+                        help="change a setting of the config file, e.g. simulation.end_time=2000 (repeatable)")
+    args = parser.parse_args()
+
+    try:
+        config = ConfigurationManager(args.config, dict(parse_assignment(assignment) for assignment in args.settings))
+    except ValueError as e:
+        parser.error(str(e))
     
-    plotter = Plotting()
+    plotter = Plotting.from_config(config.plotting)
 
 
-    # Run the Runge-Kutta orbital calculation
-    simulation.run()
+    # Run the Runge-Kutta orbital calculation (or read it back from the cache, if its turned
+    # on and nothing changed since the last run)
+    simulation = run_simulation(config, ResultCache.from_config(config.cache))
 
 
 
     # Plot the results of the simulation, namely the position of the spacecraft
-    plotter.simple_orbital_trajectory(simulation.get_trajectory(), display_plot=False)
-    plotter.simple_2d_plot(simulation.get_trajectory(), display_plot=False)
+    budget = config.plotting.point_budget
+    plotter.simple_orbital_trajectory(simulation.get_trajectory(), display_plot=False, max_points=budget)
+    plotter.simple_2d_plot(simulation.get_trajectory(), display_plot=False, max_points=budget)
 
     plotter.plot_velocity_distribution(simulation.get_velocities(), 
                                        simulation.get_times(),
                                        display_plot= True,
-                                       save_plot= True)
+                                       save_plot= True,
+                                       max_points= budget)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,65 @@
+# Level 2 - batch runner
+
+# Runs many configurations in one go, in this process or a pool of worker processes, and
+# writes one table of results: the base config file with each override file merged over it,
+# with each row of a CSV of settings, and/or with settings changed on the command line, e.g.
+#
+#   python run_batch.py --overrides heavy.yaml light.yaml --set simulation.integrator.type=DOPRI45
+#   python run_batch.py --rows cases.csv --workers 4
+#
+# An override file has only the settings that change, in the layout of config.yaml. The CSV
+# has the dotted path of a setting as the header of each column (e.g.
+# spacecraft.design_parameters.mass) and a case per row. Settings given with --set are
+# changed in every case.
+
+
+import argparse
+
+from pathlib import Path
+
+from src.batch_runner import BatchRunner, batch_cases, write_results
+
+from src.config.overrides import parse_assignment
+
+
+LEVEL_DIRECTORY = Path(__file__).resolve().parent
+
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Runs many configurations and writes one table of results.")
+    parser.add_argument("--config", type=Path, default=LEVEL_DIRECTORY / "config" / "config.yaml",
+                        help="base config file (default: config/config.yaml next to this script)")
+    parser.add_argument("--overrides", type=Path, nargs="+", default=[], metavar="FILE",
+                        help="override files, one case each")
+    parser.add_argument("--rows", type=Path, default=None, metavar="CSV",
+                        help="CSV of settings, one case per row")
+    parser.add_argument("--set", dest="settings", action="append", default=[], metavar="KEY=VALUE",
+                        help="setting changed in every case, e.g. simulation.end_time=2000 (repeatable)")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes, 0 for every core")
+    parser.add_argument("--cases-per-task", type=int, default=1, help="cases handed to a worker at a time")
+    parser.add_argument("--output", type=Path, default=LEVEL_DIRECTORY / "plots" / "batch_results.csv",
+                        help="results table (CSV)")
+    args = parser.parse_args()
+
+    if args.workers < 0 or args.cases_per_task < 1:
+        parser.error("--workers must be at least 0 and --cases-per-task at least 1.")
+
+    try:
+        settings = dict(parse_assignment(assignment) for assignment in args.settings)
+        cases = batch_cases(args.config, args.overrides, args.rows, settings)
+    except ValueError as e:
+        parser.error(str(e))
+
+    results = BatchRunner(cases, args.workers, args.cases_per_task).run()
+    write_results(args.output, cases, results)
+
+    print(f"{len(results)} cases, results in {args.output}\n")
+    print(f"{'case':>5}  {'label':24}{'flight (s)':>12}{'peak g':>9}{'latitude':>11}{'longitude':>11}  outcome")
+    for case, row in zip(cases, results):
+        print(f"{row['case']:5d}  {case.label[:24]:24}{row['time_of_flight']:12.1f}{row['peak_deceleration']:9.2f}"
+              f"{row['latitude']:11.4f}{row['longitude']:11.4f}  {row['termination_reason']}")
+
+if __name__ == "__main__":
+    main()
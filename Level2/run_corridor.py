@@ -0,0 +1,36 @@
+# Level 2 - entry corridor
+
+# Finds the range of entry flight path angles between skipping off the atmosphere and going
+# over the deceleration (or heating) limit, as described in the `corridor:` section of the
+# config file, with as few trajectories as it can.
+
+
+from src.corridor import CorridorFinder
+
+from src.config.configuration_manager import ConfigurationManager
+
+
+
+def main():
+
+    config = ConfigurationManager("config/config.yaml")
+
+    result = CorridorFinder(config).find()
+
+    for probe in result.probes:
+        print(f"{probe.flight_path_angle:10.4f} deg  {probe.outcome:10}  ({probe.termination_reason}, {probe.time_of_flight:.1f} s)")
+    print()
+
+    if result.steep_limit is not None:
+        print(f"Steep limit:   {result.steep_limit:.4f} deg (boundary between {result.steep_bracket[0]:.4f} and {result.steep_bracket[1]:.4f})")
+    else:
+        print(f"Steep limit:   not reached by {config.corridor.steepest_angle} deg")
+    if result.shallow_limit is not None:
+        print(f"Shallow limit: {result.shallow_limit:.4f} deg (boundary between {result.shallow_bracket[0]:.4f} and {result.shallow_bracket[1]:.4f})")
+    else:
+        print(f"Shallow limit: not reached by {config.corridor.shallowest_angle} deg")
+
+    print(f"Corridor width: {result.width:.4f} deg, found with {result.trajectories} trajectories in {result.rounds} rounds")
+
+if __name__ == "__main__":
+    main()
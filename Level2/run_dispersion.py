@@ -0,0 +1,62 @@
+# Level 2 - landing dispersion
+
+# Runs the Monte Carlo dispersion described in the `dispersion:` section of the config file
+# and saves the landing results of every case along with the landing heat map.
+
+
+import numpy as np
+
+from src.dispersion import INVALID_PERTURBATION, DispersionRunner
+from src.plotting import Plotting
+
+from src.config.configuration_manager import ConfigurationManager
+
+
+
+def main():
+
+    config = ConfigurationManager("config/config.yaml")
+
+    runner = DispersionRunner(config)
+    results = runner.run()
+
+    heatmap = runner.heatmap
+
+    np.save("plots/dispersion_results.npy", results)
+    heatmap.save("plots/landing_heatmap.npz")
+
+    report = runner.convergence_report
+    cases_run = report.cases if report is not None else config.dispersion.number_of_cases
+
+    print(f"{heatmap.count} of {cases_run} cases hit the surface.")
+    if report is not None:
+        confidence = config.dispersion.convergence.confidence
+        print(f"{'Converged' if report.converged else 'Not converged'} after {report.cases} cases, "
+              f"at {confidence:.0%} confidence:")
+        print(f"  mean landing point to +-{report.mean_half_width:.1f} m, footprint to +-{report.footprint_half_width:.1%}")
+        for percentile in report.percentiles:
+            print(f"  {percentile.percentile:g}% of landings within {percentile.estimate/1000:.3f} km "
+                  f"(+-{percentile.half_width:.1f} m) of the nominal landing point")
+    if heatmap.count > 0 and not np.all(results["weight"] == 1.0):
+        print(f"Importance sampled: worth {heatmap.effective_sample_size():.1f} unweighted landings")
+    if heatmap.count >= 2:
+        mean_latitude, mean_longitude = heatmap.mean_latitude_longitude()
+        semi_major, semi_minor, heading = heatmap.footprint_ellipse()
+        print(f"Mean landing point: {mean_latitude:.4f} deg, {mean_longitude:.4f} deg")
+        print(f"95% footprint: {semi_major/1000:.2f} km x {semi_minor/1000:.2f} km, major axis {heading:.1f} deg from north")
+
+    reasons, counts = np.unique(results["termination_reason"][~results["impacted"]], return_counts=True)
+    for reason, count in zip(reasons, counts):
+        print(f"{count} cases didnt hit the surface: {reason}")
+
+    impacted = results[results["impacted"]]
+    invalid = np.count_nonzero(results["termination_reason"] == INVALID_PERTURBATION)
+    if invalid > 0:
+        print(f"{invalid} cases were perturbed out of the valid range of a setting and not run.")
+    if len(impacted) > 0:
+        print(f"Peak deceleration: {np.max(impacted['peak_deceleration']):.2f} g (worst case)")
+
+    Plotting.from_config(config.plotting).plot_landing_heatmap(heatmap, display_plot=False, save_plot=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# Level 2 - batch rendering
+
+# Draws the plots of a render job (config/render_job.yaml by default) from results saved by
+# earlier runs, without a display: trajectory stores and landing heat maps, written as
+# png/pdf/svg (and html for the maps).
+#
+#   python run_render.py [render job file]
+
+
+import sys
+
+import yaml
+
+from src.render import Renderer
+
+from src.config.plotting_config import PlottingConfig
+
+
+
+def main():
+
+    job_path = sys.argv[1] if len(sys.argv) > 1 else "config/render_job.yaml"
+    with open(job_path) as f:
+        job = PlottingConfig(yaml.safe_load(f))
+    job.validate()
+
+    written = Renderer(job).run()
+
+    print(f"{len(written)} files written to {job.output_directory}")
+    for path in written:
+        print(f"  {path}")
+
+if __name__ == "__main__":
+    main()
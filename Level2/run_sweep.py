@@ -0,0 +1,40 @@
+# Level 2 - parameter sweep
+
+# Runs the parameter study described in the `sweep:` section of the config file (entry flight
+# path angle and speed, mass, area, drag coefficient) and prints the table of results. The
+# results file is written as the cases finish, so an interrupted sweep picks up where it was.
+
+
+import numpy as np
+
+from src.sweep import SweepRunner
+
+from src.config.configuration_manager import ConfigurationManager
+
+
+
+def main():
+
+    config = ConfigurationManager("config/config.yaml")
+
+    runner = SweepRunner(config)
+    results = runner.run()
+
+    print(f"{len(results)} cases, results in {config.sweep.results_file}\n")
+    print(f"{'angle (deg)':>12}{'speed (m/s)':>13}{'mass (kg)':>11}{'area (m^2)':>12}{'Cd':>7}"
+          f"{'peak g':>9}{'peak q (kPa)':>14}{'downrange (km)':>16}{'flight (s)':>12}")
+    for row in results:
+        print(f"{row['flight_path_angle']:12.2f}{row['entry_speed']:13.1f}{row['mass']:11.1f}"
+              f"{row['cross_sectional_area']:12.3f}{row['drag_coefficient']:7.3f}"
+              f"{row['peak_deceleration']:9.2f}{row['peak_dynamic_pressure']/1000:14.2f}"
+              f"{row['downrange']/1000:16.1f}{row['time_of_flight']:12.1f}"
+              f"{'' if row['impacted'] else '  (' + row['termination_reason'] + ')'}")
+
+    impacted = results[results["impacted"]]
+    if len(impacted) > 0:
+        gentlest = impacted[np.argmin(impacted["peak_deceleration"])]
+        print(f"\nLowest peak deceleration: {gentlest['peak_deceleration']:.2f} g, at a "
+              f"{gentlest['flight_path_angle']:.2f} deg flight path angle and {gentlest['entry_speed']:.1f} m/s")
+
+if __name__ == "__main__":
+    main()
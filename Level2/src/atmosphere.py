@@ -0,0 +1,275 @@
+
+import numpy as np
+
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Tuple
+
+from .config.planet_config import PlanetConfig
+
+
+# Properties of air used for the temperature -> speed of sound conversion
+UNIVERSAL_GAS_CONSTANT = 8.31432   # J/(mol*K), the value the 1976 standard uses
+MOLAR_MASS_OF_AIR = 0.0289644      # kg/mol, sea level composition
+HEAT_CAPACITY_RATIO = 1.4
+STANDARD_GRAVITY = 9.80665         # m/s^2
+
+
+def speed_of_sound(temperature):
+    """
+    Speed of sound (m/s) in air at the given temperature(s) (K).
+    """
+    return np.sqrt(HEAT_CAPACITY_RATIO * UNIVERSAL_GAS_CONSTANT * temperature / MOLAR_MASS_OF_AIR)
+
+
+class AtmosphereModel(ABC):
+    """
+    A model of the planets atmosphere as a function of altitude above the surface.
+
+    Every method takes either a single altitude or an array of them (one per ensemble member)
+    and returns the same shape back.
+    """
+
+    @abstractmethod
+    def density(self, altitude):
+        """
+        Air density (kg/m^3) at the given altitude(s) (m).
+        """
+
+
+    def properties(self, altitude) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Density (kg/m^3), temperature (K) and speed of sound (m/s) at the given altitude(s).
+        Models that only know the density report nan for the other two.
+        """
+        density = self.density(altitude)
+        unknown = np.full(np.shape(density), np.nan)
+        return density, unknown, unknown
+
+
+class ExponentialAtmosphere(AtmosphereModel):
+    """
+    The exponential decay model, density = sea_level_density * exp(-altitude / scale_height).
+    Simplest model, and cheap enough that it isnt worth tabulating.
+    """
+
+    def __init__(self, sea_level_density: float, scale_height: float):
+        self.sea_level_density = sea_level_density
+        self.scale_height = scale_height
+
+
+    def density(self, altitude):
+        return self.sea_level_density * np.exp(-altitude/self.scale_height)
+
+
+class TabulatedAtmosphere(AtmosphereModel):
+    """
+    An atmosphere evaluated from a lookup table over a regular altitude grid, so that models
+    which are expensive to evaluate directly (layered ones with piecewise lapse rates, etc.)
+    only have to be worked out once, when the table is built.
+
+    The density is interpolated linearly in log(density), which is exact for the exponential
+    profile of an isothermal layer and keeps the density positive. Since the grid is regular,
+    finding the table cell is a single division rather than a search. Outside the table the
+    last cell is extrapolated (exponentially for the density).
+    """
+
+    def __init__(self, altitudes: np.ndarray, densities: np.ndarray, temperatures: np.ndarray):
+
+        altitudes = np.asarray(altitudes, dtype=float)
+        steps = np.diff(altitudes)
+        if len(altitudes) < 2 or not np.allclose(steps, steps[0]) or steps[0] <= 0:
+            raise ValueError("A tabulated atmosphere needs at least two regularly spaced, increasing altitudes.")
+
+        self.bottom_altitude = altitudes[0]
+        self.step = steps[0]
+        self.number_of_cells = len(altitudes) - 1
+
+        self.log_densities = np.log(np.asarray(densities, dtype=float))
+        self.temperatures = np.asarray(temperatures, dtype=float)
+        self.speeds_of_sound = speed_of_sound(self.temperatures)
+
+
+    def _cell(self, altitude) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The table cell each altitude falls in, and how far along the cell it is (0 to 1,
+        or beyond that when extrapolating off either end of the table).
+        """
+        position = (np.asarray(altitude, dtype=float) - self.bottom_altitude) / self.step
+        index = np.clip(np.floor(position).astype(int), 0, self.number_of_cells - 1)
+        return index, position - index
+
+
+    @staticmethod
+    def _interpolate(table: np.ndarray, index: np.ndarray, fraction: np.ndarray) -> np.ndarray:
+        return table[index] + fraction * (table[index + 1] - table[index])
+
+
+    def density(self, altitude):
+        index, fraction = self._cell(altitude)
+        return np.exp(self._interpolate(self.log_densities, index, fraction))
+
+
+    def properties(self, altitude):
+        index, fraction = self._cell(altitude)
+        return (np.exp(self._interpolate(self.log_densities, index, fraction)),
+                self._interpolate(self.temperatures, index, fraction),
+                self._interpolate(self.speeds_of_sound, index, fraction))
+
+
+    @classmethod
+    def from_function(cls,
+                      profile: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]],
+                      top_altitude: float,
+                      step: float) -> "TabulatedAtmosphere":
+        """
+        Builds the table by evaluating a (vectorized) profile altitude -> (density, temperature)
+        on a regular grid from the surface up to top_altitude.
+        """
+        altitudes = np.arange(0.0, top_altitude + step, step)
+        densities, temperatures = profile(altitudes)
+        return cls(altitudes, densities, temperatures)
+
+
+class USStandardAtmosphere1976:
+    """
+    The U.S. Standard Atmosphere, 1976.
+
+    Up to 86 km it is the standards layered model: seven layers of constant lapse rate in
+    geopotential altitude, with the pressure integrated hydrostatically through each layer.
+    Above 86 km, where the standard no longer has closed form expressions, the densities and
+    temperatures of its published tables are interpolated (log-linearly for the density).
+    """
+
+    EARTH_RADIUS = 6356766.0            # m, the effective radius used for geopotential altitude
+    SEA_LEVEL_PRESSURE = 101325.0       # Pa
+
+    # Base geopotential altitude (m), base temperature (K) and lapse rate (K/m) of each layer
+    LAYERS = np.array([[0.0,     288.15, -0.0065],
+                       [11000.0, 216.65,  0.0],
+                       [20000.0, 216.65,  0.001],
+                       [32000.0, 228.65,  0.0028],
+                       [47000.0, 270.65,  0.0],
+                       [51000.0, 270.65, -0.0028],
+                       [71000.0, 214.65, -0.002]])
+
+    LAYERED_TOP_ALTITUDE = 86000.0      # m (geometric)
+
+    # Published values above 86 km: geometric altitude (m), density (kg/m^3), temperature (K)
+    UPPER_TABLE = np.array([[86000.0,   6.958e-06, 186.87],
+                            [90000.0,   3.416e-06, 186.87],
+                            [100000.0,  5.604e-07, 195.08],
+                            [110000.0,  9.708e-08, 240.00],
+                            [120000.0,  2.222e-08, 360.00],
+                            [130000.0,  8.152e-09, 469.27],
+                            [140000.0,  3.831e-09, 559.63],
+                            [150000.0,  2.076e-09, 634.39],
+                            [160000.0,  1.233e-09, 696.29],
+                            [180000.0,  5.194e-10, 790.07],
+                            [200000.0,  2.541e-10, 854.56],
+                            [250000.0,  6.073e-11, 941.33],
+                            [300000.0,  1.916e-11, 976.01],
+                            [350000.0,  7.014e-12, 990.06],
+                            [400000.0,  2.803e-12, 995.83],
+                            [450000.0,  1.184e-12, 998.22],
+                            [500000.0,  5.215e-13, 999.24],
+                            [600000.0,  1.137e-13, 999.85],
+                            [700000.0,  3.070e-14, 999.97],
+                            [800000.0,  1.136e-14, 999.99],
+                            [900000.0,  5.759e-15, 1000.00],
+                            [1000000.0, 3.561e-15, 1000.00]])
+
+    def __init__(self):
+
+        # Pressure at the base of each layer, integrated up from sea level
+        self.base_pressures = np.empty(len(self.LAYERS))
+        self.base_pressures[0] = self.SEA_LEVEL_PRESSURE
+        for i in range(1, len(self.LAYERS)):
+            base_height, base_temperature, lapse_rate = self.LAYERS[i - 1]
+            self.base_pressures[i] = self._layer_pressure(self.LAYERS[i, 0] - base_height, self.base_pressures[i - 1],
+                                                          base_temperature, lapse_rate)
+
+
+    @staticmethod
+    def _layer_pressure(height_in_layer, base_pressure, base_temperature, lapse_rate):
+        """
+        Hydrostatic pressure at height_in_layer (geopotential m) above the base of a layer.
+        """
+        exponent = STANDARD_GRAVITY * MOLAR_MASS_OF_AIR / UNIVERSAL_GAS_CONSTANT
+        isothermal = lapse_rate == 0
+
+        # np.where evaluates both branches, so keep the unused one finite
+        safe_lapse_rate = np.where(isothermal, 1.0, lapse_rate)
+        gradient = base_pressure * (base_temperature / (base_temperature + safe_lapse_rate * height_in_layer)) ** (exponent / safe_lapse_rate)
+        isothermal_pressure = base_pressure * np.exp(-exponent * height_in_layer / base_temperature)
+
+        return np.where(isothermal, isothermal_pressure, gradient)
+
+
+    def __call__(self, altitude: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Density (kg/m^3) and temperature (K) at the given geometric altitudes (m).
+        """
+        altitude = np.asarray(altitude, dtype=float)
+
+        # The layered model, capped at its top so the layers are never used out of range
+        layered_altitude = np.minimum(altitude, self.LAYERED_TOP_ALTITUDE)
+        geopotential_height = self.EARTH_RADIUS * layered_altitude / (self.EARTH_RADIUS + layered_altitude)
+
+        layer = np.clip(np.searchsorted(self.LAYERS[:, 0], geopotential_height, side="right") - 1, 0, len(self.LAYERS) - 1)
+        base_height, base_temperature, lapse_rate = self.LAYERS[layer].T
+        height_in_layer = geopotential_height - base_height
+
+        temperature = base_temperature + lapse_rate * height_in_layer
+        pressure = self._layer_pressure(height_in_layer, self.base_pressures[layer], base_temperature, lapse_rate)
+        density = pressure * MOLAR_MASS_OF_AIR / (UNIVERSAL_GAS_CONSTANT * temperature)
+
+        # Above the layered part, go off the published table
+        upper = altitude > self.LAYERED_TOP_ALTITUDE
+        if np.any(upper):
+            table_altitudes, table_densities, table_temperatures = self.UPPER_TABLE.T
+            density = np.where(upper, np.exp(np.interp(altitude, table_altitudes, np.log(table_densities))), density)
+            temperature = np.where(upper, np.interp(altitude, table_altitudes, table_temperatures), temperature)
+
+        return density, temperature
+
+
+# The atmosphere models that can be picked with `atmospheric_density_model` in the config file,
+# each built from the planets config by its builder function.
+ATMOSPHERES: Dict[str, Callable[[PlanetConfig], AtmosphereModel]] = {}
+
+
+def register_atmosphere(name: str):
+    """
+    Decorator adding an atmosphere builder to ATMOSPHERES under the given name, so that a new
+    model only has to be written and registered to be usable from the config file.
+    """
+    def decorator(builder: Callable[[PlanetConfig], AtmosphereModel]):
+        ATMOSPHERES[name] = builder
+        return builder
+    return decorator
+
+
+@register_atmosphere("exponential_decay")
+def _exponential_decay(config: PlanetConfig) -> AtmosphereModel:
+    return ExponentialAtmosphere(config.sea_level_density, config.scale_height)
+
+
+@register_atmosphere("us_standard_1976")
+def _us_standard_1976(config: PlanetConfig) -> AtmosphereModel:
+    return TabulatedAtmosphere.from_function(USStandardAtmosphere1976(),
+                                             config.table_top_altitude,
+                                             config.table_step)
+
+
+def create_atmosphere(config: PlanetConfig) -> AtmosphereModel:
+    """
+    Builds the atmosphere model the user asked for in the config file.
+
+    Raises:
+        ValueError: if the model is not one of the registered ones.
+    """
+    if config.atmospheric_model not in ATMOSPHERES:
+        raise ValueError(f"Unknown atmospheric model '{config.atmospheric_model}'. "
+                         f"Choose one of: {', '.join(ATMOSPHERES)}")
+
+    return ATMOSPHERES[config.atmospheric_model](config)
@@ -0,0 +1,176 @@
+import copy
+import csv
+import os
+
+import numpy as np
+import yaml
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .cache import CacheEntry, ResultCache, config_key
+from .config.configuration_manager import ConfigurationManager
+from .config.overrides import apply_setting, merge_settings, read_override_file, read_setting_rows
+from .dispersion import simulate_landing
+
+
+# One row of the batch results table
+RESULT_DTYPE = np.dtype([("case", np.int64),
+                         ("impacted", np.bool_),
+                         ("latitude", np.float64),        # degrees
+                         ("longitude", np.float64),       # degrees
+                         ("time_of_flight", np.float64),  # seconds
+                         ("peak_deceleration", np.float64),  # g's
+                         ("termination_reason", "U32")])
+
+
+@dataclass
+class BatchCase:
+    """
+    One configuration of a batch: its number, where it came from (the override file, the row
+    of the settings CSV) and the whole configuration.
+    """
+    number: int
+    label: str
+    config: ConfigurationManager
+
+
+def batch_cases(config_path: Path,
+                override_files: Sequence[Path] = (),
+                settings_file: Optional[Path] = None,
+                settings: Optional[Dict[str, Any]] = None) -> List[BatchCase]:
+    """
+    Every configuration of a batch: the base config file with each override file merged over
+    it, and with each row of the settings CSV, in that order (just the base config if there
+    are neither). The settings (e.g. from --set) are then changed in every one of them.
+
+    The configurations are all built and validated here, so a mistake in any of them shows up
+    before anything is run.
+
+    Args:
+        config_path (Path): the base YAML config file.
+        override_files (Sequence[Path]): YAML files with only the settings that change, in the
+            layout of the config file.
+        settings_file (Optional[Path]): CSV with a dotted setting path per column and a case per row.
+        settings (Optional[Dict[str, Any]]): settings by dotted path, changed in every case.
+    """
+    with open(config_path) as f:
+        base = yaml.safe_load(f)
+
+    variants = [(Path(path).stem, merge_settings(base, read_override_file(path))) for path in override_files]
+    if settings_file is not None:
+        for row_number, row in enumerate(read_setting_rows(settings_file), start=1):
+            variant = copy.deepcopy(base)
+            for path, value in row.items():
+                apply_setting(variant, path, value)
+            variants.append((f"{Path(settings_file).name}:{row_number}", variant))
+    if not variants:
+        variants = [("base", copy.deepcopy(base))]
+
+    cases = []
+    for number, (label, raw_config) in enumerate(variants):
+        for path, value in (settings or {}).items():
+            apply_setting(raw_config, path, value)
+        try:
+            cases.append(BatchCase(number, label, ConfigurationManager.from_raw_config(raw_config)))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"The configuration of case {number} ({label}) is not valid: {e}") from e
+
+    return cases
+
+
+def run_case(case: BatchCase, cache: Optional[ResultCache] = None) -> tuple:
+    """
+    Runs the simulation of one case of the batch.
+
+    Args:
+        cache (Optional[ResultCache]): if given, a case that was already run with the same
+            config is read back from it instead of running it again.
+
+    Returns:
+        tuple: the results of the case, in the order of RESULT_DTYPE.
+    """
+    if cache is not None:
+        key = config_key(case.config, kind="batch_case")
+        entry = cache.get(key)
+        if entry is not None:
+            return (case.number, *entry.summary["row"])
+
+    row = simulate_landing(case.config)
+    if cache is not None:
+        cache.put(key, CacheEntry(summary={"row": row}))
+
+    return (case.number, *row)
+
+
+def _run_cases(task: List[BatchCase]) -> np.ndarray:
+    """
+    What a worker process runs: a batch of cases, returned as rows of the results array.
+    """
+    rows = np.empty(len(task), dtype=RESULT_DTYPE)
+    for i, case in enumerate(task):
+        rows[i] = run_case(case, ResultCache.from_config(case.config.cache))
+
+    return rows
+
+
+def write_results(path: Path, cases: List[BatchCase], results: np.ndarray) -> None:
+    """
+    Writes the results table as CSV, with the label of each case next to its number.
+    """
+    labels = {case.number: case.label for case in cases}
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["case", "label"] + list(RESULT_DTYPE.names[1:]))
+        for row in results.tolist():
+            writer.writerow([row[0], labels[row[0]]] +
+                            [repr(value) if isinstance(value, float) else value for value in row[1:]])
+
+
+class BatchRunner:
+    """
+    Runs many configurations (see batch_cases) in one process, or spread over a pool of
+    worker processes, so the start up of the interpreter and the imports are paid once per
+    batch instead of once per trajectory. Used by run_batch.py.
+    """
+
+    def __init__(self, cases: List[BatchCase], workers: int = 0, cases_per_task: int = 1):
+        self.cases = cases
+        self.workers = workers
+        self.cases_per_task = cases_per_task
+
+
+    def number_of_workers(self) -> int:
+        return self.workers or os.cpu_count() or 1
+
+
+    def tasks(self) -> List[List[BatchCase]]:
+        """
+        Splits the cases up into the batches that get handed to the workers.
+        """
+        size = self.cases_per_task
+        return [self.cases[start:start + size] for start in range(0, len(self.cases), size)]
+
+
+    def run(self) -> np.ndarray:
+        """
+        Runs every case.
+
+        Returns:
+            np.ndarray: structured array (RESULT_DTYPE) with one row per case, sorted by case.
+        """
+        tasks = self.tasks()
+
+        if self.number_of_workers() == 1 or len(tasks) <= 1:
+            results = list(map(_run_cases, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.number_of_workers(), len(tasks))) as executor:
+                results = list(executor.map(_run_cases, tasks))
+
+        results = np.concatenate(results) if results else np.empty(0, dtype=RESULT_DTYPE)
+        return results[np.argsort(results["case"])]
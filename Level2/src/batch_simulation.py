@@ -0,0 +1,275 @@
+
+import time
+
+import numpy as np
+
+from typing import Dict
+
+from .config.simulation_config import SimulationConfig
+from .instrumentation import Instrumentation
+from .integrators import create_integrator
+from .kepler import coast_to_radius, propagate
+from .events import StepInterpolant, find_impact_times
+from .spacecraft import SpacecraftEnsemble
+from .planet import Planet
+from .physics import Physics
+
+
+class BatchSimulation:
+    """
+    Runs the same numerical simulation as the Simulation class, but for a whole ensemble of
+    spacecraft at once.
+
+    All N position/velocity states live in contiguous (N, 3) arrays, so gravity, drag and the
+    integrator stages are evaluated as vectorized NumPy operations on every member in one go.
+    With an adaptive integrator the whole ensemble shares one step size, set by whichever
+    member needs the smallest one.
+
+    Members that hit the surface are retired (their impact state is recorded) and dropped from
+    the working arrays, so the cost of a step follows the number of members still flying.
+
+    Only where and when each member hits the surface is kept, none of the rest of what a
+    Simulation keeps (the history of each member, anything else that happened along the way),
+    and every member flies through the same planet and atmosphere. So its for the throughput
+    of large ensembles that only differ in their initial state and design parameters, not for
+    runs that need the full results of each trajectory.
+    """
+
+    def __init__(self,
+                 config: SimulationConfig,
+                 ensemble: SpacecraftEnsemble,
+                 planet: Planet,
+                 physics: Physics) -> None:
+        """
+        Initialize the batch simulation with configuration parameters and objects.
+
+        Args:
+            config (SimulationConfig): the same simulation parameters a single run uses
+                (start_time, end_time, time_step_size).
+            ensemble (SpacecraftEnsemble): every member's initial conditions and design parameters.
+            planet (Planet): Planet object providing for planet characteristics such as gravity.
+            physics (Physics): the physics object, built on top of the ensemble.
+        """
+
+        self.ensemble = ensemble
+        self.planet = planet
+        self.physics = physics
+        self.config = config
+
+        # Counters, timers and the diagnostic trace (all quiet unless asked for in the config)
+        self.instrumentation = Instrumentation(self.config.instrumentation)
+
+        self.integrator = create_integrator(self.config.integrator,
+                                            self.instrumentation.traced_acceleration(self.physics.get_acceleration, self.planet))
+
+        number_of_members = len(self.ensemble)
+
+        # Final state of every member, indexed by its position in the original ensemble.
+        # Members which never hit the surface get their state at end_time.
+        self._final_times = np.full(number_of_members, np.nan)
+        self._final_position = np.full((number_of_members, 3), np.nan)
+        self._final_velocity = np.full((number_of_members, 3), np.nan)
+        self._impacted = np.zeros(number_of_members, dtype=bool)
+
+        self._is_complete: bool = False
+        self._termination_reason: str = "Not started."
+
+
+    def run(self) -> None:
+        """
+        Execute the batch simulation using the integrator chosen in the config file.
+
+        Runs from start_time to end_time, or until every member has hit the planets surface.
+
+        Returns:
+            None: Results are stored per member and accessed through the get_* functions.
+        """
+
+        current_time = self.config.start_time
+        step_size = self.config.time_step_size
+
+        instrumentation = self.instrumentation
+        lap = instrumentation.lap
+        trace_steps = instrumentation.enabled("steps")
+        run_start = time.perf_counter()
+
+        # Skip the vacuum arc down to the top of the atmosphere, if the user asked for it
+        if self.config.coast.enabled:
+            lap(None)
+            current_time = self._coast_to_entry_interface(current_time)
+            lap("coast")
+
+        # Acceleration at the current state, needed at both ends of a step to locate the impacts
+        acceleration = self.integrator.evaluate(self.ensemble.position, self.ensemble.velocity)
+
+        self._termination_reason = "Simulation complete."
+
+        # Main simulation loop
+        lap(None)
+        while current_time < self.config.end_time and len(self.ensemble) > 0:
+
+            if self.integrator.adaptive:
+                step_size = min(step_size, self.config.end_time - current_time)
+
+            try:
+                result = self.integrator.step(self.ensemble.position, self.ensemble.velocity,
+                                              step_size, acceleration)
+            except ValueError as e:
+                self._termination_reason = f"Integration error: {str(e)}"
+                break
+
+            end_acceleration = result.acceleration
+            if end_acceleration is None:
+                end_acceleration = self.integrator.evaluate(result.position, result.velocity)
+            lap("integrator")
+
+            if trace_steps:
+                instrumentation.trace("steps", "step", current_time,
+                                      step_size=result.step_size,
+                                      active_members=len(self.ensemble))
+
+            # Retire anyone who hit the surface during this step
+            hit = np.linalg.norm(result.position, axis=1) <= self.planet.radius
+            if np.any(hit):
+                interpolant = StepInterpolant(current_time, current_time + result.step_size,
+                                              self.ensemble.position[hit], self.ensemble.velocity[hit],
+                                              acceleration[hit],
+                                              result.position[hit], result.velocity[hit],
+                                              end_acceleration[hit])
+                self._retire_impacted_members(hit, interpolant)
+
+                keep = ~hit
+                self.ensemble.keep_only(keep)
+                result.position = result.position[keep]
+                result.velocity = result.velocity[keep]
+                end_acceleration = end_acceleration[keep]
+            lap("impacts")
+
+            self.ensemble.position = result.position
+            self.ensemble.velocity = result.velocity
+            acceleration = end_acceleration
+            step_size = result.next_step_size
+
+            current_time += result.step_size
+
+        # Whoever is left never hit the surface within the simulated time
+        self._record_final_states(np.ones(len(self.ensemble), dtype=bool), current_time)
+
+        self._is_complete = True
+        if len(self.ensemble) == 0:
+            self._termination_reason = "All members impacted the surface."
+
+        instrumentation.trace("events", "termination", current_time, reason=self._termination_reason)
+        for name, value in self.integrator.get_statistics().items():
+            instrumentation.count(name, value)
+        instrumentation.count("impacts", int(np.sum(self._impacted)))
+        instrumentation.add_time("run", time.perf_counter() - run_start)
+        instrumentation.close()
+
+
+    def _coast_to_entry_interface(self, current_time: float) -> float:
+        """
+        Moves the whole ensemble analytically along their two-body (Kepler) orbits up to the
+        moment the first member reaches the entry interface altitude.
+
+        All members share one clock, so nobody can be coasted further than the earliest arrival.
+        Up to then every member is still above the atmosphere (or on an orbit that never comes
+        down into it), so the analytic solution is exact for all of them. Nothing happens if any
+        member already starts inside the entry interface.
+
+        Args:
+            current_time (float): the simulation time at the start of the coast.
+
+        Returns:
+            float: the simulation time at the end of the coast.
+        """
+        entry_radius = self.planet.radius + self.config.coast.entry_interface_altitude
+        mu = self.planet.gravitational_parameter
+
+        coast_time, _, _, reaches = coast_to_radius(self.ensemble.position, self.ensemble.velocity,
+                                                    entry_radius, mu)
+        if not np.any(reaches):
+            return current_time
+
+        shared_coast_time = min(float(np.min(coast_time[reaches])), self.config.end_time - current_time)
+        if shared_coast_time <= 0:
+            return current_time
+
+        self.ensemble.position, self.ensemble.velocity = propagate(self.ensemble.position,
+                                                                   self.ensemble.velocity,
+                                                                   shared_coast_time, mu)
+
+        return current_time + shared_coast_time
+
+
+    def _retire_impacted_members(self, hit: np.ndarray, interpolant: StepInterpolant) -> None:
+        """
+        Records the exact impact time and state of the members that went through the surface
+        during the step, found by root finding on the steps interpolant.
+
+        Args:
+            hit (np.ndarray): boolean mask over the active members of who hit the surface.
+            interpolant (StepInterpolant): the step interpolant of just those members.
+        """
+        impact_times = find_impact_times(interpolant, self.planet.radius)
+        impact_positions, impact_velocities = interpolant(impact_times)
+
+        original_index = self.ensemble.member_index[hit]
+        self._impacted[original_index] = True
+        self._final_times[original_index] = impact_times
+        self._final_position[original_index] = impact_positions
+        self._final_velocity[original_index] = impact_velocities
+
+        if self.instrumentation.enabled("events"):
+            for member, impact_time in zip(original_index, impact_times):
+                self.instrumentation.trace("events", "event", impact_time, name="Surface Impact", member=member)
+
+
+    def _record_final_states(self, members: np.ndarray, time: float) -> None:
+        """
+        Copies the current state of the selected (boolean mask) active members into the results.
+        """
+        original_index = self.ensemble.member_index[members]
+        self._final_times[original_index] = time
+        self._final_position[original_index] = self.ensemble.position[members]
+        self._final_velocity[original_index] = self.ensemble.velocity[members]
+
+
+    def get_integrator_statistics(self) -> Dict[str, int]:
+        """
+        How many (shared) steps the integrator accepted and rejected, and how many times
+        the accelerations had to be evaluated for the whole ensemble.
+        """
+        return self.integrator.get_statistics()
+
+
+    def get_instrumentation(self) -> Instrumentation:
+        """
+        The counters, phase timings and diagnostic trace of the run.
+        """
+        return self.instrumentation
+
+
+    def get_final_positions(self) -> np.ndarray:
+        """
+        The (N, 3) array of where every member ended up (its impact point if it hit the surface).
+        """
+        return self._final_position
+
+    def get_final_velocities(self) -> np.ndarray:
+        """
+        The (N, 3) array of every members velocity at the end of its run.
+        """
+        return self._final_velocity
+
+    def get_final_times(self) -> np.ndarray:
+        """
+        The (N,) array of the time each member stopped, its time of impact if it hit the surface.
+        """
+        return self._final_times
+
+    def get_impacted(self) -> np.ndarray:
+        """
+        The (N,) boolean array saying which members hit the surface.
+        """
+        return self._impacted
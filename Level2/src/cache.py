@@ -0,0 +1,318 @@
+
+import functools
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config.cache_config import CacheConfig
+from .config.configuration_manager import ConfigurationManager
+from .events import EventRecord
+from .spacecraft import Spacecraft
+from .planet import Planet
+from .physics import Physics
+from .simulation import Simulation
+
+
+SOURCE_DIRECTORY = Path(__file__).resolve().parent
+
+# Parts of the config that dont change the results, so they arent part of the key
+IGNORED_SETTINGS = {"simulation": ["instrumentation", "checkpoint"]}
+
+
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    """
+    A tag of the simulation code itself, the hash of every source file in src/. Any change to
+    the code gives a new tag, so results from older code are never handed back.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(SOURCE_DIRECTORY.rglob("*.py")):
+        digest.update(str(path.relative_to(SOURCE_DIRECTORY)).encode())
+        digest.update(path.read_bytes())
+
+    return digest.hexdigest()[:16]
+
+
+def _normalize(value):
+    """
+    Turns a config object into plain JSON types, the same way however the values were written
+    in the file: every number becomes a float (so 100 and 100.0 match) and the config objects
+    become dictionaries of their settings.
+    """
+    if isinstance(value, (bool, np.bool_)) or value is None or isinstance(value, str):
+        return bool(value) if isinstance(value, np.bool_) else value
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if hasattr(value, "__dict__"):
+        return {key: _normalize(item) for key, item in vars(value).items() if not key.startswith("_")}
+
+    raise TypeError(f"Cannot normalize a {type(value).__name__} for the cache key.")
+
+
+def normalized_config(config: ConfigurationManager) -> dict:
+    """
+    The parts of the config that decide the result of a run (spacecraft, planet, simulation
+    and physics sections), as plain normalized values.
+    """
+    sections = {"spacecraft": config.spacecraft,
+                "planet": config.planet,
+                "simulation": config.simulation,
+                "physics": config.physics}
+
+    normalized = {}
+    for name, section in sections.items():
+        settings = _normalize(section)
+        for ignored in IGNORED_SETTINGS.get(name, []):
+            settings.pop(ignored, None)
+        normalized[name] = settings
+
+    return normalized
+
+
+def config_key(config: ConfigurationManager, kind: str = "simulation") -> str:
+    """
+    The cache key of a config: a hash of the normalized config, the code version and what kind
+    of result is stored under it (a full simulation, one dispersion case, ...).
+    """
+    contents = json.dumps({"kind": kind, "code": code_version(), "config": normalized_config(config)},
+                          sort_keys=True)
+
+    return hashlib.sha256(contents.encode()).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    """
+    What is stored under one key: any number of arrays plus a JSON-able summary.
+    """
+    arrays: Dict[str, np.ndarray] = field(default_factory=dict)
+    summary: dict = field(default_factory=dict)
+
+
+class ResultCache:
+    """
+    Content addressed on disk cache of results, one compressed .npz file per key in the cache
+    directory. The files are written atomically, so several processes (e.g. the dispersion
+    workers) can share one cache.
+
+    Reading an entry marks it as recently used (its modification time), and once the cache
+    gets bigger than max_size_bytes the least recently used entries are deleted. The size is
+    kept track of as entries are written rather than by listing the directory every time, so
+    with several processes writing it can briefly go over the limit until one of them notices.
+    """
+
+    def __init__(self, directory: Path, max_size_bytes: int = 500 * 1024**2):
+        self.directory = Path(directory)
+        self.max_size_bytes = max_size_bytes
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._size = self.size()
+
+
+    @classmethod
+    def from_config(cls, config: CacheConfig) -> Optional["ResultCache"]:
+        """
+        The cache described in the `cache:` section of the config file, nothing if its off.
+        """
+        if not config.enabled:
+            return None
+        return cls(Path(config.directory), int(config.max_size_mb * 1024**2))
+
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.npz"
+
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        The entry stored under the key, if there is one. Unreadable entries are deleted.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                summary = json.loads(str(data["summary"]))
+                arrays = {name: data[name] for name in data.files if name != "summary"}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another process in the meantime, the entry was still read fine
+
+        return CacheEntry(arrays, summary)
+
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        """
+        Stores the entry under the key, replacing anything already there, then makes room.
+        """
+        path = self._path(key)
+        temporary = self.directory / f"{key}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(f, summary=np.array(json.dumps(entry.summary)), **entry.arrays)
+
+        # The entry being replaced no longer counts
+        try:
+            replaced_size = path.stat().st_size
+        except FileNotFoundError:
+            replaced_size = 0
+        os.replace(temporary, path)
+
+        self._size += path.stat().st_size - replaced_size
+        if self._size > self.max_size_bytes:
+            self.evict()
+
+
+    def size(self) -> int:
+        """
+        Bytes the cache takes up on disk.
+        """
+        return sum(size for _, _, size in self._entries())
+
+
+    def _entries(self) -> List[tuple]:
+        entries = []
+        for path in self.directory.glob("*.npz"):
+            try:
+                status = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, path, status.st_size))
+
+        return entries
+
+
+    def evict(self) -> None:
+        """
+        Deletes the least recently used entries until the cache fits in max_size_bytes.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[0])
+        total = sum(size for _, _, size in entries)
+
+        for _, path, size in entries:
+            if total <= self.max_size_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+        self._size = total
+
+
+    def clear(self) -> None:
+        for _, path, _ in self._entries():
+            path.unlink(missing_ok=True)
+        self._size = 0
+
+
+class SimulationResult:
+    """
+    The history and outcome of a finished run, with the same accessors as Simulation, so a
+    result read back from the cache can be used (e.g. plotted) just like a fresh run.
+    """
+
+    def __init__(self, times: np.ndarray, positions: np.ndarray, velocities: np.ndarray,
+                 termination_reason: str, events: List[EventRecord], integrator_statistics: Dict[str, int]):
+        self._times = times
+        self._positions = positions
+        self._velocities = velocities
+        self._termination_reason = termination_reason
+        self._events = events
+        self._integrator_statistics = integrator_statistics
+
+
+    @classmethod
+    def from_simulation(cls, simulation: Simulation) -> "SimulationResult":
+        return cls(simulation.get_times().copy(),
+                   simulation.get_trajectory().copy(),
+                   simulation.get_velocities().copy(),
+                   simulation.get_termination_reason(),
+                   list(simulation.get_events()),
+                   simulation.get_integrator_statistics())
+
+
+    def to_entry(self) -> CacheEntry:
+
+        events = [event.to_dict() for event in self._events]
+
+        return CacheEntry({"times": self._times, "positions": self._positions, "velocities": self._velocities},
+                          {"termination_reason": self._termination_reason,
+                           "events": events,
+                           "integrator_statistics": {name: int(value) for name, value in self._integrator_statistics.items()}})
+
+
+    @classmethod
+    def from_entry(cls, entry: CacheEntry) -> "SimulationResult":
+
+        events = [EventRecord.from_dict(event) for event in entry.summary["events"]]
+
+        return cls(entry.arrays["times"], entry.arrays["positions"], entry.arrays["velocities"],
+                   entry.summary["termination_reason"], events, entry.summary["integrator_statistics"])
+
+
+    def get_times(self) -> np.ndarray:
+        return self._times
+
+    def get_trajectory(self) -> np.ndarray:
+        return self._positions
+
+    def get_velocities(self) -> np.ndarray:
+        return self._velocities
+
+    def get_termination_reason(self) -> str:
+        return self._termination_reason
+
+    def get_events(self) -> List[EventRecord]:
+        return self._events
+
+    def get_integrator_statistics(self) -> Dict[str, int]:
+        return self._integrator_statistics
+
+
+def run_simulation(config: ConfigurationManager, cache: Optional[ResultCache] = None) -> SimulationResult:
+    """
+    Runs the simulation described by the config, or hands back the stored result if the same
+    config (with the same code) was already run and is still in the cache.
+
+    Args:
+        config (ConfigurationManager): the whole configuration.
+        cache (Optional[ResultCache]): where to look for and store the result. Nothing always runs.
+    """
+    # A cached result cant write the trajectory store the config asks for, so those always run
+    if config.simulation.output.trajectory_store is not None:
+        cache = None
+
+    key = config_key(config) if cache is not None else None
+    if cache is not None:
+        entry = cache.get(key)
+        if entry is not None:
+            return SimulationResult.from_entry(entry)
+
+    spacecraft = Spacecraft(config.spacecraft)
+    planet = Planet(config.planet)
+    physics = Physics(config.physics, planet, spacecraft)
+    simulation = Simulation(config.simulation,
+                            spacecraft = spacecraft,
+                            planet = planet,
+                            physics = physics)
+    simulation.run()
+
+    result = SimulationResult.from_simulation(simulation)
+    if cache is not None:
+        cache.put(key, result.to_entry())
+
+    return result
@@ -0,0 +1,101 @@
+"""
+Checkpoints, so a long run that gets killed (preempted, out of memory, out of time) can be
+carried on where it was instead of starting over.
+
+A checkpoint is one .npz file with the arrays of the state plus a JSON summary of everything
+else, written atomically (to a temporary file that then replaces the old checkpoint), so a run
+killed in the middle of writing one still has the previous one. Floats go through JSON by their
+repr, which reads back as exactly the same number, so a resumed run carries on bit for bit.
+
+Every checkpoint holds the fingerprint of the settings it was written with, and is refused by
+a run with different settings.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+FORMAT_VERSION = 1
+
+
+@dataclass
+class Checkpoint:
+    """
+    The saved state of a run: any number of arrays plus a JSON-able summary.
+    """
+    arrays: Dict[str, np.ndarray] = field(default_factory=dict)
+    summary: dict = field(default_factory=dict)
+
+
+def _plain(value: Any):
+    """
+    JSON stand in for the things json doesnt know: arrays, numpy numbers and the config
+    objects (as a dictionary of their settings).
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "__dict__"):
+        return {key: item for key, item in vars(value).items() if not key.startswith("_")}
+
+    raise TypeError(f"Cannot fingerprint a {type(value).__name__}.")
+
+
+def fingerprint(*settings) -> str:
+    """
+    A tag of the settings a run was started with (config objects, dictionaries, arrays, numbers).
+    """
+    contents = json.dumps(settings, default=_plain, sort_keys=True)
+    return hashlib.sha256(contents.encode()).hexdigest()[:16]
+
+
+def save_checkpoint(path: Path, checkpoint: Checkpoint, tag: str) -> None:
+    """
+    Writes the checkpoint atomically, replacing the previous one.
+
+    Args:
+        tag (str): the fingerprint of the settings of the run.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    summary = dict(checkpoint.summary, format_version=FORMAT_VERSION, fingerprint=tag)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as f:
+        np.savez(f, summary=np.array(json.dumps(summary)), **checkpoint.arrays)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path: Path, tag: str) -> Optional[Checkpoint]:
+    """
+    The checkpoint in the file, nothing if there isnt one.
+
+    Raises:
+        ValueError: if the checkpoint was written by a run with other settings (or another
+            version of the format).
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    with np.load(path, allow_pickle=False) as data:
+        summary = json.loads(str(data["summary"]))
+        arrays = {name: data[name] for name in data.files if name != "summary"}
+
+    if summary.get("format_version") != FORMAT_VERSION or summary.get("fingerprint") != tag:
+        raise ValueError(f"The checkpoint {path} was written by a run with other settings. "
+                         "Delete it (or turn resume off) to start over.")
+
+    return Checkpoint(arrays, summary)
+
+
+def remove_checkpoint(path: Path) -> None:
+    Path(path).unlink(missing_ok=True)
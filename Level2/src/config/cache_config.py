@@ -0,0 +1,30 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class CacheConfig:
+    """
+    The optional `cache:` section of the config file, for the on disk cache of simulation
+    results (see src/cache.py). Off unless it is turned on.
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        self.enabled = raw_config.get('enabled', False)
+        self.directory = raw_config.get('directory', "cache")
+
+        # Once the cache gets bigger than this, the least recently used results are deleted
+        self.max_size_mb = raw_config.get('max_size_mb', 500)
+
+
+    def validate(self):
+
+        if type(self.enabled) != bool:
+            raise ValueError("cache: enabled can only be a boolean.")
+        if type(self.directory) != str or not self.directory:
+            raise ValueError("The cache directory must be given as a string.")
+        if self.max_size_mb <= 0:
+            raise ValueError("The cache max_size_mb must be greater than zero.")
@@ -4,8 +4,16 @@ from .spacecraft_config import SpacecraftConfig
 from .planet_config import PlanetConfig
 from .simulation_config import SimulationConfig
 from .physics_config import PhysicsConfig
+from .dispersion_config import DispersionConfig
+from .cache_config import CacheConfig
+from .sweep_config import SweepConfig
+from .corridor_config import CorridorConfig
+from .plotting_config import PlottingConfig
+
+from .overrides import apply_setting
 
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 import yaml
 
@@ -18,15 +26,49 @@ class ConfigurationManager:
     configuration is complete.
     """
     
-    def __init__(self, config_path: Path):
+    def __init__(self, config_path: Path, settings: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            config_path (Path): the YAML config file.
+            settings (Optional[Dict[str, Any]]): settings to change from the file, by their
+                dotted path (e.g. {"simulation.end_time": 2000}, see overrides.py).
+        """
+        raw_config = self._load_yaml_file(config_path)
+        for path, value in (settings or {}).items():
+            apply_setting(raw_config, path, value)
+
+        self._configure(raw_config)
 
-        self.raw_config_file = self._load_yaml_file(config_path)
+
+    @classmethod
+    def from_raw_config(cls, raw_config: dict) -> "ConfigurationManager":
+        """
+        The configuration from settings already read in (the layout of the YAML file), e.g.
+        a config file with an override file merged over it.
+        """
+        manager = cls.__new__(cls)
+        manager._configure(raw_config)
+        return manager
+
+
+    def _configure(self, raw_config: dict):
+
+        self.raw_config_file = raw_config
 
         self.spacecraft = SpacecraftConfig(self.raw_config_file['spacecraft'])
         self.planet = PlanetConfig(self.raw_config_file['planet'])
         self.simulation = SimulationConfig(self.raw_config_file['simulation'])
         self.physics = PhysicsConfig(self.raw_config_file['simulation']['physics'])
 
+        # Only needed for Monte Carlo runs, so it can be left out of the file
+        self.dispersion = DispersionConfig(self.raw_config_file.get('dispersion'))
+        self.cache = CacheConfig(self.raw_config_file.get('cache'))
+        self.plotting = PlottingConfig(self.raw_config_file.get('plotting'))
+
+        # Only needed for parameter sweeps and corridor searches (run_sweep.py, run_corridor.py)
+        self.sweep = SweepConfig(self.raw_config_file.get('sweep'))
+        self.corridor = CorridorConfig(self.raw_config_file.get('corridor'))
+
         self.validate_all()
 
 
@@ -50,4 +92,14 @@ class ConfigurationManager:
         self.planet.validate()
         self.simulation.validate()
         self.physics.validate()
+        self.dispersion.validate()
+        self.cache.validate()
+        self.plotting.validate()
+        self.sweep.validate()
+        self.corridor.validate()
+
+        # The analytic coast is a two-body orbit in an inertial frame
+        if self.simulation.coast.enabled and self.physics.include_coriolis:
+            raise ValueError("The coast to the entry interface cant be used in the rotating frame "
+                             "(include_coriolis), turn one of them off.")
 
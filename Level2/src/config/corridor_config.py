@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class CorridorConfig:
+    """
+    The optional `corridor:` section of the config file, for finding the entry corridor: the
+    range of flight path angles between skipping off the atmosphere (too shallow) and going
+    over the deceleration or heating limit (too steep). Used by run_corridor.py.
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        # Entry conditions the flight path angle is varied around. No entry speed keeps the
+        # speed of the initial velocity in the config file.
+        self.entry_altitude = raw_config.get('entry_altitude', 120000)
+        self.entry_speed = raw_config.get('entry_speed', None)
+
+        # Flight path angles (degrees, negative is descending) the corridor is searched within
+        self.steepest_angle = raw_config.get('steepest_angle', -20.0)
+        self.shallowest_angle = raw_config.get('shallowest_angle', -0.5)
+
+        # Climbing back above this altitude counts as skipping out. Nothing uses entry_altitude.
+        self.atmosphere_top = raw_config.get('atmosphere_top', None)
+
+        # Going over either limit makes the angle too steep (no heating limit is no limit)
+        self.deceleration_limit = raw_config.get('deceleration_limit', 10.0)  # g's
+        self.heating_limit = raw_config.get('heating_limit', None)  # W/m^2
+
+        # Trajectories run (in parallel) per round of the search, how close the limits have
+        # to be pinned down (degrees) and the most rounds to take getting there
+        self.probes = raw_config.get('probes', 4)
+        self.tolerance = raw_config.get('tolerance', 0.01)
+        self.max_rounds = raw_config.get('max_rounds', 20)
+
+        # Same meaning as in the dispersion section
+        self.workers = raw_config.get('workers', 0)
+
+
+    def validate(self):
+
+        if self.entry_altitude <= 0:
+            raise ValueError("The corridors entry_altitude must be above the surface.")
+        if self.entry_speed is not None and self.entry_speed <= 0:
+            raise ValueError("The corridors entry_speed must be greater than zero.")
+        if not -90 <= self.steepest_angle < self.shallowest_angle <= 90:
+            raise ValueError("The corridors steepest_angle must be below its shallowest_angle (degrees, within +-90).")
+        if self.atmosphere_top is not None and self.atmosphere_top <= 0:
+            raise ValueError("The corridors atmosphere_top must be above the surface.")
+        if self.deceleration_limit <= 0:
+            raise ValueError("The deceleration_limit must be greater than zero.")
+        if self.heating_limit is not None and self.heating_limit <= 0:
+            raise ValueError("The heating_limit must be greater than zero.")
+        if type(self.probes) != int or self.probes < 2:
+            raise ValueError("The corridor needs at least 2 probes per round.")
+        if self.tolerance <= 0:
+            raise ValueError("The corridor tolerance must be greater than zero.")
+        if type(self.max_rounds) != int or self.max_rounds < 1:
+            raise ValueError("max_rounds must be a positive integer.")
+        if type(self.workers) != int or self.workers < 0:
+            raise ValueError("workers must be a non-negative integer (0 for every core).")
@@ -0,0 +1,201 @@
+
+from dataclasses import dataclass
+
+
+@dataclass
+class PerturbationConfig:
+    """
+    The distribution one dispersed parameter is drawn from, as an offset from its nominal value.
+
+    "normal" uses `standard_deviation` and "uniform" uses `half_width` (offsets drawn from
+    [-half_width, half_width]). For the vector parameters (position, velocity) both can be
+    given per component as a list of 3 values.
+
+    For importance sampling, the cases can be drawn from a shifted and/or widened version of
+    the distribution instead (importance_shift, in units of the spread, and importance_scale,
+    a factor on the spread), with every case weighted by how much more or less likely it is
+    under the real distribution. That puts more cases out in the off-nominal tails.
+    """
+
+    DISTRIBUTIONS = ("normal", "uniform")
+
+    def __init__(self, name: str, raw_config: dict):
+
+        self.name = name
+        self.distribution = raw_config.get('distribution', "normal")
+
+        if self.distribution == "normal":
+            if "standard_deviation" not in raw_config:
+                raise ValueError(f"The normal perturbation of {name} needs a standard_deviation.")
+            self.spread = raw_config['standard_deviation']
+
+        elif self.distribution == "uniform":
+            if "half_width" not in raw_config:
+                raise ValueError(f"The uniform perturbation of {name} needs a half_width.")
+            self.spread = raw_config['half_width']
+
+        else:
+            raise ValueError(f"Unknown distribution '{self.distribution}' for {name}. "
+                             f"Choose one of: {', '.join(self.DISTRIBUTIONS)}")
+
+        self.importance_shift = raw_config.get('importance_shift', 0.0)
+        self.importance_scale = raw_config.get('importance_scale', 1.0)
+
+
+    def validate(self):
+
+        spreads = self.spread if isinstance(self.spread, list) else [self.spread]
+        if any(spread < 0 for spread in spreads):
+            raise ValueError(f"The spread of the {self.name} perturbation cannot be negative.")
+
+        scales = self.importance_scale if isinstance(self.importance_scale, list) else [self.importance_scale]
+        if any(scale <= 0 for scale in scales):
+            raise ValueError(f"The importance_scale of the {self.name} perturbation must be greater than zero.")
+
+
+    def is_importance_sampled(self) -> bool:
+        shifts = self.importance_shift if isinstance(self.importance_shift, list) else [self.importance_shift]
+        scales = self.importance_scale if isinstance(self.importance_scale, list) else [self.importance_scale]
+        return any(shift != 0 for shift in shifts) or any(scale != 1 for scale in scales)
+
+
+@dataclass
+class ConvergenceConfig:
+    """
+    The optional `convergence:` block of the dispersion section. When enabled, no more cases are
+    started once the landing statistics are known to within the tolerances (at the confidence
+    level), so number_of_cases becomes the most cases that will be run. Tolerances that arent
+    given arent checked.
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        self.enabled = raw_config.get('enabled', False)
+        self.confidence = raw_config.get('confidence', 0.95)
+
+        # Dont stop before this many cases, however good the statistics look
+        self.min_cases = raw_config.get('min_cases', 100)
+
+        # Confidence interval half widths: of the mean landing point (m), of the footprint ellipse
+        # axes (relative, 0.05 is +-5 %) and of the miss distance percentiles (m, the distance
+        # from the nominal landing point that the given % of the landings stay within)
+        self.mean_tolerance = raw_config.get('mean_tolerance', None)
+        self.footprint_tolerance = raw_config.get('footprint_tolerance', None)
+        self.percentiles = raw_config.get('percentiles', [50, 90, 99])
+        self.percentile_tolerance = raw_config.get('percentile_tolerance', None)
+
+        # Relative accuracy of the quantile sketch the percentiles come from
+        self.relative_accuracy = raw_config.get('relative_accuracy', 0.005)
+
+
+    def validate(self):
+
+        if type(self.enabled) != bool:
+            raise ValueError("convergence: enabled can only be a boolean.")
+        if not 0 < self.confidence < 1:
+            raise ValueError("The convergence confidence must be between 0 and 1.")
+        if type(self.min_cases) != int or self.min_cases < 2:
+            raise ValueError("The convergence min_cases must be an integer of at least 2.")
+        for tolerance in (self.mean_tolerance, self.footprint_tolerance, self.percentile_tolerance):
+            if tolerance is not None and tolerance <= 0:
+                raise ValueError("The convergence tolerances must be greater than zero.")
+        if not isinstance(self.percentiles, list) or any(not 0 < percentile < 100 for percentile in self.percentiles):
+            raise ValueError("The convergence percentiles must be a list of values between 0 and 100.")
+        if not 0 < self.relative_accuracy < 1:
+            raise ValueError("The convergence relative_accuracy must be between 0 and 1.")
+        if self.enabled and (self.mean_tolerance is None and self.footprint_tolerance is None
+                             and self.percentile_tolerance is None):
+            raise ValueError("Convergence is enabled but none of its tolerances are set.")
+
+
+@dataclass
+class DispersionConfig:
+    """
+    The optional `dispersion:` section of the config file, describing a Monte Carlo run of
+    many perturbed copies of the nominal trajectory.
+    """
+
+    # Parameters that can be dispersed, and how many values each one has
+    PARAMETERS = {"position": 3,
+                  "velocity": 3,
+                  "mass": 1,
+                  "drag_coefficient": 1,
+                  "cross_sectional_area": 1,
+                  "scale_height": 1,
+                  "sea_level_density": 1}
+
+    # How the cases are spread over the distributions: independent random draws, or the
+    # scrambled low discrepancy sequences / latin hypercube (these need scipy)
+    SAMPLING_METHODS = ("random", "sobol", "halton", "latin_hypercube")
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        self.number_of_cases = raw_config.get('number_of_cases', 100)
+        self.seed = raw_config.get('seed', 0)
+        self.sampling = raw_config.get('sampling', "random")
+
+        # 0 (or nothing) means use every core
+        self.workers = raw_config.get('workers', 0)
+
+        # How many cases a worker process is handed at a time
+        self.cases_per_task = raw_config.get('cases_per_task', 20)
+
+        # Whether to keep the results row of every case. With very many cases, turn this off
+        # and only the landing heat map (which has a fixed size) is kept.
+        self.keep_results = raw_config.get('keep_results', True)
+
+        # With a checkpoint file the progress (the cases done, their results and the heat map)
+        # is saved there every checkpoint_interval seconds (of real time), and with resume on
+        # a dispersion that was interrupted carries on from it. It is deleted once the run is done.
+        self.checkpoint_file = raw_config.get('checkpoint_file', None)
+        self.checkpoint_interval = raw_config.get('checkpoint_interval', 60)
+        self.resume = raw_config.get('resume', True)
+
+        # Resolution of the landing heat map
+        heatmap = raw_config.get('heatmap') or {}
+        self.heatmap_latitude_bins = heatmap.get('latitude_bins', 180)
+        self.heatmap_longitude_bins = heatmap.get('longitude_bins', 360)
+
+        self.convergence = ConvergenceConfig(raw_config.get('convergence'))
+
+        self.perturbations = {}
+        for name, raw_perturbation in (raw_config.get('perturbations') or {}).items():
+            if name not in self.PARAMETERS:
+                raise ValueError(f"Cannot disperse '{name}'. Choose from: {', '.join(self.PARAMETERS)}")
+            self.perturbations[name] = PerturbationConfig(name, raw_perturbation)
+
+
+    def validate(self):
+
+        if type(self.number_of_cases) != int or self.number_of_cases < 1:
+            raise ValueError("number_of_cases must be a positive integer.")
+        if type(self.seed) != int or self.seed < 0:
+            raise ValueError("The dispersion seed must be a non-negative integer.")
+        if self.sampling not in self.SAMPLING_METHODS:
+            raise ValueError(f"Unknown sampling '{self.sampling}'. Choose one of: {', '.join(self.SAMPLING_METHODS)}")
+        if type(self.workers) != int or self.workers < 0:
+            raise ValueError("workers must be a non-negative integer (0 for every core).")
+        if type(self.cases_per_task) != int or self.cases_per_task < 1:
+            raise ValueError("cases_per_task must be a positive integer.")
+        if type(self.keep_results) != bool:
+            raise ValueError("keep_results must be true or false.")
+        if self.checkpoint_file is not None and (type(self.checkpoint_file) != str or not self.checkpoint_file):
+            raise ValueError("The dispersions checkpoint_file must be given as a path.")
+        if self.checkpoint_interval <= 0:
+            raise ValueError("The dispersions checkpoint_interval must be greater than zero.")
+        if type(self.resume) != bool:
+            raise ValueError("The dispersions resume option must be true or false.")
+        if type(self.heatmap_latitude_bins) != int or self.heatmap_latitude_bins < 1:
+            raise ValueError("The heat maps latitude_bins must be a positive integer.")
+        if type(self.heatmap_longitude_bins) != int or self.heatmap_longitude_bins < 1:
+            raise ValueError("The heat maps longitude_bins must be a positive integer.")
+
+        self.convergence.validate()
+        for perturbation in self.perturbations.values():
+            perturbation.validate()
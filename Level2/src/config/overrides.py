@@ -0,0 +1,195 @@
+import copy
+import csv
+
+import yaml
+
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+
+# Changes to the settings of a config file before it is turned into the config classes, for
+# running the same config with a few settings changed (run_batch.py, main.py --set). A
+# setting is named by its dotted path in the file, e.g. "spacecraft.design_parameters.mass"
+# or "simulation.physics.include_coriolis", and an item of a list by its index, e.g.
+# "spacecraft.initial_state.position.0". A setting has to be in the base config file already,
+# unless its one of the OPTIONAL_SETTINGS, so a misspelled path is an error rather than a
+# setting nothing reads.
+
+
+# The settings that can be left out of a config file (the config classes have a default for
+# them), and so can be added by an override: for each section, by its dotted path, the names
+# of its optional settings and sections. A "*" stands for any name, like the names of the
+# dispersed parameters.
+OPTIONAL_SETTINGS: Dict[str, Set[str]] = {
+    "": {"dispersion", "cache", "plotting", "sweep", "corridor"},
+    "spacecraft.design_parameters": {"nose_radius", "lift_coefficient", "bank_angle"},
+    "planet": {"j2", "rotation_rate"},
+    "planet.atmosphere": {"sea_level_density", "scale_height", "table_step", "table_top_altitude"},
+    "simulation": {"integrator", "coast", "events", "termination", "output", "instrumentation", "checkpoint"},
+    "simulation.integrator": {"type", "relative_tolerance", "absolute_tolerance", "max_step_attempts",
+                              "max_step_size", "fast_path"},
+    "simulation.coast": {"enabled", "entry_interface_altitude", "samples"},
+    "simulation.events": {"altitude_crossings", "peak_deceleration", "peak_heating", "peak_dynamic_pressure"},
+    "simulation.termination": {"skip_out", "atmosphere_top", "minimum_altitude", "max_deceleration",
+                               "max_heating", "wall_clock_budget"},
+    "simulation.physics": {"gravity_model", "additional_forces"},
+    "simulation.output": {"save_frequency", "output_interval", "trajectory_store", "store_chunk_rows"},
+    "simulation.instrumentation": {"trace_level", "sample_every", "trace_buffer_size", "trace_file", "timers"},
+    "simulation.checkpoint": {"file", "interval", "resume"},
+    "plotting": {"headless", "output_directory", "formats", "point_budget", "plots", "workers"},
+    "plotting.plots.*": {"plot", "source", "trajectories", "name"},
+    "cache": {"enabled", "directory", "max_size_mb"},
+    "sweep": {"method", "number_of_cases", "seed", "entry_altitude", "workers", "cases_per_task",
+              "results_file", "resume", "parameters"},
+    "sweep.parameters": {"*"},
+    "sweep.parameters.*": {"values", "minimum", "maximum", "count"},
+    "corridor": {"entry_altitude", "entry_speed", "steepest_angle", "shallowest_angle", "atmosphere_top",
+                 "deceleration_limit", "heating_limit", "probes", "tolerance", "max_rounds", "workers"},
+    "dispersion": {"number_of_cases", "seed", "sampling", "workers", "cases_per_task", "keep_results",
+                   "checkpoint_file", "checkpoint_interval", "resume", "heatmap", "convergence", "perturbations"},
+    "dispersion.heatmap": {"latitude_bins", "longitude_bins"},
+    "dispersion.convergence": {"enabled", "confidence", "min_cases", "mean_tolerance", "footprint_tolerance",
+                               "percentiles", "percentile_tolerance", "relative_accuracy"},
+    "dispersion.perturbations": {"*"},
+    "dispersion.perturbations.*": {"distribution", "standard_deviation", "half_width",
+                                   "importance_shift", "importance_scale"},
+}
+
+
+def is_optional_setting(path: str) -> bool:
+    """
+    Whether the setting (or section) with this dotted path can be left out of a config file.
+    """
+    *section, name = path.split(".")
+    for section_path, names in OPTIONAL_SETTINGS.items():
+        pattern = section_path.split(".") if section_path else []
+        if (len(pattern) == len(section) and all(part in ("*", key) for part, key in zip(pattern, section))
+                and (name in names or "*" in names)):
+            return True
+
+    return False
+
+
+def check_new_setting(path: str) -> None:
+    """
+    Raises:
+        ValueError: if the setting isnt in the config file and cant be added to it either.
+    """
+    if not is_optional_setting(path):
+        raise ValueError(f"'{path}' is not a setting of the config file, nor an optional one that can be "
+                         "added to it. Check the spelling of the path.")
+
+
+def parse_value(text: str) -> Any:
+    """
+    A setting given as text (on the command line, in a CSV cell) as the value it would be in
+    the YAML file: numbers, true/false, null, [lists] or else the text itself.
+    """
+    value = yaml.safe_load(text)
+
+    # YAML only reads 1e3 as a number when it has a decimal point
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+    return value
+
+
+def parse_assignment(assignment: str) -> Tuple[str, Any]:
+    """
+    A "key=value" setting (e.g. simulation.end_time=2000), split into the dotted path and
+    the parsed value.
+    """
+    path, separator, text = assignment.partition("=")
+    if not separator or not path.strip():
+        raise ValueError(f"Settings are given as key=value (e.g. simulation.end_time=2000), not '{assignment}'.")
+
+    return path.strip(), parse_value(text.strip())
+
+
+def apply_setting(raw_config: dict, path: str, value: Any) -> None:
+    """
+    Sets one setting of a raw (as read from YAML) config in place, making any sections on the
+    way that arent in the file yet (e.g. an optional `cache:` section).
+
+    Raises:
+        ValueError: if the path goes through something that isnt a section or list, or past
+            the end of a list, or names a setting that isnt in the file and isnt optional.
+    """
+    keys = path.split(".")
+    node = raw_config
+    for depth, key in enumerate(keys):
+        name = ".".join(keys[:depth + 1])
+        last = depth == len(keys) - 1
+
+        if isinstance(node, list):
+            if not key.lstrip("-").isdigit() or not -len(node) <= int(key) < len(node):
+                raise ValueError(f"'{name}' is not an item of the list {'.'.join(keys[:depth])}.")
+            key = int(key)
+        elif not isinstance(node, dict):
+            raise ValueError(f"Cannot set '{path}', {'.'.join(keys[:depth])} is not a section of the config.")
+        else:
+            if key not in node:
+                check_new_setting(name)
+            if not last and node.get(key) is None:
+                node[key] = {}
+
+        if last:
+            node[key] = value
+        else:
+            node = node[key]
+
+
+def merge_settings(raw_config: dict, overrides: dict, path: str = "") -> dict:
+    """
+    A copy of a raw config with the settings of another (e.g. an override file with only the
+    settings that change, in the same layout) put over it. Sections are merged setting by
+    setting, anything else (numbers, lists) is replaced.
+
+    Args:
+        path (str): the dotted path of the section being merged, "" for the whole config.
+
+    Raises:
+        ValueError: if the overrides have a setting that isnt in the raw config and isnt optional.
+    """
+    merged = copy.deepcopy(raw_config)
+    for key, value in (overrides or {}).items():
+        name = f"{path}.{key}" if path else str(key)
+        if key not in merged:
+            check_new_setting(name)
+
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_settings(merged[key], value, name)
+        elif isinstance(value, dict) and merged.get(key) is None:
+            # A section that isnt in the file yet, whose settings get checked the same way
+            merged[key] = merge_settings({}, value, name)
+        else:
+            merged[key] = copy.deepcopy(value)
+
+    return merged
+
+
+def read_override_file(path: Path) -> dict:
+    with open(path) as f:
+        overrides = yaml.safe_load(f) or {}
+
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{path} must have the same layout (sections) as the config file.")
+    return overrides
+
+
+def read_setting_rows(path: Path) -> List[Dict[str, Any]]:
+    """
+    The rows of a CSV of settings, the header being the dotted paths of the settings (e.g.
+    spacecraft.design_parameters.mass) and every row one set of values. Empty cells keep the
+    value of the config file.
+    """
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames:
+            raise ValueError(f"{path} needs a header row naming the settings of each column.")
+
+        return [{name.strip(): parse_value(text) for name, text in row.items() if text is not None and text.strip()}
+                for row in reader]
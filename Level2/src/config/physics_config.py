@@ -25,6 +25,12 @@ class PhysicsConfig:
         self.include_heating = raw_config['include_heating']
         self.include_coriolis = raw_config['include_coriolis']
 
+        # "point_mass" or "J2" (which adds the planets equatorial bulge)
+        self.gravity_model = raw_config.get('gravity_model', "point_mass")
+
+        # Names of any other registered force models to add on (see src/forces.py)
+        self.additional_forces = raw_config.get('additional_forces') or []
+
 
     def validate(self):
         if (type(self.include_drag) or type(self.include_lift) or type(self.include_heating) 
@@ -32,5 +38,10 @@ class PhysicsConfig:
             
             raise ValueError("The include_* statements can only be a boolean.")
 
+        if self.gravity_model not in ("point_mass", "J2"):
+            raise ValueError("gravity_model must be either point_mass or J2.")
+        if type(self.additional_forces) != list:
+            raise ValueError("additional_forces must be a list of force model names.")
+
 
 
@@ -15,6 +15,10 @@ class PlanetConfig:
 
         self.mass = float(raw_config['mass'])
         self.radius = float(raw_config['radius'])
+
+        # Only used by the J2 gravity model and the rotating frame, so they default to Earths
+        self.j2 = float(raw_config.get('j2', 1.08263e-3))
+        self.rotation_rate = float(raw_config.get('rotation_rate', 7.2921159e-5))  # radians/second
         self.atmospheric_model = raw_config['atmosphere']['atmospheric_density_model']
 
         if self.atmospheric_model == "exponential_decay":
@@ -26,14 +30,30 @@ class PlanetConfig:
                 raise ValueError("For this model, you need to specify the sea level air density \
                                  & scale of the model.")
 
+        # Tabulated models are worked out once on a regular altitude grid, this fine (m) ...
+        self.table_step = float(raw_config['atmosphere'].get('table_step', 100))
+        # ... from the surface up to here (m). Above it the table is extrapolated.
+        self.table_top_altitude = float(raw_config['atmosphere'].get('table_top_altitude', 1000000))
+
     def validate(self):
 
         if self.mass <= 0:
             raise ValueError("Planets mass cannot be negative or zero.")
         if self.radius <= 0:
             raise ValueError("Planets radius cannot be negative or zero.")
+        if self.j2 < 0:
+            raise ValueError("Planets j2 cannot be negative.")
 
         if type(self.atmospheric_model) != str:
             raise ValueError("Please enter a valid model and in the form of a string.")
+        if self.atmospheric_model == "exponential_decay":
+            if self.sea_level_density <= 0:
+                raise ValueError("The sea level density must be greater than zero.")
+            if self.scale_height <= 0:
+                raise ValueError("The scale height must be greater than zero.")
+        if self.table_step <= 0:
+            raise ValueError("The atmosphere table_step must be positive.")
+        if self.table_top_altitude <= self.table_step:
+            raise ValueError("The atmosphere table_top_altitude must be above the first table_step.")
         
 
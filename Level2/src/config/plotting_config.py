@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class RenderPlotConfig:
+    """
+    One entry of the `plots:` list of a render job: which plot to draw from which saved results.
+    """
+
+    # The plots a render job can draw, and what their source is
+    PLOTS = ("velocity",        # speed vs. time of each trajectory in a trajectory store
+             "trajectory_2d",   # x-y plane view of each trajectory in a trajectory store
+             "trajectory_3d",   # 3D view of each trajectory in a trajectory store
+             "crash_point",     # map (HTML) of where each trajectory in a trajectory store ended
+             "ensemble",        # altitude vs. time of every trajectory in a store, overlaid
+             "heatmap")         # a landing heat map saved by run_dispersion.py (.npz)
+
+    def __init__(self, raw_config: dict):
+
+        self.plot = raw_config.get('plot', None)
+        self.source = raw_config.get('source', None)
+
+        # Which trajectories of the store to plot (numbered in the order they were written), all by default
+        self.trajectories = raw_config.get('trajectories', None)
+
+        # Base name of the files written, the plots usual name by default. Plots of single
+        # trajectories get the trajectory number added on the end.
+        self.name = raw_config.get('name', None)
+
+
+    def validate(self):
+
+        if self.plot not in self.PLOTS:
+            raise ValueError(f"Unknown plot '{self.plot}'. Choose one of: {', '.join(self.PLOTS)}")
+        if type(self.source) != str or not self.source:
+            raise ValueError(f"The {self.plot} plot needs the path of its source results.")
+        if self.trajectories is not None:
+            if (not isinstance(self.trajectories, list) or
+                    any(type(trajectory) != int or trajectory < 0 for trajectory in self.trajectories)):
+                raise ValueError("trajectories must be a list of non-negative trajectory numbers.")
+        if self.name is not None and (type(self.name) != str or not self.name):
+            raise ValueError("The name of a plot must be a non-empty string.")
+
+
+@dataclass
+class PlottingConfig:
+    """
+    The optional `plotting:` section of the config file, how plots are shown and saved. The
+    same layout (with a `plots:` list) describes a batch render job for run_render.py, which
+    draws plots afterwards from saved results, always headless.
+    """
+
+    # Formats the plots can be saved in. Matplotlib plots are written in the image formats
+    # and the plotly maps as html (the only one that doesnt need an extra package).
+    FORMATS = ("pdf", "png", "svg", "html")
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        # Headless never opens a window (non-interactive backend), plots are only written to
+        # files. For batch runs and machines without a display.
+        self.headless = raw_config.get('headless', False)
+
+        self.output_directory = raw_config.get('output_directory', "plots")
+        self.formats = raw_config.get('formats', ["pdf"])
+
+        # Curves are decimated down to this many points before plotting (None for every point)
+        self.point_budget = raw_config.get('point_budget', 2000)
+
+        # Render jobs only: the plots to draw, and how many worker processes draw them (0 for every core)
+        self.plots = [RenderPlotConfig(raw_plot) for raw_plot in (raw_config.get('plots') or [])]
+        self.workers = raw_config.get('workers', 1)
+
+
+    def validate(self):
+
+        if type(self.headless) != bool:
+            raise ValueError("plotting: headless can only be a boolean.")
+        if type(self.output_directory) != str or not self.output_directory:
+            raise ValueError("The plotting output_directory must be given as a string.")
+        if not isinstance(self.formats, list) or len(self.formats) == 0:
+            raise ValueError("The plotting formats must be a non-empty list.")
+        for plot_format in self.formats:
+            if plot_format not in self.FORMATS:
+                raise ValueError(f"Unknown plot format '{plot_format}'. Choose from: {', '.join(self.FORMATS)}")
+        if self.point_budget is not None and (type(self.point_budget) != int or self.point_budget < 3):
+            raise ValueError("The plotting point_budget must be an integer of at least 3 (or null for every point).")
+        if type(self.workers) != int or self.workers < 0:
+            raise ValueError("workers must be a non-negative integer (0 for every core).")
+
+        for plot in self.plots:
+            plot.validate()
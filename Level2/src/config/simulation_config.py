@@ -2,6 +2,258 @@
 from dataclasses import dataclass
 
 
+@dataclass
+class IntegratorConfig:
+    """
+    The `integrator:` block of the simulation section in the config file.
+    Every option has a default, so the block can be left out entirely.
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        self.type = raw_config.get('type', "RK4")
+        self.relative_tolerance = float(raw_config.get('relative_tolerance', 1.0e-6))
+        self.absolute_tolerance = float(raw_config.get('absolute_tolerance', 1.0e-8))
+        self.max_step_attempts = raw_config.get('max_step_attempts', 10)
+
+        # Upper limit on the step an adaptive integrator is allowed to take (None is no limit)
+        self.max_step_size = raw_config.get('max_step_size', None)
+
+        # Single spacecraft RK4 runs on plain floats instead of small arrays (same results, faster)
+        self.fast_path = raw_config.get('fast_path', True)
+
+
+    def validate(self):
+
+        if type(self.type) != str:
+            raise ValueError("The integrator type must be given as a string.")
+
+        # Imported here as the integrators module needs this config class itself
+        from ..integrators import INTEGRATORS
+        if self.type not in INTEGRATORS:
+            raise ValueError(f"Unknown integrator type '{self.type}'. Choose one of: {', '.join(INTEGRATORS)}")
+        if self.relative_tolerance <= 0 or self.absolute_tolerance <= 0:
+            raise ValueError("The integrator tolerances must be greater than zero.")
+        if type(self.max_step_attempts) != int or self.max_step_attempts < 1:
+            raise ValueError("max_step_attempts must be a positive integer.")
+        if self.max_step_size is not None and self.max_step_size <= 0:
+            raise ValueError("max_step_size must be greater than zero.")
+        if type(self.fast_path) != bool:
+            raise ValueError("fast_path must be true or false.")
+
+
+@dataclass
+class CoastConfig:
+    """
+    The optional `coast:` block of the simulation section. When enabled, the vacuum part of the
+    trajectory above the entry interface is solved analytically instead of being integrated.
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        self.enabled = raw_config.get('enabled', False)
+        self.entry_interface_altitude = float(raw_config.get('entry_interface_altitude', 300000))
+
+        # How many points along the analytic arc get stored in the history (for plotting)
+        self.samples = raw_config.get('samples', 100)
+
+
+    def validate(self):
+
+        if type(self.enabled) != bool:
+            raise ValueError("coast: enabled can only be a boolean.")
+        if self.entry_interface_altitude <= 0:
+            raise ValueError("The entry interface altitude must be above the surface.")
+        if type(self.samples) != int or self.samples < 0:
+            raise ValueError("coast: samples must be a non-negative integer.")
+
+
+@dataclass
+class EventsConfig:
+    """
+    The optional `events:` block of the simulation section, switching on the built in events
+    that get located precisely during a run (surface impact is always on).
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        self.altitude_crossings = raw_config.get('altitude_crossings', []) or []
+        self.peak_deceleration = raw_config.get('peak_deceleration', False)
+        self.peak_heating = raw_config.get('peak_heating', False)
+        self.peak_dynamic_pressure = raw_config.get('peak_dynamic_pressure', False)
+
+
+    def validate(self):
+
+        if (type(self.peak_deceleration) != bool or type(self.peak_heating) != bool
+                or type(self.peak_dynamic_pressure) != bool):
+            raise ValueError("The peak_* event options can only be a boolean.")
+        for altitude in self.altitude_crossings:
+            if altitude < 0:
+                raise ValueError("Altitude crossings must be at or above the surface.")
+
+
+@dataclass
+class TerminationConfig:
+    """
+    The optional `termination:` block of the simulation section, the conditions that stop a run
+    early once there is no point carrying on (surface impact and end_time always do). Every
+    condition is off by default.
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        # Stop once the spacecraft is back above atmosphere_top on a two-body orbit that escapes
+        # (orbital energy >= 0), never comes down into the atmosphere again (periapsis above it) or
+        # only comes back after end_time. No atmosphere_top uses the coasts entry_interface_altitude.
+        self.skip_out = raw_config.get('skip_out', False)
+        self.atmosphere_top = raw_config.get('atmosphere_top', None)
+
+        # Altitude floor (m) to stop at on the way down, instead of the surface
+        self.minimum_altitude = raw_config.get('minimum_altitude', None)
+
+        # Stop when the felt deceleration (g's) or the stagnation point heat flux (W/m^2) goes over these
+        self.max_deceleration = raw_config.get('max_deceleration', None)
+        self.max_heating = raw_config.get('max_heating', None)
+
+        # Stop after this many seconds of (real) computing time
+        self.wall_clock_budget = raw_config.get('wall_clock_budget', None)
+
+
+    def validate(self):
+
+        if type(self.skip_out) != bool:
+            raise ValueError("termination: skip_out can only be a boolean.")
+        if self.atmosphere_top is not None and self.atmosphere_top <= 0:
+            raise ValueError("termination: atmosphere_top must be above the surface.")
+        if self.minimum_altitude is not None and self.minimum_altitude < 0:
+            raise ValueError("termination: minimum_altitude must be at or above the surface.")
+        if self.max_deceleration is not None and self.max_deceleration <= 0:
+            raise ValueError("termination: max_deceleration must be greater than zero.")
+        if self.max_heating is not None and self.max_heating <= 0:
+            raise ValueError("termination: max_heating must be greater than zero.")
+        if self.wall_clock_budget is not None and self.wall_clock_budget <= 0:
+            raise ValueError("termination: wall_clock_budget must be greater than zero.")
+
+
+@dataclass
+class OutputConfig:
+    """
+    The `output:` block of the simulation section, controlling how much of the trajectory
+    gets stored in the history.
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        # Store every save_frequency-th integrator step...
+        self.save_frequency = raw_config.get('save_frequency', 1)
+
+        # ...or, if given, the state every output_interval seconds instead (interpolated)
+        self.output_interval = raw_config.get('output_interval', None)
+
+        # Stream the history to a trajectory store (directory) on disk instead of keeping it in
+        # memory, in chunk files of store_chunk_rows states each (see src/trajectory_store.py)
+        self.trajectory_store = raw_config.get('trajectory_store', None)
+        self.store_chunk_rows = raw_config.get('store_chunk_rows', 65536)
+
+
+    def validate(self):
+
+        if type(self.save_frequency) != int or self.save_frequency < 1:
+            raise ValueError("save_frequency must be a positive integer.")
+        if self.output_interval is not None and self.output_interval <= 0:
+            raise ValueError("output_interval must be greater than zero.")
+        if self.trajectory_store is not None and type(self.trajectory_store) != str:
+            raise ValueError("trajectory_store must be the path of a directory.")
+        if type(self.store_chunk_rows) != int or self.store_chunk_rows < 1:
+            raise ValueError("store_chunk_rows must be a positive integer.")
+
+
+@dataclass
+class CheckpointConfig:
+    """
+    The `checkpoint:` block of the simulation section. With a file given, the state of the run
+    is saved to it every `interval` seconds (of real time), and a run started again with the
+    same settings carries on from there (bit for bit the same results) instead of from the
+    start. The file is deleted once the run is finished.
+    """
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        self.file = raw_config.get('file', None)
+        self.interval = raw_config.get('interval', 60)
+        self.resume = raw_config.get('resume', True)
+
+
+    def validate(self):
+
+        if self.file is not None and (type(self.file) != str or not self.file):
+            raise ValueError("The checkpoint file must be given as a path.")
+        if self.interval <= 0:
+            raise ValueError("The checkpoint interval must be greater than zero.")
+        if type(self.resume) != bool:
+            raise ValueError("checkpoint: resume can only be a boolean.")
+
+
+@dataclass
+class InstrumentationConfig:
+    """
+    The `instrumentation:` block of the simulation section, for the diagnostics of a run.
+    Off by default, so runs are silent.
+    """
+
+    TRACE_LEVELS = ("off", "events", "steps", "evaluations")
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        self.trace_level = raw_config.get('trace_level', "off")
+
+        # Only every sample_every-th step/evaluation record is kept (events always are)
+        self.sample_every = raw_config.get('sample_every', 1)
+
+        # How many of the most recent records are kept in memory
+        self.trace_buffer_size = raw_config.get('trace_buffer_size', 10000)
+
+        # Also write every kept record to this file (JSON lines), if given
+        self.trace_file = raw_config.get('trace_file', None)
+
+        # Time the integrator steps, event location and recording of every step
+        self.timers = raw_config.get('timers', False)
+
+
+    def validate(self):
+
+        if self.trace_level not in self.TRACE_LEVELS:
+            raise ValueError(f"trace_level must be one of: {', '.join(self.TRACE_LEVELS)}")
+        if type(self.sample_every) != int or self.sample_every < 1:
+            raise ValueError("sample_every must be a positive integer.")
+        if type(self.trace_buffer_size) != int or self.trace_buffer_size < 1:
+            raise ValueError("trace_buffer_size must be a positive integer.")
+        if type(self.timers) != bool:
+            raise ValueError("timers must be true or false.")
+
+
 @dataclass
 class SimulationConfig:
 
@@ -13,12 +265,21 @@ class SimulationConfig:
             raise ValueError("Simulation end time must be specified in config file.")
         if "time_step_size" not in raw_config:
             raise ValueError("Simulation time step size must be specified in config file.")
-        
+
         self.start_time = raw_config['start_time']
         self.end_time = raw_config["end_time"]
         self.time_step_size = raw_config['time_step_size']
-    
-    
+
+        # For the adaptive integrators time_step_size is only the first step that is tried
+        self.integrator = IntegratorConfig(raw_config.get('integrator'))
+        self.coast = CoastConfig(raw_config.get('coast'))
+        self.events = EventsConfig(raw_config.get('events'))
+        self.termination = TerminationConfig(raw_config.get('termination'))
+        self.output = OutputConfig(raw_config.get('output'))
+        self.checkpoint = CheckpointConfig(raw_config.get('checkpoint'))
+        self.instrumentation = InstrumentationConfig(raw_config.get('instrumentation'))
+
+
     def validate(self):
 
         if self.start_time < 0:
@@ -27,4 +288,16 @@ class SimulationConfig:
             raise ValueError("End time must be equal to or greater than start time.")
         if self.time_step_size == 0:
             raise ValueError("Time step size must be a nonzero number.")
-        
+
+        self.integrator.validate()
+        self.coast.validate()
+        self.events.validate()
+        self.termination.validate()
+        self.output.validate()
+        self.checkpoint.validate()
+        self.instrumentation.validate()
+
+        # The part of the history already streamed out cant be taken back to where the checkpoint was
+        if self.checkpoint.file is not None and self.output.trajectory_store is not None:
+            raise ValueError("Checkpoints cant be used with a trajectory_store, turn one of them off.")
+
@@ -28,6 +28,13 @@ class SpacecraftConfig:
         self.cross_sect_area = raw_config['design_parameters']['cross_sectional_area']
         self.mass = raw_config['design_parameters']['mass']
 
+        # Only used for the heating estimate, so its optional
+        self.nose_radius = raw_config['design_parameters'].get('nose_radius', 1.0)
+
+        # Only used when include_lift is on. Bank angle in degrees, positive banks right.
+        self.lift_coefficient = raw_config['design_parameters'].get('lift_coefficient', 0.0)
+        self.bank_angle = raw_config['design_parameters'].get('bank_angle', 0.0)
+
     def validate(self):
         """
         Check the values that were pulled to make sure they make sense and wont
@@ -46,6 +53,10 @@ class SpacecraftConfig:
             raise ValueError("The mass of the spacecraft must be greater than zero.")
         if self.cross_sect_area <= 0:
             raise ValueError("Cross sectional area of spacecraft must be greater than zero.")
+        if self.nose_radius <= 0:
+            raise ValueError("Nose radius of spacecraft must be greater than zero.")
+        if self.lift_coefficient < 0:
+            raise ValueError("Lift coefficient of spacecraft cannot be negative, bank it instead.")
         
 
         
\ No newline at end of file
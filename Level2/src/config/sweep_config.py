@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class SweepParameterConfig:
+    """
+    The values one swept parameter takes: either a list of `values`, or a range from `minimum`
+    to `maximum` (with `count` evenly spaced values for a grid sweep).
+    """
+
+    def __init__(self, name: str, raw_config: dict):
+
+        self.name = name
+        self.values = raw_config.get('values', None)
+        self.minimum = raw_config.get('minimum', None)
+        self.maximum = raw_config.get('maximum', None)
+        self.count = raw_config.get('count', None)
+
+        if self.values is None and (self.minimum is None or self.maximum is None):
+            raise ValueError(f"The sweep of {name} needs either values or a minimum and maximum.")
+
+
+    def validate(self, method: str):
+
+        if self.values is not None:
+            if not isinstance(self.values, list) or len(self.values) == 0:
+                raise ValueError(f"The values of the {self.name} sweep must be a non-empty list.")
+            if method == "latin_hypercube":
+                raise ValueError(f"A latin_hypercube sweep needs a minimum and maximum for {self.name}, not values.")
+            return
+
+        if self.maximum < self.minimum:
+            raise ValueError(f"The maximum of the {self.name} sweep is below its minimum.")
+        if method == "grid" and (type(self.count) != int or self.count < 1):
+            raise ValueError(f"A grid sweep of {self.name} over a range needs a positive integer count.")
+
+
+@dataclass
+class SweepConfig:
+    """
+    The optional `sweep:` section of the config file, a parameter study over the entry
+    conditions and design of the spacecraft (used by run_sweep.py).
+    """
+
+    # Parameters that can be swept (the ones not swept keep their value from the config file)
+    PARAMETERS = ("flight_path_angle",     # degrees, negative is descending
+                  "entry_speed",           # meters/second
+                  "mass",                  # kg
+                  "cross_sectional_area",  # m^2
+                  "drag_coefficient")
+
+    METHODS = ("grid", "latin_hypercube")
+
+    def __init__(self, raw_config: dict):
+
+        if raw_config is None:
+            raw_config = {}
+
+        # "grid" runs every combination of the values, "latin_hypercube" spreads number_of_cases
+        # cases over the ranges
+        self.method = raw_config.get('method', "grid")
+        self.number_of_cases = raw_config.get('number_of_cases', 100)
+        self.seed = raw_config.get('seed', 0)
+
+        # Altitude (m) the entry state of every case starts at. Nothing keeps the altitude of
+        # the initial position in the config file.
+        self.entry_altitude = raw_config.get('entry_altitude', None)
+
+        # Same meaning as in the dispersion section
+        self.workers = raw_config.get('workers', 0)
+        self.cases_per_task = raw_config.get('cases_per_task', 10)
+
+        # The results are written here as the cases finish, and with resume on a sweep that was
+        # interrupted carries on from the cases already in the file
+        self.results_file = raw_config.get('results_file', "plots/sweep_results.csv")
+        self.resume = raw_config.get('resume', True)
+
+        self.parameters = {}
+        for name, raw_parameter in (raw_config.get('parameters') or {}).items():
+            if name not in self.PARAMETERS:
+                raise ValueError(f"Cannot sweep '{name}'. Choose from: {', '.join(self.PARAMETERS)}")
+            self.parameters[name] = SweepParameterConfig(name, raw_parameter)
+
+
+    def validate(self):
+
+        if self.method not in self.METHODS:
+            raise ValueError(f"Unknown sweep method '{self.method}'. Choose one of: {', '.join(self.METHODS)}")
+        if type(self.number_of_cases) != int or self.number_of_cases < 1:
+            raise ValueError("The sweeps number_of_cases must be a positive integer.")
+        if type(self.seed) != int or self.seed < 0:
+            raise ValueError("The sweep seed must be a non-negative integer.")
+        if self.entry_altitude is not None and self.entry_altitude <= 0:
+            raise ValueError("The sweeps entry_altitude must be above the surface.")
+        if type(self.workers) != int or self.workers < 0:
+            raise ValueError("workers must be a non-negative integer (0 for every core).")
+        if type(self.cases_per_task) != int or self.cases_per_task < 1:
+            raise ValueError("cases_per_task must be a positive integer.")
+        if type(self.resume) != bool:
+            raise ValueError("The sweeps resume option must be true or false.")
+
+        for parameter in self.parameters.values():
+            parameter.validate(self.method)
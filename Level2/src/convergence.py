@@ -0,0 +1,253 @@
+import math
+
+import numpy as np
+
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Dict, List, Tuple
+
+from .config.dispersion_config import ConvergenceConfig
+from .heatmap import LandingHeatmap
+
+
+class QuantileSketch:
+    """
+    Streaming, mergeable sketch of a distribution of non-negative values (here the landing miss
+    distances), for its quantiles without keeping the values themselves.
+
+    Values are counted in logarithmically spaced bins (DDSketch), so any quantile comes back
+    within `relative_accuracy` of the true value, whatever the spread of the values, and the
+    size only grows with the log of the range of the values. Values can carry weights, and two
+    sketches with the same accuracy can be merged into one (e.g. from two worker processes).
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+        # Weight per bin, bin k covering (gamma^(k-1), gamma^k]. Zeros are counted on their own.
+        self.bins: Dict[int, float] = {}
+        self.zero_weight = 0.0
+        self.total_weight = 0.0
+
+
+    def add_many(self, values: np.ndarray, weights: np.ndarray = None) -> None:
+        """
+        Adds a batch of values (with their weights, 1 by default).
+        """
+        values = np.asarray(values, dtype=float)
+        weights = np.ones(values.shape) if weights is None else np.asarray(weights, dtype=float)
+
+        keep = weights > 0
+        values, weights = values[keep], weights[keep]
+        if values.size == 0:
+            return
+
+        zero = values <= 0
+        self.zero_weight += float(np.sum(weights[zero]))
+
+        keys = np.ceil(np.log(values[~zero]) / self._log_gamma).astype(np.int64)
+        unique_keys, index = np.unique(keys, return_inverse=True)
+        for key, weight in zip(unique_keys.tolist(), np.bincount(index, weights=weights[~zero]).tolist()):
+            self.bins[key] = self.bins.get(key, 0.0) + weight
+
+        self.total_weight += float(np.sum(weights))
+
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self.add_many(np.array([value]), np.array([weight]))
+
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """
+        Folds another sketch (with the same accuracy) into this one.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can only merge quantile sketches with the same relative accuracy.")
+
+        for key, weight in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0.0) + weight
+        self.zero_weight += other.zero_weight
+        self.total_weight += other.total_weight
+
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The whole sketch as arrays (for checkpoints).
+        """
+        keys = sorted(self.bins)
+        return {"relative_accuracy": np.array(self.relative_accuracy),
+                "keys": np.array(keys, dtype=np.int64),
+                "weights": np.array([self.bins[key] for key in keys], dtype=float),
+                "zero_weight": np.array(self.zero_weight),
+                "total_weight": np.array(self.total_weight)}
+
+
+    @classmethod
+    def from_arrays(cls, data) -> "QuantileSketch":
+        """
+        The sketch back from the arrays of to_arrays().
+        """
+        sketch = cls(float(data["relative_accuracy"]))
+        sketch.bins = dict(zip(data["keys"].tolist(), data["weights"].tolist()))
+        sketch.zero_weight = float(data["zero_weight"])
+        sketch.total_weight = float(data["total_weight"])
+
+        return sketch
+
+
+    def quantile(self, probability: float) -> float:
+        """
+        The value below which the given fraction (0 to 1) of the (weighted) values lie.
+        """
+        if self.total_weight == 0:
+            return float("nan")
+
+        rank = np.clip(probability, 0.0, 1.0) * self.total_weight
+        cumulative = self.zero_weight
+        if cumulative >= rank and cumulative > 0:
+            return 0.0
+
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative >= rank:
+                # The middle of the bin (in the relative sense)
+                return 2 * self._gamma**key / (self._gamma + 1)
+
+        return 2 * self._gamma**max(self.bins) / (self._gamma + 1)
+
+
+@dataclass
+class PercentileEstimate:
+    """
+    A footprint percentile: the miss distance (m) that `percentile` % of the landings stay
+    within, and the half width (m) of its confidence interval.
+    """
+    percentile: float
+    estimate: float
+    half_width: float
+
+
+@dataclass
+class ConvergenceReport:
+    """
+    The precision the landing statistics have reached, at the chosen confidence level.
+
+    Attributes:
+        cases (int): how many cases were run.
+        landings (int): how many of them hit the surface.
+        effective_sample_size (float): what the (weighted) landings are worth unweighted.
+        mean_half_width (float): confidence interval half width of the mean landing point (m),
+            along the worst direction.
+        footprint_half_width (float): relative confidence interval half width of the footprint
+            ellipse axes (0.05 is +-5 %).
+        percentiles (List[PercentileEstimate]): the miss distance percentiles.
+        converged (bool): whether every tolerance set in the config was met.
+    """
+    cases: int
+    landings: int
+    effective_sample_size: float
+    mean_half_width: float
+    footprint_half_width: float
+    percentiles: List[PercentileEstimate] = field(default_factory=list)
+    converged: bool = False
+
+
+class ConvergenceMonitor:
+    """
+    Keeps track of how precisely a dispersion run has pinned down the landing statistics, from
+    the running (Welford) mean and covariance of the landing heat map and a quantile sketch of
+    the miss distances from the nominal landing point, and says when the tolerances in the
+    `convergence:` block of the dispersion section are met.
+
+    The confidence intervals are the usual large sample ones: z * sqrt(variance / n) for the
+    mean, z / sqrt(2 (n - 1)) relative for the standard deviations (the footprint axes) and the
+    distribution free order statistic interval for the percentiles, with n the effective sample
+    size so importance sampled (weighted) runs are judged fairly.
+    """
+
+    def __init__(self, config: ConvergenceConfig):
+        self.config = config
+        self.z = NormalDist().inv_cdf(0.5 + config.confidence / 2)
+        self.sketch = QuantileSketch(config.relative_accuracy)
+        self.cases = 0
+
+
+    def update(self, cases: int, sketch: QuantileSketch) -> None:
+        """
+        Adds a finished batch of cases and the sketch of its miss distances.
+        """
+        self.cases += cases
+        self.sketch.merge(sketch)
+
+
+    def report(self, heatmap: LandingHeatmap) -> ConvergenceReport:
+        """
+        The precision reached with the landings in the heat map so far.
+        """
+        n = heatmap.effective_sample_size()
+        covariance = heatmap.covariance()
+
+        if n < 2 or np.any(np.isnan(covariance)):
+            mean_half_width = footprint_half_width = float("inf")
+        else:
+            mean_half_width = float(self.z * np.sqrt(np.max(np.linalg.eigvalsh(covariance)) / n))
+            footprint_half_width = float(self.z / np.sqrt(2 * (n - 1)))
+
+        percentiles = [PercentileEstimate(percentile, *self._percentile(percentile / 100, n))
+                       for percentile in self.config.percentiles]
+
+        report = ConvergenceReport(self.cases, heatmap.count, n, mean_half_width, footprint_half_width, percentiles)
+        report.converged = self.converged(report)
+        return report
+
+
+    def _percentile(self, probability: float, n: float) -> Tuple[float, float]:
+        """
+        The estimate and confidence interval half width of one percentile of the miss distance.
+        """
+        if n < 2:
+            return float("nan"), float("inf")
+
+        spread = self.z * np.sqrt(probability * (1 - probability) / n)
+        if probability - spread < 0 or probability + spread > 1:
+            return self.sketch.quantile(probability), float("inf")
+
+        low = self.sketch.quantile(probability - spread)
+        high = self.sketch.quantile(probability + spread)
+        return self.sketch.quantile(probability), (high - low) / 2
+
+
+    def converged(self, report: ConvergenceReport) -> bool:
+        """
+        Whether every tolerance that was set is met (and at least min_cases were run).
+        """
+        config = self.config
+        if report.cases < config.min_cases:
+            return False
+        if config.mean_tolerance is not None and report.mean_half_width > config.mean_tolerance:
+            return False
+        if config.footprint_tolerance is not None and report.footprint_half_width > config.footprint_tolerance:
+            return False
+        if config.percentile_tolerance is not None:
+            if any(not percentile.half_width <= config.percentile_tolerance for percentile in report.percentiles):
+                return False
+
+        return True
+
+
+def miss_distances(latitudes: np.ndarray, longitudes: np.ndarray,
+                   reference: Tuple[float, float], planet_radius: float) -> np.ndarray:
+    """
+    Great circle distances (m) from the reference (nominal) landing point to the landings
+    (all in degrees).
+    """
+    latitudes, longitudes = np.deg2rad(latitudes), np.deg2rad(longitudes)
+    reference_latitude, reference_longitude = np.deg2rad(reference)
+
+    # Haversine formula, which stays accurate for the short distances
+    haversine = (np.sin((latitudes - reference_latitude) / 2)**2 +
+                 np.cos(latitudes) * np.cos(reference_latitude) * np.sin((longitudes - reference_longitude) / 2)**2)
+    return 2 * planet_radius * np.arcsin(np.sqrt(np.clip(haversine, 0.0, 1.0)))
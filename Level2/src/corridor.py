@@ -0,0 +1,239 @@
+import copy
+import os
+
+import numpy as np
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .config.configuration_manager import ConfigurationManager
+from .config.simulation_config import TerminationConfig
+from .events import SkipOut, DecelerationLimit, HeatingLimit
+from .spacecraft import Spacecraft
+from .planet import Planet
+from .physics import Physics
+from .simulation import Simulation
+from .sweep import entry_state, nominal_entry
+
+
+# What a probe trajectory can come to, ordered from steep to shallow
+TOO_STEEP = "too steep"    # went over the deceleration or heating limit
+CAPTURED = "captured"      # stayed within the limits and didnt leave the atmosphere again
+SKIP_OUT = "skip out"      # climbed back out of the atmosphere
+
+OUTCOME_ORDER = {TOO_STEEP: 0, CAPTURED: 1, SKIP_OUT: 2}
+
+
+@dataclass
+class Probe:
+    """
+    One trajectory of the corridor search.
+    """
+    flight_path_angle: float
+    outcome: str
+    termination_reason: str
+    time_of_flight: float
+
+
+@dataclass
+class CorridorResult:
+    """
+    The entry corridor that was found.
+
+    Attributes:
+        steep_limit (Optional[float]): steepest captured flight path angle (degrees) next to
+            the steep boundary, nothing if even the steepest angle searched isnt too steep.
+        shallow_limit (Optional[float]): shallowest captured angle next to the shallow boundary,
+            nothing if even the shallowest angle searched is captured.
+        steep_bracket / shallow_bracket: the angles the boundaries are known to lie between.
+        width (float): shallow_limit - steep_limit (degrees), 0 if nothing was captured.
+        trajectories (int): how many trajectories the search ran.
+        rounds (int): how many rounds of (parallel) probes that took.
+        probes (List[Probe]): every trajectory run, steepest first.
+    """
+    steep_limit: Optional[float]
+    shallow_limit: Optional[float]
+    steep_bracket: Optional[Tuple[float, float]]
+    shallow_bracket: Optional[Tuple[float, float]]
+    width: float
+    trajectories: int
+    rounds: int
+    probes: List[Probe] = field(default_factory=list)
+
+
+def probe_config(base_config: ConfigurationManager, flight_path_angle: float) -> ConfigurationManager:
+    """
+    A copy of the base configuration starting from the corridor entry conditions with the
+    given flight path angle.
+    """
+    config = copy.deepcopy(base_config)
+    corridor = config.corridor
+
+    _, _, nominal_speed = nominal_entry(config)
+    speed = corridor.entry_speed if corridor.entry_speed is not None else nominal_speed
+
+    position, velocity = entry_state(config, corridor.entry_altitude, flight_path_angle, speed)
+    config.spacecraft.position = position.tolist()
+    config.spacecraft.velocity = velocity.tolist()
+
+    # The probes run side by side and only their outcome is kept, so none streams to a trajectory store
+    config.simulation.output.trajectory_store = None
+
+    # The probes are short, so they arent checkpointed
+    config.simulation.checkpoint.file = None
+
+    # A probe stops on its own skip out and limit events (see run_probe), which decide its
+    # outcome. Any other stop (an escape, an orbit above the atmosphere, the wall clock) would
+    # be taken for a capture, so the termination criteria of the base config are left out.
+    config.simulation.termination = TerminationConfig(None)
+
+    return config
+
+
+def run_probe(task: Tuple[ConfigurationManager, float]) -> Probe:
+    """
+    Runs one trajectory of the corridor search. It stops as soon as its outcome is decided:
+    when it skips back out of the atmosphere or goes over a limit.
+    """
+    base_config, flight_path_angle = task
+    config = probe_config(base_config, flight_path_angle)
+    corridor = config.corridor
+
+    spacecraft = Spacecraft(config.spacecraft)
+    planet = Planet(config.planet)
+    physics = Physics(config.physics, planet, spacecraft)
+    simulation = Simulation(config.simulation,
+                            spacecraft = spacecraft,
+                            planet = planet,
+                            physics = physics)
+
+    atmosphere_top = corridor.atmosphere_top if corridor.atmosphere_top is not None else corridor.entry_altitude
+    skip_out = SkipOut(planet, atmosphere_top)
+    limits = [DecelerationLimit(physics, corridor.deceleration_limit)]
+    if corridor.heating_limit is not None:
+        limits.append(HeatingLimit(planet, spacecraft.nose_radius, corridor.heating_limit))
+
+    simulation.add_event(skip_out)
+    for limit in limits:
+        simulation.add_event(limit)
+
+    simulation.run()
+
+    reason = simulation.get_termination_reason()
+    if reason == skip_out.name:
+        outcome = SKIP_OUT
+    elif reason in [limit.name for limit in limits]:
+        outcome = TOO_STEEP
+    else:
+        # Hit the surface (or still in the atmosphere at end_time, so end_time has to be long enough)
+        outcome = CAPTURED
+
+    return Probe(flight_path_angle, outcome, reason, float(simulation.get_times()[-1] - config.simulation.start_time))
+
+
+class CorridorFinder:
+    """
+    Finds the entry corridor as described in the `corridor:` section of the config file.
+
+    Instead of a brute force sweep over the flight path angle, the first round spreads a few
+    probe trajectories over the whole range to bracket the two boundaries (too steep/captured
+    and captured/skip out), and every round after that puts new probes inside the brackets
+    that are still wider than the tolerance, shrinking each one by a factor of (probes + 1).
+    The probes of a round run in parallel, and each one stops as soon as its outcome is known.
+
+    Assumes the outcome only goes from too steep to captured to skip out as the angle gets
+    shallower.
+    """
+
+    def __init__(self, config: ConfigurationManager):
+        self.config = config
+        self.corridor = config.corridor
+        self.probes: Dict[float, Probe] = {}
+        self.rounds = 0
+
+
+    def number_of_workers(self) -> int:
+        return self.corridor.workers or os.cpu_count() or 1
+
+
+    def brackets(self) -> Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+        """
+        The steep and shallow boundaries brackets from the probes so far: the neighbouring
+        pair of probes where the outcome changes from too steep to anything shallower, and from
+        anything steeper to skip out. Nothing for a boundary that isnt within the range.
+        """
+        probes = [self.probes[angle] for angle in sorted(self.probes)]
+
+        steep = shallow = None
+        for below, above in zip(probes, probes[1:]):
+            if steep is None and below.outcome == TOO_STEEP and above.outcome != TOO_STEEP:
+                steep = (below.flight_path_angle, above.flight_path_angle)
+            if shallow is None and below.outcome != SKIP_OUT and above.outcome == SKIP_OUT:
+                shallow = (below.flight_path_angle, above.flight_path_angle)
+
+        return steep, shallow
+
+
+    def _run(self, executor: Optional[Executor], angles: List[float]) -> None:
+
+        tasks = [(self.config, float(angle)) for angle in angles if float(angle) not in self.probes]
+        results = executor.map(run_probe, tasks) if executor is not None else map(run_probe, tasks)
+
+        for probe in results:
+            self.probes[probe.flight_path_angle] = probe
+        self.rounds += 1
+
+
+    def _search(self, executor: Optional[Executor]) -> None:
+
+        corridor = self.corridor
+        self._run(executor, list(np.linspace(corridor.steepest_angle, corridor.shallowest_angle, corridor.probes)))
+
+        while self.rounds < corridor.max_rounds:
+            unresolved = []
+            for bracket in self.brackets():
+                if bracket is not None and bracket[1] - bracket[0] > corridor.tolerance and bracket not in unresolved:
+                    unresolved.append(bracket)
+            if not unresolved:
+                break
+
+            # Share the probes of the round out between the brackets still open
+            per_bracket = max(1, corridor.probes // len(unresolved))
+            angles = []
+            for low, high in unresolved:
+                angles += list(np.linspace(low, high, per_bracket + 2)[1:-1])
+            self._run(executor, angles)
+
+
+    def find(self) -> CorridorResult:
+        """
+        Runs the search.
+        """
+        self.probes = {}
+        self.rounds = 0
+
+        if self.number_of_workers() == 1:
+            self._search(None)
+        else:
+            with ProcessPoolExecutor(max_workers=self.number_of_workers()) as executor:
+                self._search(executor)
+
+        steep, shallow = self.brackets()
+        captured = [angle for angle, probe in self.probes.items() if probe.outcome == CAPTURED]
+
+        # The limits are the captured probes next to the boundaries (the ends of the range if
+        # a boundary is outside of it)
+        steep_limit = shallow_limit = None
+        if captured:
+            steep_limit = min(captured) if steep is not None else None
+            shallow_limit = max(captured) if shallow is not None else None
+
+        width = 0.0
+        if captured:
+            width = ((shallow_limit if shallow_limit is not None else self.corridor.shallowest_angle) -
+                     (steep_limit if steep_limit is not None else self.corridor.steepest_angle))
+
+        return CorridorResult(steep_limit, shallow_limit, steep, shallow, width,
+                              len(self.probes), self.rounds,
+                              [self.probes[angle] for angle in sorted(self.probes)])
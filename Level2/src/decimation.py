@@ -0,0 +1,73 @@
+"""
+Shape preserving decimation of long curves for plotting.
+
+A trajectory of 100k+ stored states ends up drawn a few hundred pixels wide, so almost all of
+its points are wasted on the plot (and make matplotlib slow). Largest-Triangle-Three-Buckets
+(Steinarsson, 2013) keeps a fixed budget of points that still look like the curve: the first and
+last points are kept, the rest are split into equal buckets and from each bucket the point that
+makes the largest triangle with the point kept from the previous bucket and the average of the
+next bucket is kept. Peaks and sharp turns make big triangles, so they survive.
+"""
+
+import numpy as np
+
+
+def lttb_indices(points: np.ndarray, budget: int) -> np.ndarray:
+    """
+    Which points to keep of a curve, by Largest-Triangle-Three-Buckets.
+
+    Args:
+        points (np.ndarray): (N, 2) or (N, 3) points along the curve, in order (e.g. time and
+            value columns, or positions). In 2D which points are kept doesnt depend on the
+            scale of the axes.
+        budget (int): how many points to keep, at least 3.
+
+    Returns:
+        np.ndarray: the (sorted) indices of the kept points, all of them if there are no more
+            than the budget.
+    """
+    points = np.asarray(points, dtype=float)
+    number_of_points = len(points)
+
+    if budget < 3:
+        raise ValueError("The point budget of the decimation must be at least 3.")
+    if number_of_points <= budget:
+        return np.arange(number_of_points)
+
+    # budget - 2 buckets between the first and the last point
+    edges = np.linspace(1, number_of_points - 1, budget - 1).astype(int)
+
+    # The average of every bucket, and the last point standing in for the one after the last bucket
+    sizes = np.diff(edges)
+    following = np.add.reduceat(points[1:-1], edges[:-1] - 1, axis=0) / sizes[:, None]
+    following = np.vstack([following[1:], points[-1:]])
+
+    indices = np.empty(budget, dtype=int)
+    indices[0] = 0
+    indices[-1] = number_of_points - 1
+
+    planar = points.shape[1] == 2
+    previous = points[0]
+    for bucket in range(budget - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        offsets = points[start:end] - previous
+        span = following[bucket] - previous
+
+        # Twice the triangle areas, through the cross product
+        if planar:
+            areas = np.abs(offsets[:, 0] * span[1] - offsets[:, 1] * span[0])
+        else:
+            areas = np.linalg.norm(np.cross(offsets, span), axis=1)
+
+        indices[bucket + 1] = start + int(np.argmax(areas))
+        previous = points[indices[bucket + 1]]
+
+    return indices
+
+
+def decimate(points: np.ndarray, budget: int) -> np.ndarray:
+    """
+    The points of the curve that LTTB keeps (a copy of at most `budget` rows).
+    """
+    points = np.asarray(points)
+    return points[lttb_indices(points, budget)]
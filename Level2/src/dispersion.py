@@ -0,0 +1,523 @@
+
+import copy
+import os
+import time
+
+import numpy as np
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .cache import CacheEntry, ResultCache, config_key
+from .checkpoint import Checkpoint, fingerprint, load_checkpoint, remove_checkpoint, save_checkpoint
+from .config.configuration_manager import ConfigurationManager
+from .config.dispersion_config import DispersionConfig
+from . import geodesy
+from .convergence import ConvergenceMonitor, ConvergenceReport, QuantileSketch, miss_distances
+from .heatmap import LandingHeatmap
+from .spacecraft import Spacecraft
+from .planet import Planet
+from .physics import Physics
+from .simulation import Simulation
+
+
+# One row of the dispersion results, kept as a compact structured array
+RESULT_DTYPE = np.dtype([("case", np.int64),
+                         ("impacted", np.bool_),
+                         ("latitude", np.float64),        # degrees
+                         ("longitude", np.float64),       # degrees
+                         ("time_of_flight", np.float64),  # seconds
+                         ("peak_deceleration", np.float64),  # g's
+                         ("termination_reason", "U32"),
+                         ("weight", np.float64)])  # likelihood weight, 1 without importance sampling
+
+# Termination reason of a case whose perturbation took a setting out of its valid range (e.g.
+# a negative mass). Such a case isnt run, it counts as not hitting the surface.
+INVALID_PERTURBATION = "Invalid perturbation"
+
+
+class PerturbationModel:
+    """
+    Draws the random offsets from the nominal configuration for each dispersion case, and
+    builds the perturbed configuration for a case.
+
+    Every case gets its own random generator, seeded from the dispersion seed and the case
+    number, so a case always gets the same perturbation no matter which worker runs it or in
+    what order the cases are run. With one of the quasi Monte Carlo samplings (sobol, halton,
+    latin_hypercube) the case is instead the row of a point set covering the unit hypercube of
+    every dispersed value, which is built the same (seeded scrambling) in every worker, and
+    pushed through the inverse CDF of each distribution.
+
+    Cases that are importance sampled (see PerturbationConfig) also get a likelihood weight.
+    """
+
+    def __init__(self, config: DispersionConfig):
+        self.config = config
+        self._points: Optional[np.ndarray] = None
+
+
+    def generator_for(self, case: int) -> np.random.Generator:
+        """
+        The random generator of one case.
+        """
+        return np.random.default_rng(np.random.SeedSequence(self.config.seed, spawn_key=(case,)))
+
+
+    def dimensions(self) -> int:
+        """
+        How many values get dispersed in total (the vector parameters count 3).
+        """
+        return sum(DispersionConfig.PARAMETERS[name] for name in self.config.perturbations)
+
+
+    def unit_points(self) -> np.ndarray:
+        """
+        The (number_of_cases, dimensions) quasi Monte Carlo points in [0, 1), one row per case,
+        worked out the first time theyre needed.
+        """
+        if self._points is None:
+            try:
+                from scipy.stats import qmc
+            except ImportError:
+                raise ImportError(f"{self.config.sampling} sampling needs scipy (pip install scipy), "
+                                  "or use sampling: random.")
+
+            samplers = {"sobol": qmc.Sobol, "halton": qmc.Halton, "latin_hypercube": qmc.LatinHypercube}
+            sampler = samplers[self.config.sampling](max(self.dimensions(), 1), scramble=True,
+                                                     seed=np.random.default_rng(self.config.seed))
+            self._points = sampler.random(self.config.number_of_cases)
+
+        return self._points
+
+
+    def standard_draws(self, case: int) -> Dict[str, np.ndarray]:
+        """
+        The draws of one case from the standard form of every distribution: a standard normal,
+        or uniform over [-1, 1].
+        """
+        draws = {}
+
+        if self.config.sampling == "random":
+            rng = self.generator_for(case)
+            for name, perturbation in self.config.perturbations.items():
+                size = DispersionConfig.PARAMETERS[name]
+                if perturbation.distribution == "normal":
+                    draws[name] = rng.normal(0.0, 1.0, size)
+                else:
+                    draws[name] = rng.uniform(-1.0, 1.0, size)
+            return draws
+
+        from scipy.special import ndtri
+
+        point = self.unit_points()[case]
+        column = 0
+        for name, perturbation in self.config.perturbations.items():
+            size = DispersionConfig.PARAMETERS[name]
+            u = point[column:column + size]
+            column += size
+
+            if perturbation.distribution == "normal":
+                draws[name] = ndtri(np.clip(u, 1e-16, 1.0 - 1e-16))
+            else:
+                draws[name] = 2.0 * u - 1.0
+
+        return draws
+
+
+    def draw(self, case: int) -> Tuple[Dict[str, np.ndarray], float]:
+        """
+        Draws the offsets of every dispersed parameter for one case, and the likelihood weight of
+        the case: how much more likely the offsets are under the real distributions than under
+        the importance sampling ones (1 without importance sampling).
+        """
+        offsets = {}
+        log_weight = 0.0
+        weight = 1.0
+
+        for name, standard in self.standard_draws(case).items():
+            perturbation = self.config.perturbations[name]
+            size = DispersionConfig.PARAMETERS[name]
+            spread = np.broadcast_to(np.asarray(perturbation.spread, dtype=float), (size,))
+
+            if not perturbation.is_importance_sampled():
+                offsets[name] = standard * spread
+                continue
+
+            shift = np.broadcast_to(np.asarray(perturbation.importance_shift, dtype=float), (size,))
+            scale = np.broadcast_to(np.asarray(perturbation.importance_scale, dtype=float), (size,))
+            value = shift + scale * standard
+            offsets[name] = value * spread
+
+            # Ratio of the real density to the sampling one, in the standard units
+            if perturbation.distribution == "normal":
+                log_weight += float(np.sum(np.log(scale) - 0.5 * value**2 + 0.5 * standard**2))
+            elif np.all(np.abs(value) <= 1.0):
+                weight *= float(np.prod(scale))
+            else:
+                weight = 0.0  # outside of the real uniform distribution
+
+        return offsets, weight * float(np.exp(log_weight))
+
+
+    def sample(self, case: int) -> Dict[str, np.ndarray]:
+        """
+        Draws the offsets of every dispersed parameter for one case.
+        """
+        offsets, _ = self.draw(case)
+        return offsets
+
+
+    def apply(self, base_config: ConfigurationManager, offsets: Dict[str, np.ndarray]) -> ConfigurationManager:
+        """
+        A copy of the base configuration with the offsets added on to the nominal values.
+        """
+        config = copy.deepcopy(base_config)
+
+        for name, offset in offsets.items():
+            if name == "position":
+                config.spacecraft.position = list(np.asarray(config.spacecraft.position, dtype=float) + offset)
+            elif name == "velocity":
+                config.spacecraft.velocity = list(np.asarray(config.spacecraft.velocity, dtype=float) + offset)
+            elif name == "mass":
+                config.spacecraft.mass = config.spacecraft.mass + offset[0]
+            elif name == "drag_coefficient":
+                config.spacecraft.drag_coeff = config.spacecraft.drag_coeff + offset[0]
+            elif name == "cross_sectional_area":
+                config.spacecraft.cross_sect_area = config.spacecraft.cross_sect_area + offset[0]
+            else:
+                # Atmosphere parameters, only there for the models that use them
+                if not hasattr(config.planet, name):
+                    raise ValueError(f"The {config.planet.atmospheric_model} atmosphere has no {name} to disperse.")
+                setattr(config.planet, name, getattr(config.planet, name) + offset[0])
+
+        return config
+
+
+def impact_latitude_longitude(position: np.ndarray, time_elapsed: float,
+                              rotation_rate: float = geodesy.EARTH_ROTATION_RATE) -> Tuple[float, float]:
+    """
+    Latitude and longitude (degrees) on the rotating Earth of a point given in the simulation
+    frame, which lines up with the Earth fixed frame at time = 0 and then lags behind it by
+    the Earths rotation (rotation_rate, radians/second) about the z-axis. So the point is
+    rotated back by the angle the Earth turned by time_elapsed: a point on the +x axis is at
+    longitude 0 at time 0 and at -90 degrees a quarter of a (sidereal) day later. (See
+    geodesy.py for whole arrays of points.)
+    """
+    latitude, longitude = geodesy.impact_latitude_longitude(position, time_elapsed, rotation_rate)
+    return float(latitude), float(longitude)
+
+
+def run_case(base_config: ConfigurationManager, model: PerturbationModel, case: int,
+             cache: Optional[ResultCache] = None) -> tuple:
+    """
+    Runs the simulation of one perturbed case.
+
+    Args:
+        cache (Optional[ResultCache]): if given, the results of a case that was already run with
+            the same perturbed config are read back from it instead of running it again.
+
+    Returns:
+        tuple: the results of the case, in the order of RESULT_DTYPE.
+    """
+    offsets, weight = model.draw(case)
+    config = model.apply(base_config, offsets)
+
+    # A wide spread can take a setting out of its valid range, which would run without
+    # complaint and give a nonsense landing, so such a case is recorded as failed instead
+    try:
+        config.validate_all()
+    except ValueError:
+        return (case, False, np.nan, np.nan, np.nan, np.nan, INVALID_PERTURBATION, weight)
+
+    # Only the results row is cached, not the trajectory
+    if cache is not None:
+        key = config_key(config, kind="dispersion_case")
+        entry = cache.get(key)
+        if entry is not None:
+            return (case, *entry.summary["row"], weight)
+
+    row = simulate_landing(config)
+    if cache is not None:
+        cache.put(key, CacheEntry(summary={"row": row}))
+
+    return (case, *row, weight)
+
+
+def simulate_landing(config: ConfigurationManager) -> tuple:
+    """
+    Runs the simulation of one configuration.
+
+    Returns:
+        tuple: the results, in the order of RESULT_DTYPE without the case and the weight.
+    """
+    # The peak deceleration is one of the results, so make sure its being located
+    config.simulation.events.peak_deceleration = True
+    # Only the results are kept, and the cases cant share one store (their writers would
+    # write over each other), so the history isnt streamed to a trajectory store
+    config.simulation.output.trajectory_store = None
+    # The cases are checkpointed as a whole (by the runner), not each one
+    config.simulation.checkpoint.file = None
+
+    spacecraft = Spacecraft(config.spacecraft)
+    planet = Planet(config.planet)
+    physics = Physics(config.physics, planet, spacecraft)
+    simulation = Simulation(config.simulation,
+                            spacecraft = spacecraft,
+                            planet = planet,
+                            physics = physics)
+    simulation.run()
+
+    impacted = simulation.get_termination_reason() == "Surface Impact"
+    time_of_flight = simulation.get_times()[-1] - config.simulation.start_time
+
+    # In the rotating frame the position already is relative to the Earth
+    rotation_time = 0.0 if config.physics.include_coriolis else simulation.get_times()[-1]
+    latitude, longitude = impact_latitude_longitude(simulation.get_trajectory()[-1], rotation_time,
+                                                    config.planet.rotation_rate)
+
+    peaks = [event.value for event in simulation.get_events() if event.name == "Peak deceleration"]
+    peak_deceleration = max(peaks) if peaks else 0.0
+
+    return (bool(impacted), latitude, longitude, float(time_of_flight), float(peak_deceleration),
+            simulation.get_termination_reason())
+
+
+def nominal_landing(base_config: ConfigurationManager) -> Tuple[float, float]:
+    """
+    Latitude and longitude (degrees) where the unperturbed trajectory lands, which the miss
+    distances are measured from.
+
+    Raises:
+        ValueError: if the nominal trajectory doesnt hit the surface.
+    """
+    row = simulate_landing(copy.deepcopy(base_config))
+    if not row[0]:
+        raise ValueError(f"The nominal trajectory doesnt hit the surface ({row[-1]}), so there is "
+                         "no landing point to measure the convergence of the dispersion from.")
+
+    return row[1], row[2]
+
+
+def _empty_heatmap(config: ConfigurationManager) -> LandingHeatmap:
+    return LandingHeatmap(config.dispersion.heatmap_latitude_bins,
+                          config.dispersion.heatmap_longitude_bins,
+                          config.planet.radius)
+
+
+def _run_cases(task: Tuple[ConfigurationManager, List[int], Optional[Tuple[float, float]]]
+               ) -> Tuple[np.ndarray, LandingHeatmap, QuantileSketch]:
+    """
+    What a worker process runs: a batch of cases, returned as rows of the results array
+    (empty if the results arent being kept), a heat map of the batches landings, weighted
+    by the likelihood weights of the cases, and a sketch of their miss distances from the
+    reference (nominal) landing point, if one is given.
+    """
+    base_config, cases, reference = task
+    model = PerturbationModel(base_config.dispersion)
+    cache = ResultCache.from_config(base_config.cache)
+    heatmap = _empty_heatmap(base_config)
+    sketch = QuantileSketch(base_config.dispersion.convergence.relative_accuracy)
+
+    rows = np.empty(len(cases) if base_config.dispersion.keep_results else 0, dtype=RESULT_DTYPE)
+    for i, case in enumerate(cases):
+        row = run_case(base_config, model, case, cache)
+
+        if row[1]:
+            heatmap.add(row[2], row[3], weight=row[-1])
+            if reference is not None:
+                sketch.add(float(miss_distances(row[2], row[3], reference, base_config.planet.radius)),
+                           weight=row[-1])
+        if base_config.dispersion.keep_results:
+            rows[i] = row
+
+    return rows, heatmap, sketch
+
+
+class DispersionRunner:
+    """
+    Monte Carlo landing dispersion: runs many copies of the configured trajectory, each with
+    its initial state, design parameters and atmosphere randomly perturbed as described in the
+    `dispersion:` section of the config file, spread over a pool of worker processes.
+
+    The landings are also gathered into a LandingHeatmap (self.heatmap), merged together from
+    the workers as their batches come back.
+
+    With convergence enabled, the batches are handed out a few at a time and gathered in order,
+    and once the landing statistics meet the tolerances no further batches are started. The
+    precision reached ends up in self.convergence_report.
+
+    With a checkpoint file, the progress is saved every so often: how many of the batches are
+    done (every case draws its perturbation from its own seeded generator, so that says all
+    there is to say about the random numbers), their results, the heat map and the convergence
+    statistics. A run of the same dispersion carries on from there with exactly the same results.
+    """
+
+    def __init__(self, config: ConfigurationManager):
+        self.config = config
+        self.dispersion = config.dispersion
+        self.heatmap = _empty_heatmap(config)
+        self.monitor: Optional[ConvergenceMonitor] = None
+        self.convergence_report: Optional[ConvergenceReport] = None
+        self._last_checkpoint = time.perf_counter()
+
+
+    def number_of_workers(self) -> int:
+        return self.dispersion.workers or os.cpu_count() or 1
+
+
+    def checkpoint_tag(self) -> str:
+        """
+        The fingerprint of the settings of the dispersion. How many workers it is run on
+        doesnt change the results, so it isnt part of it.
+        """
+        settings = {name: value for name, value in vars(self.dispersion).items()
+                    if name not in ("workers", "checkpoint_file", "checkpoint_interval", "resume")}
+        return fingerprint(config_key(self.config, kind="dispersion"), settings)
+
+
+    def tasks(self, reference: Optional[Tuple[float, float]] = None
+              ) -> List[Tuple[ConfigurationManager, List[int], Optional[Tuple[float, float]]]]:
+        """
+        Splits the cases up into the batches that get handed to the workers.
+        """
+        cases = list(range(self.dispersion.number_of_cases))
+        size = self.dispersion.cases_per_task
+
+        return [(self.config, cases[start:start + size], reference) for start in range(0, len(cases), size)]
+
+
+    def run(self) -> np.ndarray:
+        """
+        Runs every case (or, with convergence enabled, as many as it takes).
+
+        Returns:
+            np.ndarray: structured array (RESULT_DTYPE) with one row per case, sorted by case.
+                Empty if keep_results is off, in which case only self.heatmap has the landings.
+        """
+        self.heatmap = _empty_heatmap(self.config)
+        self.monitor = self.convergence_report = None
+
+        reference = None
+        if self.dispersion.convergence.enabled:
+            self.monitor = ConvergenceMonitor(self.dispersion.convergence)
+            reference = nominal_landing(self.config)
+        tasks = self.tasks(reference)
+
+        completed, results = self._resume()
+        if self.convergence_report is not None and self.convergence_report.converged:
+            completed = len(tasks)
+        tasks = tasks[completed:]
+
+        self._last_checkpoint = time.perf_counter()
+        if self.number_of_workers() == 1:
+            results = self._collect(tasks, map(_run_cases, tasks), results, completed)
+        else:
+            with ProcessPoolExecutor(max_workers=self.number_of_workers()) as executor:
+                if self.monitor is None:
+                    results = self._collect(tasks, executor.map(_run_cases, tasks), results, completed)
+                else:
+                    batches = self._schedule(executor, tasks)
+                    try:
+                        results = self._collect(tasks, batches, results, completed)
+                    finally:
+                        batches.close()
+
+        if self.dispersion.checkpoint_file is not None:
+            remove_checkpoint(self.dispersion.checkpoint_file)
+
+        results = np.concatenate(results) if results else np.empty(0, dtype=RESULT_DTYPE)
+        return results[np.argsort(results["case"])]
+
+
+    def _resume(self) -> Tuple[int, List[np.ndarray]]:
+        """
+        Picks up the progress saved in the checkpoint file, if there is one (and resume is on).
+
+        Returns:
+            Tuple[int, List[np.ndarray]]: how many of the batches were done, and their results.
+        """
+        if self.dispersion.checkpoint_file is None or not self.dispersion.resume:
+            return 0, []
+
+        checkpoint = load_checkpoint(self.dispersion.checkpoint_file, self.checkpoint_tag())
+        if checkpoint is None:
+            return 0, []
+
+        arrays = checkpoint.arrays
+        self.heatmap = LandingHeatmap.from_arrays({name[len("heatmap_"):]: value for name, value in arrays.items()
+                                                   if name.startswith("heatmap_")})
+        if self.monitor is not None:
+            self.monitor.cases = checkpoint.summary["monitor_cases"]
+            self.monitor.sketch = QuantileSketch.from_arrays({name[len("sketch_"):]: value for name, value in arrays.items()
+                                                              if name.startswith("sketch_")})
+            self.convergence_report = self.monitor.report(self.heatmap)
+
+        return checkpoint.summary["completed_tasks"], [arrays["rows"]]
+
+
+    def _save_checkpoint(self, completed: int, results: List[np.ndarray]) -> None:
+        """
+        Saves the progress after the first `completed` batches.
+        """
+        arrays = {"rows": np.concatenate(results) if results else np.empty(0, dtype=RESULT_DTYPE)}
+        arrays.update({f"heatmap_{name}": value for name, value in self.heatmap.to_arrays().items()})
+        if self.monitor is not None:
+            arrays.update({f"sketch_{name}": value for name, value in self.monitor.sketch.to_arrays().items()})
+
+        summary = {"completed_tasks": completed,
+                   "monitor_cases": self.monitor.cases if self.monitor is not None else 0}
+        save_checkpoint(self.dispersion.checkpoint_file, Checkpoint(arrays, summary), self.checkpoint_tag())
+
+
+    def _schedule(self, executor: Executor, tasks: list) -> Iterator[Tuple[np.ndarray, LandingHeatmap, QuantileSketch]]:
+        """
+        Hands the batches to the workers a couple per worker at a time (instead of all at once
+        like executor.map), so that once the run has converged there is little left to cancel,
+        and gives them back in order.
+        """
+        in_flight = 2 * self.number_of_workers()
+        futures = [executor.submit(_run_cases, task) for task in tasks[:in_flight]]
+        remaining = iter(tasks[in_flight:])
+
+        try:
+            while futures:
+                batch = futures.pop(0).result()
+                task = next(remaining, None)
+                if task is not None:
+                    futures.append(executor.submit(_run_cases, task))
+                yield batch
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+    def _collect(self, tasks: list, batches, results: Optional[List[np.ndarray]] = None,
+                 completed: int = 0) -> List[np.ndarray]:
+        """
+        Gathers the finished batches (coming back in the order of the tasks), merging each ones
+        heat map in as soon as it comes back, and with convergence enabled stops once the
+        tolerances are met.
+
+        Args:
+            results (Optional[List[np.ndarray]]): the results of the batches already done
+                (from a checkpoint), added on to.
+            completed (int): how many batches were already done before these tasks.
+        """
+        results = list(results or [])
+        checkpoint_file = self.dispersion.checkpoint_file
+
+        for number, (task, (rows, heatmap, sketch)) in enumerate(zip(tasks, batches), start=completed + 1):
+            results.append(rows)
+            self.heatmap.merge(heatmap)
+
+            if self.monitor is not None:
+                self.monitor.update(len(task[1]), sketch)
+                self.convergence_report = self.monitor.report(self.heatmap)
+                if self.convergence_report.converged:
+                    break
+
+            if checkpoint_file is not None and time.perf_counter() - self._last_checkpoint >= self.dispersion.checkpoint_interval:
+                self._save_checkpoint(number, results)
+                self._last_checkpoint = time.perf_counter()
+
+        return results
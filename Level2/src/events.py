@@ -0,0 +1,448 @@
+
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from abc import ABC, abstractmethod
+
+from .atmosphere import STANDARD_GRAVITY
+from .planet import Planet
+from .physics import Physics
+
+
+class StepInterpolant:
+    """
+    A continuous approximation of the trajectory over one integrator step, built from the
+    states (and accelerations) at both ends of the step with cubic Hermite polynomials.
+
+    The position curve matches the position and velocity at both ends, and the velocity curve
+    matches the velocity and acceleration at both ends, so it is as accurate as the step itself
+    for finding where within the step something happened.
+
+    Works on a single (3,) state or on (N, 3) ensemble states, where `time` may then also be
+    one time per member.
+    """
+
+    def __init__(self, start_time, end_time,
+                 start_position: np.ndarray, start_velocity: np.ndarray, start_acceleration: np.ndarray,
+                 end_position: np.ndarray, end_velocity: np.ndarray, end_acceleration: np.ndarray):
+
+        self.start_time = start_time
+        self.end_time = end_time
+        self.step_size = end_time - start_time
+
+        self.start_position = start_position
+        self.start_velocity = start_velocity
+        self.start_acceleration = start_acceleration
+        self.end_position = end_position
+        self.end_velocity = end_velocity
+        self.end_acceleration = end_acceleration
+
+
+    def __call__(self, time) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The interpolated position and velocity at `time` (anywhere within the step).
+        """
+        s = np.asarray((time - self.start_time) / self.step_size, dtype=float)[..., np.newaxis]
+        h = np.asarray(self.step_size, dtype=float)[..., np.newaxis]
+
+        # Cubic Hermite basis functions
+        h00 = 2*s**3 - 3*s**2 + 1
+        h10 = s**3 - 2*s**2 + s
+        h01 = -2*s**3 + 3*s**2
+        h11 = s**3 - s**2
+
+        position = (h00 * self.start_position + h10 * h * self.start_velocity +
+                    h01 * self.end_position + h11 * h * self.end_velocity)
+        velocity = (h00 * self.start_velocity + h10 * h * self.start_acceleration +
+                    h01 * self.end_velocity + h11 * h * self.end_acceleration)
+
+        return position, velocity
+
+
+@dataclass
+class EventRecord:
+    """
+    One occurrence of an event during a simulation.
+
+    Attributes:
+        name (str): name of the event that happened.
+        time (float): when it happened.
+        position (np.ndarray): where the spacecraft was at that moment.
+        velocity (np.ndarray): how fast it was going at that moment.
+        value (Optional[float]): a value the event reports (e.g. the peak deceleration in g's).
+    """
+    name: str
+    time: float
+    position: np.ndarray
+    velocity: np.ndarray
+    value: Optional[float] = None
+
+
+    def to_dict(self) -> dict:
+        """
+        The record as plain JSON-able values (for the cache and checkpoints).
+        """
+        return {"name": self.name, "time": float(self.time),
+                "position": np.asarray(self.position).tolist(), "velocity": np.asarray(self.velocity).tolist(),
+                "value": None if self.value is None else float(self.value)}
+
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "EventRecord":
+        return cls(record["name"], record["time"], np.array(record["position"]),
+                   np.array(record["velocity"]), record["value"])
+
+
+class Event(ABC):
+    """
+    Something that should be located precisely in time during a simulation.
+
+    An event is described by an event function that changes sign when it happens. After every
+    step the simulation evaluates it at both ends of the step, on the steps interpolant, and if
+    the sign changed it root finds the exact moment on the interpolant. So the accuracy of the
+    event no longer depends on the step size.
+
+    Most events are a function of the state alone, see StateEvent. Subclass Event directly for
+    ones that need more of the interpolant than the state at one time (e.g. PeakEvent).
+
+    Attributes:
+        name (str): name used in the event log (and as the termination reason if terminal).
+        terminal (bool): whether the simulation stops when this event happens.
+        direction (int): -1 to only trigger on the function going from positive to negative,
+            +1 for negative to positive and 0 for both.
+    """
+
+    def __init__(self, name: str, terminal: bool = False, direction: int = 0):
+        self.name = name
+        self.terminal = terminal
+        self.direction = direction
+
+
+    @abstractmethod
+    def evaluate(self, interpolant: StepInterpolant, time: float) -> float:
+        """
+        The event function at `time`, somewhere within the step the interpolant covers.
+        """
+
+
+    def value(self, time: float, position: np.ndarray, velocity: np.ndarray) -> Optional[float]:
+        """
+        What gets stored with the event in the event log. Nothing by default.
+        """
+        return None
+
+
+    def triggered(self, start_value: float, end_value: float) -> bool:
+        """
+        Whether the event function going from start_value to end_value over a step
+        counts as this event happening.
+        """
+        falling = start_value > 0 and end_value <= 0
+        rising = start_value < 0 and end_value >= 0
+
+        if self.direction < 0:
+            return falling
+        if self.direction > 0:
+            return rising
+        return falling or rising
+
+
+class StateEvent(Event):
+    """
+    An event whose function only depends on the state (time, position and velocity), which
+    gets evaluated on the state the interpolant gives at that time.
+    """
+
+    @abstractmethod
+    def function(self, time: float, position: np.ndarray, velocity: np.ndarray) -> float:
+        """
+        The event function, whose zero crossings are the moments the event happens.
+        """
+
+
+    def evaluate(self, interpolant, time):
+        position, velocity = interpolant(time)
+        return self.function(time, position, velocity)
+
+
+class AltitudeCrossing(StateEvent):
+    """
+    Passing through a given altitude above the (spherical) planets surface.
+    """
+
+    def __init__(self, planet: Planet, altitude: float, direction: int = 0,
+                 terminal: bool = False, name: Optional[str] = None):
+        super().__init__(name if name is not None else f"Altitude crossing {altitude:.0f} m",
+                         terminal, direction)
+        self.planet = planet
+        self.altitude = altitude
+
+
+    def function(self, time, position, velocity):
+        return np.linalg.norm(position) - (self.planet.radius + self.altitude)
+
+
+class SurfaceImpact(AltitudeCrossing):
+    """
+    Hitting the planets surface, which ends the simulation.
+    """
+
+    def __init__(self, planet: Planet):
+        super().__init__(planet, altitude=0.0, direction=-1, terminal=True, name="Surface Impact")
+
+
+# Sutton-Graves constant for Earths atmosphere (SI units)
+SUTTON_GRAVES_CONSTANT = 1.7415e-4
+
+
+def deceleration_g(physics: Physics, position: np.ndarray, velocity: np.ndarray) -> float:
+    """
+    The deceleration the crew/structure feels (every acceleration except gravity and the
+    apparent forces of a rotating frame), in g's.
+    """
+    sensed_acceleration = physics.get_sensed_acceleration(position, velocity)
+    return np.linalg.norm(sensed_acceleration) / STANDARD_GRAVITY
+
+
+def stagnation_heat_flux(planet: Planet, nose_radius: float, position: np.ndarray, velocity: np.ndarray) -> float:
+    """
+    Convective heat flux at the stagnation point (W/m^2), from the Sutton-Graves approximation
+    q = k * sqrt(density / nose_radius) * speed^3.
+    """
+    density = planet.get_atmospheric_density(position)
+    speed = np.linalg.norm(velocity)
+    return SUTTON_GRAVES_CONSTANT * np.sqrt(density / nose_radius) * speed**3
+
+
+class SkipOut(AltitudeCrossing):
+    """
+    Climbing back out through the top of the atmosphere, i.e. the spacecraft skipped off it
+    instead of being captured. Ends the simulation.
+    """
+
+    def __init__(self, planet: Planet, atmosphere_top: float):
+        super().__init__(planet, atmosphere_top, direction=1, terminal=True, name="Skip out")
+
+
+class LimitExceeded(StateEvent):
+    """
+    Some quantity of the state going over a limit (a g-load, a heating rate, ...), which ends
+    the simulation since the outcome is already decided. The event reports the limit.
+    """
+
+    def __init__(self, name: str, limit: float):
+        super().__init__(name, terminal=True, direction=1)
+        self.limit = limit
+
+
+    @abstractmethod
+    def quantity(self, time: float, position: np.ndarray, velocity: np.ndarray) -> float:
+        """
+        The quantity that is limited.
+        """
+
+
+    def function(self, time, position, velocity):
+        return self.quantity(time, position, velocity) - self.limit
+
+
+    def value(self, time, position, velocity):
+        return float(self.quantity(time, position, velocity))
+
+
+class DecelerationLimit(LimitExceeded):
+    """
+    The felt deceleration going over a limit, in g's.
+    """
+
+    def __init__(self, physics: Physics, limit: float):
+        super().__init__("Deceleration limit exceeded", limit)
+        self.physics = physics
+
+
+    def quantity(self, time, position, velocity):
+        return deceleration_g(self.physics, position, velocity)
+
+
+class HeatingLimit(LimitExceeded):
+    """
+    The stagnation point heat flux going over a limit, in W/m^2.
+    """
+
+    def __init__(self, planet: Planet, nose_radius: float, limit: float):
+        super().__init__("Heating limit exceeded", limit)
+        self.planet = planet
+        self.nose_radius = nose_radius
+
+
+    def quantity(self, time, position, velocity):
+        return stagnation_heat_flux(self.planet, self.nose_radius, position, velocity)
+
+
+class PeakEvent(Event):
+    """
+    The moment some quantity of the state reaches a (local) maximum.
+
+    The event function is the time derivative of the quantity, taken as a central difference
+    along the steps interpolant, which goes from positive to negative at a maximum. It isnt a
+    function of the state at one time, so peak events implement evaluate() directly.
+    """
+
+    # Size of the central difference, as a fraction of the step size
+    RELATIVE_DIFFERENCE_STEP = 1e-6
+
+    def __init__(self, name: str):
+        super().__init__(name, terminal=False, direction=-1)
+
+
+    @abstractmethod
+    def quantity(self, time: float, position: np.ndarray, velocity: np.ndarray) -> float:
+        """
+        The quantity whose peaks are being looked for.
+        """
+
+
+    def evaluate(self, interpolant, time):
+        delta = self.RELATIVE_DIFFERENCE_STEP * interpolant.step_size
+
+        position_after, velocity_after = interpolant(time + delta)
+        position_before, velocity_before = interpolant(time - delta)
+
+        return (self.quantity(time + delta, position_after, velocity_after) -
+                self.quantity(time - delta, position_before, velocity_before)) / (2 * delta)
+
+
+    def value(self, time, position, velocity):
+        return float(self.quantity(time, position, velocity))
+
+
+class PeakDeceleration(PeakEvent):
+    """
+    Peak of the deceleration the crew/structure feels, which is every acceleration except
+    gravity and the apparent forces of a rotating frame (nothing on board feels those).
+    Reported in g's.
+    """
+
+    def __init__(self, physics: Physics):
+        super().__init__("Peak deceleration")
+        self.physics = physics
+
+
+    def quantity(self, time, position, velocity):
+        return deceleration_g(self.physics, position, velocity)
+
+
+class PeakHeating(PeakEvent):
+    """
+    Peak of the convective heat flux at the stagnation point, using the Sutton-Graves
+    approximation q = k * sqrt(density / nose_radius) * speed^3. Reported in W/m^2.
+    """
+
+    def __init__(self, planet: Planet, nose_radius: float):
+        super().__init__("Peak heating")
+        self.planet = planet
+        self.nose_radius = nose_radius
+
+
+    def quantity(self, time, position, velocity):
+        return stagnation_heat_flux(self.planet, self.nose_radius, position, velocity)
+
+
+class PeakDynamicPressure(PeakEvent):
+    """
+    Peak of the dynamic pressure q = 0.5 * density * speed^2 the spacecraft flies through
+    (the aerodynamic load on the structure). Reported in Pa.
+    """
+
+    def __init__(self, planet: Planet):
+        super().__init__("Peak dynamic pressure")
+        self.planet = planet
+
+
+    def quantity(self, time, position, velocity):
+        density = self.planet.get_atmospheric_density(position)
+        return 0.5 * density * np.dot(velocity, velocity)
+
+
+def find_event_time(event: Event,
+                    interpolant: StepInterpolant,
+                    start_value: float,
+                    end_value: float,
+                    time_tolerance: float = 1e-9,
+                    max_iterations: int = 100) -> float:
+    """
+    Root finds the moment within a step that the events function crosses zero, using the
+    Illinois variant of the false position method on the steps interpolant.
+
+    Args:
+        event (Event): the event that was triggered within the step.
+        interpolant (StepInterpolant): the interpolant of the step.
+        start_value (float): the event function at the start of the step.
+        end_value (float): the event function at the end of the step (opposite sign).
+
+    Returns:
+        float: the time of the event.
+    """
+    low_time, high_time = interpolant.start_time, interpolant.end_time
+    low_value, high_value = start_value, end_value
+
+    # Which end was kept the last time, for the Illinois correction
+    side = 0
+
+    for _ in range(max_iterations):
+
+        if high_time - low_time <= time_tolerance * max(1.0, abs(high_time)):
+            break
+
+        if high_value == low_value:
+            time = 0.5 * (low_time + high_time)
+        else:
+            time = high_time - high_value * (high_time - low_time) / (high_value - low_value)
+
+        value = event.evaluate(interpolant, time)
+        if value == 0:
+            return time
+
+        if np.sign(value) == np.sign(low_value):
+            low_time, low_value = time, value
+            if side == -1:
+                high_value /= 2
+            side = -1
+        else:
+            high_time, high_value = time, value
+            if side == 1:
+                low_value /= 2
+            side = 1
+
+    # The end of the bracket that is on the "event has happened" side
+    return high_time
+
+
+def find_impact_times(interpolant: StepInterpolant, radius: float, iterations: int = 60) -> np.ndarray:
+    """
+    Vectorized version of locating the surface impact, for an ensemble step where every
+    member in the interpolant is known to start above `radius` and end at or below it.
+
+    Runs a bisection for all members at once (each member has its own impact time), which
+    after 60 halvings pins the time down to double precision.
+
+    Args:
+        interpolant (StepInterpolant): interpolant over the step for the impacting members only.
+        radius (float): the radius of the planets surface.
+
+    Returns:
+        np.ndarray: the (N,) impact times.
+    """
+    number_of_members = interpolant.start_position.shape[0]
+    low = np.zeros(number_of_members)
+    high = np.ones(number_of_members)
+
+    for _ in range(iterations):
+        middle = 0.5 * (low + high)
+        position, _ = interpolant(interpolant.start_time + middle * interpolant.step_size)
+        above = np.linalg.norm(position, axis=-1) > radius
+        low = np.where(above, middle, low)
+        high = np.where(above, high, middle)
+
+    return interpolant.start_time + high * interpolant.step_size
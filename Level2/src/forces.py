@@ -0,0 +1,243 @@
+
+import math
+
+import numpy as np
+
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .planet import GRAVITATIONAL_CONSTANT
+
+
+# The force models, each built from the Physics object its part of. Gravity models are picked
+# with `gravity_model`, the rest are turned on by their include_* flag or by naming them in
+# `additional_forces` in the physics section of the config file.
+FORCE_MODELS: Dict[str, Callable[..., "ForceModel"]] = {}
+
+
+def register_force_model(name: str):
+    """
+    Decorator adding a force model to FORCE_MODELS under the given name, so that a new model
+    only has to be written and registered to be usable from the config file.
+    """
+    def decorator(model):
+        FORCE_MODELS[name] = model
+        return model
+    return decorator
+
+
+class ForceModel(ABC):
+    """
+    One contribution to the spacecrafts acceleration (gravity, drag, ...).
+
+    A force model is called with the position and velocity, either (3,) vectors for a single
+    spacecraft or (N, 3) arrays for an ensemble, and returns its acceleration in the same shape.
+
+    Models can also define a `components(x, y, z, vx, vy, vz, radius, speed)` method, the same
+    acceleration for a single spacecraft on plain floats returned as an (ax, ay, az) tuple,
+    which is what the RK4 fast path uses. It gets handed the radius and speed, which are worked
+    out once and shared between all the models. Models without one leave it as None.
+
+    Attributes:
+        sensed (bool): whether the acceleration is felt on board (aerodynamic forces are,
+            gravity and the apparent forces of a rotating frame are not).
+    """
+
+    sensed: bool = True
+    components: Optional[Callable[..., Tuple[float, float, float]]] = None
+
+    def __init__(self, physics):
+        self.physics = physics
+        self.planet = physics.planet
+
+
+    @abstractmethod
+    def __call__(self, position: np.ndarray, velocity: np.ndarray) -> np.ndarray:
+        pass
+
+
+    def has_components(self) -> bool:
+        return self.components is not None
+
+
+@register_force_model("point_mass")
+class PointMassGravity(ForceModel):
+    """
+    Gravity of a spherical planet, -mu * r / |r|^3.
+    """
+
+    sensed = False
+
+    def __call__(self, position, velocity):
+        return self.planet.calculate_gravity(position)
+
+
+    def components(self, x, y, z, vx, vy, vz, radius, speed):
+
+        if radius == 0:
+            raise ZeroDivisionError("Position vector cannot be zero.")
+
+        # Same operations as Planet.calculate_gravity (pow through NumPy, as libm rounds differently)
+        gravity_factor = -GRAVITATIONAL_CONSTANT * self.planet.mass
+        radius_cubed = float(np.power(radius, 3))
+
+        return gravity_factor * x / radius_cubed, gravity_factor * y / radius_cubed, gravity_factor * z / radius_cubed
+
+
+@register_force_model("J2")
+class J2Gravity(ForceModel):
+    """
+    Gravity of an oblate planet: the point mass term plus the J2 (equatorial bulge) term,
+    with the planets rotation axis along z.
+    """
+
+    sensed = False
+
+    def __init__(self, physics):
+        super().__init__(physics)
+        self.j2 = self.planet.j2
+
+
+    def __call__(self, position, velocity):
+
+        radius = np.linalg.norm(position, axis=-1, keepdims=True)
+        if np.any(radius == 0):
+            raise ZeroDivisionError("Position vector cannot be zero.")
+
+        z_squared_ratio = (position[..., 2:3] / radius)**2
+        oblateness = 1.5 * self.j2 * (self.planet.radius / radius)**2
+        point_mass = -self.planet.gravitational_parameter * position / radius**3
+
+        # The J2 term scales x and y by one factor and z by another
+        acceleration = point_mass * (1 - oblateness * (5*z_squared_ratio - 1))
+        acceleration[..., 2:3] = point_mass[..., 2:3] * (1 - oblateness * (5*z_squared_ratio - 3))
+
+        return acceleration
+
+
+@register_force_model("drag")
+class Drag(ForceModel):
+    """
+    Aerodynamic drag, acting against the velocity.
+    """
+
+    def __call__(self, position, velocity):
+        return self.physics.get_drag(position, velocity)
+
+
+    def components(self, x, y, z, vx, vy, vz, radius, speed):
+
+        # Same operations as Physics.get_drag
+        air_density = float(self.planet.atmosphere.density(radius - self.planet.radius))
+        drag_factor = (0.5 * self.physics.drag_coefficient * self.physics.cross_sectional_area *
+                       air_density * (speed*speed))
+        mass = self.physics.mass
+
+        return (drag_factor * (-vx / speed) / mass,
+                drag_factor * (-vy / speed) / mass,
+                drag_factor * (-vz / speed) / mass)
+
+
+@register_force_model("lift")
+class Lift(ForceModel):
+    """
+    Aerodynamic lift, perpendicular to the velocity. With no bank angle it points "up", along
+    the part of the local vertical that is perpendicular to the velocity, and banking rotates
+    it about the velocity (positive to the right of the direction of flight).
+
+    A purely vertical trajectory has no "up" perpendicular to the velocity, so it gets no lift.
+    """
+
+    def __call__(self, position, velocity):
+
+        air_density = np.expand_dims(self.planet.get_atmospheric_density(position), -1)
+        speed = np.linalg.norm(velocity, axis=-1, keepdims=True)
+        along_track = velocity / speed
+
+        # The local vertical, with its component along the velocity taken out
+        vertical = position / np.linalg.norm(position, axis=-1, keepdims=True)
+        up = vertical - np.sum(vertical * along_track, axis=-1, keepdims=True) * along_track
+        up_size = np.linalg.norm(up, axis=-1, keepdims=True)
+        up = np.divide(up, up_size, out=np.zeros_like(up), where=up_size > 0)
+
+        right = np.cross(along_track, up)
+
+        bank_angle = np.expand_dims(np.deg2rad(self.physics.bank_angle), -1)
+        direction = np.cos(bank_angle) * up + np.sin(bank_angle) * right
+
+        lift_coefficient = np.expand_dims(self.physics.lift_coefficient, -1)
+        cross_sectional_area = np.expand_dims(self.physics.cross_sectional_area, -1)
+        mass = np.expand_dims(self.physics.mass, -1)
+
+        return 0.5 * lift_coefficient * cross_sectional_area * air_density * speed**2 * direction / mass
+
+
+@register_force_model("rotating_frame")
+class RotatingFrame(ForceModel):
+    """
+    The Coriolis and centrifugal accelerations, for when the simulation is done in the frame
+    rotating with the planet (about z). The state is then relative to the planets surface,
+    which also makes the drag act on the speed relative to the (co-rotating) air.
+    """
+
+    sensed = False
+
+    def __call__(self, position, velocity):
+
+        rotation_rate = self.planet.rotation_rate
+        rotation = np.array([0.0, 0.0, rotation_rate])
+
+        coriolis = -2 * np.cross(rotation, velocity)
+        centrifugal = rotation_rate**2 * position * np.array([1.0, 1.0, 0.0])
+
+        return coriolis + centrifugal
+
+
+    def components(self, x, y, z, vx, vy, vz, radius, speed):
+
+        rotation_rate = self.planet.rotation_rate
+        rotation_rate_squared = rotation_rate * rotation_rate
+
+        return (2 * rotation_rate * vy + rotation_rate_squared * x,
+                -2 * rotation_rate * vx + rotation_rate_squared * y,
+                0.0)
+
+
+def enabled_force_names(config) -> List[str]:
+    """
+    The names of the force models the physics config asks for, in the order they get summed.
+    """
+    names = [config.gravity_model]
+    if config.include_drag:
+        names.append("drag")
+    if config.include_lift:
+        names.append("lift")
+    if config.include_coriolis:
+        names.append("rotating_frame")
+
+    return names + [name for name in config.additional_forces if name not in names]
+
+
+def create_force_models(physics) -> List[ForceModel]:
+    """
+    Builds the force models asked for in the physics config, once, so that working out the
+    acceleration is just running through a list.
+
+    Raises:
+        ValueError: if a model is not one of the registered ones.
+    """
+    models = []
+    for name in enabled_force_names(physics.config):
+        if name not in FORCE_MODELS:
+            raise ValueError(f"Unknown force model '{name}'. Choose from: {', '.join(FORCE_MODELS)}")
+        models.append(FORCE_MODELS[name](physics))
+
+    return models
+
+
+def shared_radius_and_speed(x: float, y: float, z: float, vx: float, vy: float, vz: float) -> Tuple[float, float]:
+    """
+    The radius and speed for the float fast path, summed in the same order as np.linalg.norm
+    does for a 3-vector so that they match it bit-for-bit.
+    """
+    return math.sqrt(x*x + y*y + z*z), math.sqrt(vx*vx + vy*vy + vz*vz)
@@ -0,0 +1,126 @@
+"""
+Conversion of positions in the simulation frame to latitude and longitude on the rotating Earth.
+
+The simulation frame lines up with the Earth fixed frame at time = 0 (x-axis through 0 degrees
+longitude, z-axis along the rotation axis) and then the Earth turns (eastward) underneath it
+about the z-axis. So a point at time t is rotated back by the angle the Earth has turned by
+then to get it in the Earth fixed frame. For a simulation frame aligned with the ecliptic
+instead of the equator, the tilt of the Earths axis (obliquity) is taken out first, about
+the x-axis.
+
+Every function here works on a single (3,) position or on (N, 3) arrays of positions (with a
+matching (N,) array of times, or one time for all), in one vectorized pass.
+"""
+
+import numpy as np
+
+from typing import Tuple
+
+
+# Once a sidereal day (23 h 56 min 4 s), the turn relative to the stars rather than the Sun,
+# the same as the planets default rotation_rate
+EARTH_ROTATION_RATE = 7.2921159e-5  # radians/second
+EARTH_OBLIQUITY = 23.5  # degrees, the tilt of the Earths axis to the ecliptic
+
+# WGS 84 reference ellipsoid
+WGS84_SEMI_MAJOR_AXIS = 6378137.0  # meters
+WGS84_FLATTENING = 1 / 298.257223563
+
+
+def to_earth_fixed(positions: np.ndarray,
+                   times: np.ndarray,
+                   rotation_rate: float = EARTH_ROTATION_RATE,
+                   obliquity: float = 0.0) -> np.ndarray:
+    """
+    The positions in the Earth fixed frame.
+
+    Args:
+        positions (np.ndarray): (3,) or (N, 3) positions in the simulation frame.
+        times (np.ndarray): time (s) since the frames lined up, one per position or one for all.
+        rotation_rate (float): how fast the Earth turns (radians/second).
+        obliquity (float): tilt (degrees) of the simulation frames z-axis from the rotation axis,
+            0 for a frame aligned with the equator and EARTH_OBLIQUITY for one aligned with the ecliptic.
+
+    Returns:
+        np.ndarray: the positions in the Earth fixed frame, the same shape as given.
+    """
+    positions = np.asarray(positions, dtype=float)
+    x, y, z = positions[..., 0], positions[..., 1], positions[..., 2]
+
+    if obliquity != 0.0:
+        tilt = np.radians(obliquity)
+        y, z = y * np.cos(tilt) - z * np.sin(tilt), y * np.sin(tilt) + z * np.cos(tilt)
+
+    rotation = rotation_rate * np.asarray(times, dtype=float)
+    cosine, sine = np.cos(rotation), np.sin(rotation)
+
+    return np.stack([x * cosine + y * sine,
+                     -x * sine + y * cosine,
+                     np.broadcast_to(z, np.broadcast(x, rotation).shape)], axis=-1)
+
+
+def geocentric_latitude_longitude(earth_fixed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Latitude (angle above the equator, seen from the center) and longitude, in degrees, of
+    Earth fixed positions.
+    """
+    x, y, z = earth_fixed[..., 0], earth_fixed[..., 1], earth_fixed[..., 2]
+
+    latitude = np.arctan2(z, np.hypot(x, y))
+    longitude = np.arctan2(y, x)
+
+    return np.rad2deg(latitude), np.rad2deg(longitude)
+
+
+def geodetic_latitude_longitude(earth_fixed: np.ndarray,
+                                semi_major_axis: float = WGS84_SEMI_MAJOR_AXIS,
+                                flattening: float = WGS84_FLATTENING,
+                                iterations: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Geodetic latitude (angle of the normal to the oblate ellipsoid, what maps use) and
+    longitude, in degrees, of Earth fixed positions.
+
+    The latitude is found by fixed point iteration on the height above the ellipsoid, which
+    gets below a millimeter within a few iterations for anything near the surface.
+    """
+    x, y, z = earth_fixed[..., 0], earth_fixed[..., 1], earth_fixed[..., 2]
+    eccentricity_squared = flattening * (2 - flattening)
+    distance_from_axis = np.hypot(x, y)
+
+    latitude = np.arctan2(z, distance_from_axis * (1 - eccentricity_squared))
+    for _ in range(iterations):
+        sine = np.sin(latitude)
+        prime_vertical_radius = semi_major_axis / np.sqrt(1 - eccentricity_squared * sine**2)
+        height = np.hypot(distance_from_axis, z + eccentricity_squared * prime_vertical_radius * sine) - prime_vertical_radius
+        latitude = np.arctan2(z, distance_from_axis * (1 - eccentricity_squared * prime_vertical_radius /
+                                                       (prime_vertical_radius + height)))
+
+    return np.rad2deg(latitude), np.rad2deg(np.arctan2(y, x))
+
+
+def impact_latitude_longitude(positions: np.ndarray,
+                              times: np.ndarray,
+                              rotation_rate: float = EARTH_ROTATION_RATE,
+                              obliquity: float = 0.0,
+                              geodetic: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Latitude and longitude (degrees) on the rotating Earth of positions in the simulation frame,
+    e.g. the impact points of a whole dispersion at once.
+
+    Args:
+        positions (np.ndarray): (3,) or (N, 3) positions in the simulation frame.
+        times (np.ndarray): time (s) of each position since the frames lined up (or one for all).
+            Positions from a simulation done in the rotating frame already are Earth fixed,
+            so pass 0 for those.
+        rotation_rate, obliquity: see to_earth_fixed.
+        geodetic (bool): the geodetic latitude on the WGS 84 ellipsoid instead of the
+            geocentric one of a spherical Earth.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the latitudes and longitudes, () or (N,) arrays.
+    """
+    earth_fixed = to_earth_fixed(positions, times, rotation_rate, obliquity)
+
+    if geodetic:
+        return geodetic_latitude_longitude(earth_fixed)
+    return geocentric_latitude_longitude(earth_fixed)
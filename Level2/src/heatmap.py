@@ -0,0 +1,269 @@
+
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, Tuple
+
+
+class LandingHeatmap:
+    """
+    Streaming accumulator of landing locations, for heat maps of where the spacecraft is
+    likely to land without ever keeping the individual landing points around.
+
+    Landings are counted in a latitude/longitude histogram whose bins all cover the same area
+    of the sphere (uniform in longitude and in sin(latitude)), so the counts are directly
+    comparable between the poles and the equator. Alongside it, the running mean and covariance
+    of the landing points (as unit vectors, which avoids any trouble at the +/-180 degree
+    longitude seam) are kept with Welfords algorithm, from which the mean landing point and the
+    footprint ellipse come.
+
+    Every landing can carry a weight (the likelihood weight of an importance sampled case), in
+    which case the histogram and the statistics are weighted by it. With every weight 1 this is
+    the plain count.
+
+    Every update is O(1) per landing, and two accumulators (e.g. from two worker processes)
+    can be merged into one.
+    """
+
+    def __init__(self, latitude_bins: int = 180, longitude_bins: int = 360, planet_radius: float = 6371000):
+
+        self.latitude_bins = latitude_bins
+        self.longitude_bins = longitude_bins
+        self.planet_radius = planet_radius
+
+        self.counts = np.zeros((latitude_bins, longitude_bins))
+
+        # (Weighted) Welford accumulators of the landing unit vectors. count is the number of
+        # landings, weight_sum and weight_square_sum the sum of their weights and squared weights.
+        self.count = 0
+        self.weight_sum = 0.0
+        self.weight_square_sum = 0.0
+        self._mean = np.zeros(3)
+        self._m2 = np.zeros((3, 3))
+
+
+    @property
+    def latitude_edges(self) -> np.ndarray:
+        """ Bin edges in latitude (degrees), equally spaced in sin(latitude). """
+        return np.rad2deg(np.arcsin(np.linspace(-1.0, 1.0, self.latitude_bins + 1)))
+
+    @property
+    def longitude_edges(self) -> np.ndarray:
+        """ Bin edges in longitude (degrees). """
+        return np.linspace(-180.0, 180.0, self.longitude_bins + 1)
+
+
+    def _bin_indices(self, latitude, longitude) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The histogram bin of each landing, worked out directly (no searching) from the
+        equal-area spacing.
+        """
+        sin_latitude = np.sin(np.deg2rad(latitude))
+        latitude_index = np.floor((sin_latitude + 1.0) / 2.0 * self.latitude_bins).astype(int)
+
+        wrapped_longitude = (np.asarray(longitude) + 180.0) % 360.0
+        longitude_index = np.floor(wrapped_longitude / 360.0 * self.longitude_bins).astype(int)
+
+        return (np.clip(latitude_index, 0, self.latitude_bins - 1),
+                np.clip(longitude_index, 0, self.longitude_bins - 1))
+
+
+    @staticmethod
+    def _unit_vectors(latitude, longitude) -> np.ndarray:
+        latitude = np.deg2rad(latitude)
+        longitude = np.deg2rad(longitude)
+        return np.stack([np.cos(latitude) * np.cos(longitude),
+                         np.cos(latitude) * np.sin(longitude),
+                         np.sin(latitude)], axis=-1)
+
+
+    def add(self, latitude: float, longitude: float, weight: float = 1.0) -> None:
+        """
+        Adds one landing (degrees) to the heat map and the running statistics.
+        """
+        if weight <= 0:
+            return
+
+        latitude_index, longitude_index = self._bin_indices(latitude, longitude)
+        self.counts[latitude_index, longitude_index] += weight
+
+        # Welfords update of the mean and the sum of squared deviations (Wests weighted form)
+        point = self._unit_vectors(latitude, longitude)
+        self.count += 1
+        self.weight_sum += weight
+        self.weight_square_sum += weight**2
+        delta = point - self._mean
+        self._mean += delta * weight / self.weight_sum
+        self._m2 += weight * np.outer(delta, point - self._mean)
+
+
+    def add_many(self, latitudes: np.ndarray, longitudes: np.ndarray, weights: np.ndarray = None) -> None:
+        """
+        Adds a whole batch of landings at once (same result as calling add() for each).
+        """
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        weights = np.ones(latitudes.shape) if weights is None else np.asarray(weights, dtype=float)
+
+        keep = weights > 0
+        latitudes, longitudes, weights = latitudes[keep], longitudes[keep], weights[keep]
+        if latitudes.size == 0:
+            return
+
+        latitude_index, longitude_index = self._bin_indices(latitudes, longitudes)
+        np.add.at(self.counts, (latitude_index, longitude_index), weights)
+
+        # The batch's own statistics, combined in with the parallel form of Welfords algorithm
+        points = self._unit_vectors(latitudes, longitudes)
+        batch = LandingHeatmap(self.latitude_bins, self.longitude_bins, self.planet_radius)
+        batch.count = len(points)
+        batch.weight_sum = float(np.sum(weights))
+        batch.weight_square_sum = float(np.sum(weights**2))
+        batch._mean = weights @ points / batch.weight_sum
+        deviations = points - batch._mean
+        batch._m2 = (deviations * weights[:, np.newaxis]).T @ deviations
+
+        self._combine_statistics(batch)
+
+
+    def merge(self, other: "LandingHeatmap") -> None:
+        """
+        Folds another accumulator (with the same binning) into this one.
+        """
+        if (other.latitude_bins, other.longitude_bins) != (self.latitude_bins, self.longitude_bins):
+            raise ValueError("Can only merge heat maps with the same binning.")
+
+        self.counts += other.counts
+        self._combine_statistics(other)
+
+
+    def _combine_statistics(self, other: "LandingHeatmap") -> None:
+        """
+        Chan et al.s pairwise combination of two sets of Welford accumulators.
+        """
+        if other.count == 0:
+            return
+
+        total = self.weight_sum + other.weight_sum
+        delta = other._mean - self._mean
+
+        self._m2 = self._m2 + other._m2 + np.outer(delta, delta) * self.weight_sum * other.weight_sum / total
+        self._mean = self._mean + delta * other.weight_sum / total
+        self.count += other.count
+        self.weight_sum = total
+        self.weight_square_sum += other.weight_square_sum
+
+
+    def effective_sample_size(self) -> float:
+        """
+        How many unweighted landings the weighted ones are worth (Kish), the count itself
+        when every weight is 1.
+        """
+        if self.weight_square_sum == 0:
+            return 0.0
+        return self.weight_sum**2 / self.weight_square_sum
+
+
+    def mean_latitude_longitude(self) -> Tuple[float, float]:
+        """
+        The mean landing location (degrees), the direction of the mean landing unit vector.
+        """
+        x, y, z = self._mean
+        return (float(np.rad2deg(np.arctan2(z, np.hypot(x, y)))),
+                float(np.rad2deg(np.arctan2(y, x))))
+
+
+    def covariance(self) -> np.ndarray:
+        """
+        The 2x2 covariance of the landing points (m^2) in the plane tangent to the surface at
+        the mean landing point, with the axes (east, north).
+        """
+        # The reliability weights correction, which is just count - 1 when every weight is 1
+        normalization = self.weight_sum - self.weight_square_sum / self.weight_sum if self.count >= 2 else 0.0
+        if normalization <= 0:
+            return np.full((2, 2), np.nan)
+
+        latitude, longitude = np.deg2rad(self.mean_latitude_longitude())
+        east = np.array([-np.sin(longitude), np.cos(longitude), 0.0])
+        north = np.array([-np.sin(latitude) * np.cos(longitude),
+                          -np.sin(latitude) * np.sin(longitude),
+                          np.cos(latitude)])
+        projection = np.stack([east, north])
+
+        return projection @ (self._m2 / normalization) @ projection.T * self.planet_radius**2
+
+
+    def footprint_ellipse(self, probability: float = 0.95) -> Tuple[float, float, float]:
+        """
+        The ellipse expected to contain the given fraction of the landings (treating the
+        footprint as a 2D normal distribution).
+
+        Returns:
+            Tuple[float, float, float]: semi-major axis (m), semi-minor axis (m) and the direction
+                of the major axis in degrees clockwise from north.
+        """
+        eigenvalues, eigenvectors = np.linalg.eigh(self.covariance())
+
+        # Radius of the probability contour for a 2D normal, in standard deviations
+        scale = np.sqrt(-2.0 * np.log(1.0 - probability))
+
+        semi_minor, semi_major = scale * np.sqrt(np.maximum(eigenvalues, 0.0))
+        east, north = eigenvectors[:, 1]
+        heading = np.rad2deg(np.arctan2(east, north)) % 180.0
+
+        return float(semi_major), float(semi_minor), float(heading)
+
+
+    def density(self) -> np.ndarray:
+        """
+        The (weighted) fraction of the landings that fell in each bin.
+        """
+        return self.counts / self.weight_sum if self.weight_sum > 0 else self.counts
+
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The whole accumulator as arrays (what save() writes, and what checkpoints keep).
+        """
+        return {"counts": self.counts,
+                "count": np.array(self.count),
+                "weight_sum": np.array(self.weight_sum),
+                "weight_square_sum": np.array(self.weight_square_sum),
+                "mean": self._mean,
+                "m2": self._m2,
+                "planet_radius": np.array(self.planet_radius)}
+
+
+    @classmethod
+    def from_arrays(cls, data) -> "LandingHeatmap":
+        """
+        The accumulator back from the arrays of to_arrays() (or a mapping of them, like an opened .npz).
+        """
+        latitude_bins, longitude_bins = data["counts"].shape
+        heatmap = cls(latitude_bins, longitude_bins, float(data["planet_radius"]))
+        heatmap.counts = data["counts"].copy()
+        heatmap.count = int(data["count"])
+        # Heat maps saved before landings had weights are all weight 1
+        heatmap.weight_sum = float(data["weight_sum"]) if "weight_sum" in data else float(heatmap.count)
+        heatmap.weight_square_sum = (float(data["weight_square_sum"]) if "weight_square_sum" in data
+                                     else float(heatmap.count))
+        heatmap._mean = data["mean"].copy()
+        heatmap._m2 = data["m2"].copy()
+
+        return heatmap
+
+
+    def save(self, path: Path) -> None:
+        """
+        Writes the accumulator to a compressed .npz file.
+        """
+        np.savez_compressed(path, **self.to_arrays())
+
+
+    @classmethod
+    def load(cls, path: Path) -> "LandingHeatmap":
+        """
+        Reads back an accumulator written with save().
+        """
+        with np.load(path) as data:
+            return cls.from_arrays(data)
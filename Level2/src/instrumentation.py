@@ -0,0 +1,200 @@
+
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .config.simulation_config import InstrumentationConfig
+
+
+# How much gets traced at each level. Every level includes the ones before it.
+TRACE_LEVELS = {"off": 0,
+                "events": 1,       # events (including the termination of the run)
+                "steps": 2,        # every integrator step
+                "evaluations": 3}  # every acceleration evaluation
+
+
+# Trace files this process already started. The first run to write to one starts it afresh,
+# the runs after it (the other cases of a dispersion or sweep) add to it.
+_started_trace_files: Set[Path] = set()
+
+
+def trace_file_path(trace_file: str) -> Path:
+    """
+    The file a run writes its trace to. Worker processes (of a dispersion, sweep, ...) each
+    write to their own, with the process id before the suffix (e.g. trace.1234.jsonl), so they
+    dont write over each other.
+    """
+    path = Path(trace_file)
+    if multiprocessing.parent_process() is not None:
+        path = path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}")
+
+    return path
+
+
+@dataclass
+class TraceRecord:
+    """
+    One entry of the diagnostic trace.
+
+    Attributes:
+        level (str): the trace level it was recorded at.
+        kind (str): what happened ("step", "event", "evaluation", ...).
+        time (Optional[float]): simulation time it happened at, if it has one.
+        data (Dict[str, Any]): the rest of the details.
+    """
+    level: str
+    kind: str
+    time: Optional[float]
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+    def to_json(self) -> str:
+        return json.dumps({"level": self.level, "kind": self.kind, "time": self.time, **self.data},
+                          default=_to_builtin)
+
+
+def _to_builtin(value):
+    """
+    Converts the NumPy values in trace records into something json can write.
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot write {type(value).__name__} to the trace file.")
+
+
+class Instrumentation:
+    """
+    Diagnostics of a run, in place of printing to the terminal: counters, timers for the
+    phases of the run, and a trace of what happened that can be sampled and kept in a ring
+    buffer and/or written to a file.
+
+    With the defaults (trace_level "off", timers off) it costs next to nothing, so runs are
+    silent and fast unless the diagnostics are asked for in the config file.
+    """
+
+    def __init__(self, config: Optional[InstrumentationConfig] = None):
+
+        self.config = config if config is not None else InstrumentationConfig(None)
+        self.level = TRACE_LEVELS[self.config.trace_level]
+
+        self.counters: Dict[str, int] = {}
+        self.timings: Dict[str, float] = {}
+
+        # The most recent trace records
+        self.trace_buffer = deque(maxlen=self.config.trace_buffer_size)
+        self._trace_file = None
+
+        # How many records of each kind were offered, for the sampling
+        self._offered: Dict[str, int] = {}
+
+        # lap() is a no-op unless the timers are on, so it can sit in the step loop
+        self._last_lap = time.perf_counter()
+        self.lap = self._lap if self.config.timers else self._no_lap
+
+
+    def enabled(self, level: str) -> bool:
+        """
+        Whether records of the given level are being traced.
+        """
+        return self.level >= TRACE_LEVELS[level]
+
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+
+    def _lap(self, phase: Optional[str]) -> None:
+        """
+        Adds the time since the previous lap to `phase` (None just restarts the clock).
+        """
+        now = time.perf_counter()
+        if phase is not None:
+            self.add_time(phase, now - self._last_lap)
+        self._last_lap = now
+
+
+    def _no_lap(self, phase: Optional[str]) -> None:
+        pass
+
+
+    def trace(self, level: str, kind: str, time: Optional[float] = None, **data) -> None:
+        """
+        Records a trace entry, if the trace level includes `level`. Step and evaluation records
+        are sampled (only every sample_every-th of each kind is kept), events always are.
+        """
+        if self.level < TRACE_LEVELS[level]:
+            return
+
+        if level != "events":
+            offered = self._offered.get(kind, 0)
+            self._offered[kind] = offered + 1
+            if offered % self.config.sample_every != 0:
+                return
+
+        record = TraceRecord(level, kind, time, data)
+        self.trace_buffer.append(record)
+
+        if self.config.trace_file is not None:
+            if self._trace_file is None:
+                path = trace_file_path(self.config.trace_file)
+                self._trace_file = open(path, "a" if path in _started_trace_files else "w")
+                _started_trace_files.add(path)
+            self._trace_file.write(record.to_json() + "\n")
+
+
+    def traced_acceleration(self, acceleration: Callable, planet) -> Callable:
+        """
+        Wraps an acceleration function (array or float components version) so every
+        evaluation is traced, when the trace level is "evaluations". Otherwise the function
+        is handed back untouched, so it costs nothing.
+        """
+        if acceleration is None or not self.enabled("evaluations"):
+            return acceleration
+
+        def traced(*state):
+            result = acceleration(*state)
+            position = np.asarray(state[0] if len(state) == 2 else state[:3], dtype=float)
+            self.trace("evaluations", "evaluation",
+                       altitude=planet.get_altitude(position),
+                       state=np.concatenate([position, np.asarray(state[1] if len(state) == 2 else state[3:])]),
+                       acceleration=np.asarray(result))
+            return result
+
+        return traced
+
+
+    def get_trace(self) -> List[TraceRecord]:
+        """
+        The trace records still in the ring buffer, oldest first.
+        """
+        return list(self.trace_buffer)
+
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        The counters and the accumulated time of every phase (seconds).
+        """
+        return {"counters": dict(self.counters), "timings": dict(self.timings)}
+
+
+    def close(self) -> None:
+        """
+        Flushes and closes the trace file, if there is one.
+        """
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
@@ -0,0 +1,266 @@
+
+"""
+Closed form two-body (Kepler) propagation using the universal variable formulation.
+
+Planet.calculate_gravity is a point mass model, so as long as the drag is negligible the
+spacecraft is on a conic section and its state at any time can be solved for directly instead
+of being integrated step by step. The universal variable (chi) formulation covers elliptic,
+parabolic, hyperbolic and even purely radial trajectories with the same equations.
+
+Every function here works on a single (3,) state or on (N, 3) arrays of states.
+"""
+
+import numpy as np
+
+from typing import Tuple
+
+
+def stumpff_c(z: np.ndarray) -> np.ndarray:
+    """
+    The Stumpff function C(z), using its series expansion close to z = 0 where the
+    closed forms lose all their precision.
+    """
+    z = np.asarray(z, dtype=float)
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        sqrt_positive = np.sqrt(np.abs(z))
+        elliptic = (1 - np.cos(sqrt_positive)) / np.where(z == 0, 1.0, z)
+        hyperbolic = (np.cosh(sqrt_positive) - 1) / np.where(z == 0, 1.0, -z)
+        series = 1/2 - z/24 + z**2/720 - z**3/40320
+
+    return np.where(np.abs(z) < 1e-2, series, np.where(z > 0, elliptic, hyperbolic))
+
+
+def stumpff_s(z: np.ndarray) -> np.ndarray:
+    """
+    The Stumpff function S(z), using its series expansion close to z = 0.
+    """
+    z = np.asarray(z, dtype=float)
+
+    with np.errstate(invalid='ignore', over='ignore', divide='ignore'):
+        sqrt_positive = np.sqrt(np.abs(z))
+        cubed = np.where(z == 0, 1.0, sqrt_positive**3)
+        elliptic = (sqrt_positive - np.sin(sqrt_positive)) / cubed
+        hyperbolic = (np.sinh(sqrt_positive) - sqrt_positive) / cubed
+        series = 1/6 - z/120 + z**2/5040 - z**3/362880
+
+    return np.where(np.abs(z) < 1e-2, series, np.where(z > 0, elliptic, hyperbolic))
+
+
+def _orbit_invariants(position: np.ndarray, velocity: np.ndarray, mu: float):
+    """
+    The quantities the universal variable equations are written in terms of.
+
+    Returns:
+        r0 (distance from the center), sigma0 (r.v / sqrt(mu)) and alpha (1 / semi-major axis,
+        negative for hyperbolic orbits and zero for parabolic ones).
+    """
+    r0 = np.linalg.norm(position, axis=-1)
+    sigma0 = np.sum(position * velocity, axis=-1) / np.sqrt(mu)
+    alpha = 2.0 / r0 - np.sum(velocity * velocity, axis=-1) / mu
+
+    return r0, sigma0, alpha
+
+
+def _eccentricity(r0, sigma0, alpha):
+    """
+    The eccentricity, written in the universal variable terms so it also holds for radial trajectories.
+    """
+    return np.sqrt(np.maximum((1 - r0 * alpha)**2 + alpha * sigma0**2, 0.0))
+
+
+def specific_energy(position: np.ndarray, velocity: np.ndarray, mu: float) -> np.ndarray:
+    """
+    Orbital energy per unit mass (J/kg), v^2 / 2 - mu / r. Zero or above means the orbit is
+    open (parabolic or hyperbolic), so the spacecraft escapes unless something slows it down.
+    """
+    position = np.asarray(position, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+
+    return 0.5 * np.sum(velocity * velocity, axis=-1) - mu / np.linalg.norm(position, axis=-1)
+
+
+def periapsis_radius(position: np.ndarray, velocity: np.ndarray, mu: float) -> np.ndarray:
+    """
+    The closest the two-body orbit through the state(s) comes to the center of the planet,
+    from the angular momentum and eccentricity (zero for a purely radial trajectory).
+    """
+    position = np.asarray(position, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+
+    r0, sigma0, alpha = _orbit_invariants(position, velocity, mu)
+    angular_momentum_squared = np.sum(np.cross(position, velocity)**2, axis=-1)
+
+    return angular_momentum_squared / (mu * (1 + _eccentricity(r0, sigma0, alpha)))
+
+
+def _radius_at(chi, r0, sigma0, alpha):
+    """ Distance from the center after moving chi along the orbit. """
+    z = alpha * chi**2
+    return chi**2 * stumpff_c(z) + sigma0 * chi * (1 - z * stumpff_s(z)) + r0 * (1 - z * stumpff_c(z))
+
+
+def _time_at(chi, r0, sigma0, alpha, mu):
+    """ Time it takes to move chi along the orbit (universal form of Keplers equation). """
+    z = alpha * chi**2
+    return (sigma0 * chi**2 * stumpff_c(z) + (1 - alpha * r0) * chi**3 * stumpff_s(z) + r0 * chi) / np.sqrt(mu)
+
+
+def _state_at(chi, time, position, velocity, r0, alpha, mu) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Position and velocity after moving chi (taking `time` seconds) along the orbit,
+    using the Lagrange f and g coefficients.
+    """
+    z = alpha * chi**2
+    C = stumpff_c(z)
+    S = stumpff_s(z)
+
+    f = 1 - chi**2 * C / r0
+    g = time - chi**3 * S / np.sqrt(mu)
+
+    new_position = f[..., np.newaxis] * position + g[..., np.newaxis] * velocity
+    r = np.linalg.norm(new_position, axis=-1)
+
+    f_dot = np.sqrt(mu) / (r * r0) * (alpha * chi**3 * S - chi)
+    g_dot = 1 - chi**2 * C / r
+
+    new_velocity = f_dot[..., np.newaxis] * position + g_dot[..., np.newaxis] * velocity
+
+    return new_position, new_velocity
+
+
+def propagate(position: np.ndarray,
+              velocity: np.ndarray,
+              time,
+              mu: float,
+              tolerance: float = 1e-12,
+              max_iterations: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Propagates a state (or a batch of them) forwards by `time` seconds on its two-body orbit.
+
+    Solves the universal form of Keplers equation for chi with Newtons method, then gets the
+    state from the Lagrange coefficients.
+
+    Args:
+        position (np.ndarray): (3,) or (N, 3) starting position(s).
+        velocity (np.ndarray): (3,) or (N, 3) starting velocity(ies).
+        time (float | np.ndarray): time to propagate by, a scalar or one per state.
+        mu (float): gravitational parameter of the planet (G * M).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the propagated position(s) and velocity(ies).
+    """
+    position = np.asarray(position, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+    time = np.asarray(time, dtype=float)
+
+    # Broadcasting a single state against several times (or the other way around) is allowed
+    leading_shape = np.broadcast_shapes(position.shape[:-1], velocity.shape[:-1], time.shape)
+    position = np.broadcast_to(position, leading_shape + (3,))
+    velocity = np.broadcast_to(velocity, leading_shape + (3,))
+    time = np.broadcast_to(time, leading_shape)
+
+    r0, sigma0, alpha = _orbit_invariants(position, velocity, mu)
+
+    # Initial guess, which is exact for circular orbits
+    chi = np.where(np.abs(alpha) * r0 > 1e-12, np.sqrt(mu) * np.abs(alpha) * time, np.sqrt(mu) * time / r0)
+
+    for _ in range(max_iterations):
+        F = _time_at(chi, r0, sigma0, alpha, mu) * np.sqrt(mu) - np.sqrt(mu) * time
+        dF = _radius_at(chi, r0, sigma0, alpha)
+
+        correction = F / dF
+        chi = chi - correction
+
+        if np.all(np.abs(correction) <= tolerance * np.maximum(1.0, np.abs(chi))):
+            break
+
+    return _state_at(chi, time, position, velocity, r0, alpha, mu)
+
+
+def coast_to_radius(position: np.ndarray,
+                    velocity: np.ndarray,
+                    target_radius: float,
+                    mu: float,
+                    bisection_iterations: int = 100) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Finds, for each state, when it will first come down through the sphere of `target_radius`
+    (the entry interface), and what its state is at that moment.
+
+    The crossing is searched for on the descending part of the orbit just before the next
+    periapsis, where the distance from the center only ever decreases, so a bisection on
+    chi is guaranteed to find it.
+
+    Args:
+        position (np.ndarray): (3,) or (N, 3) starting position(s).
+        velocity (np.ndarray): (3,) or (N, 3) starting velocity(ies).
+        target_radius (float): distance from the center of the planet to stop at.
+        mu (float): gravitational parameter of the planet (G * M).
+
+    Returns:
+        coast_time (np.ndarray): seconds until the crossing (nan where it never happens).
+        position (np.ndarray): the state at the crossing (unchanged where it never happens).
+        velocity (np.ndarray): "    "
+        reaches (np.ndarray): boolean saying which states actually come down to the radius.
+            States that already start inside it report a coast time of zero.
+    """
+    position = np.asarray(position, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+
+    r0, sigma0, alpha = _orbit_invariants(position, velocity, mu)
+    eccentricity = _eccentricity(r0, sigma0, alpha)
+    periapsis = periapsis_radius(position, velocity, mu)
+
+    parabolic = np.abs(alpha) * r0 <= 1e-12
+    elliptic = (alpha > 0) & ~parabolic
+    hyperbolic = (alpha < 0) & ~parabolic
+    descending = sigma0 < 0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+
+        # Elliptic orbits: eccentric anomaly, with the next periapsis at E = 2 pi (or 0 if descending)
+        sqrt_alpha = np.sqrt(np.abs(alpha))
+        eccentric_anomaly = np.arctan2(sigma0 * sqrt_alpha, 1 - r0 * alpha)
+        chi_periapsis_elliptic = np.where(eccentric_anomaly < 0,
+                                          -eccentric_anomaly,
+                                          2 * np.pi - eccentric_anomaly) / sqrt_alpha
+        chi_apoapsis_elliptic = np.where(eccentric_anomaly < 0, 0.0, (np.pi - eccentric_anomaly) / sqrt_alpha)
+
+        # Hyperbolic orbits: hyperbolic anomaly, only ever reach periapsis if currently descending
+        hyperbolic_anomaly = np.arcsinh(sigma0 * sqrt_alpha / np.where(eccentricity == 0, 1.0, eccentricity))
+        chi_periapsis_hyperbolic = -hyperbolic_anomaly / sqrt_alpha
+
+        # Parabolic orbits
+        chi_periapsis_parabolic = -sigma0
+
+    chi_low = np.where(elliptic, chi_apoapsis_elliptic, 0.0)
+    chi_high = np.where(elliptic, chi_periapsis_elliptic,
+                        np.where(hyperbolic, chi_periapsis_hyperbolic, chi_periapsis_parabolic))
+
+    already_inside = r0 <= target_radius
+    reaches = (~already_inside & (periapsis < target_radius) & (elliptic | descending)) | already_inside
+
+    # Keep the bisection well defined for the states that are not going anywhere
+    searching = reaches & ~already_inside
+    chi_low = np.where(searching, chi_low, 0.0)
+    chi_high = np.where(searching, chi_high, 0.0)
+
+    # On [chi_low, chi_high] the distance drops monotonically down to the periapsis distance
+    for _ in range(bisection_iterations):
+        chi_middle = 0.5 * (chi_low + chi_high)
+        above = _radius_at(chi_middle, r0, sigma0, alpha) > target_radius
+        chi_low = np.where(above, chi_middle, chi_low)
+        chi_high = np.where(above, chi_high, chi_middle)
+
+    chi = 0.5 * (chi_low + chi_high)
+    coast_time = _time_at(chi, r0, sigma0, alpha, mu)
+
+    new_position, new_velocity = _state_at(chi, coast_time, position, velocity, r0, alpha, mu)
+
+    # States that never get there (or are there already) are handed back untouched
+    untouched = ~searching[..., np.newaxis]
+    new_position = np.where(untouched, position, new_position)
+    new_velocity = np.where(untouched, velocity, new_velocity)
+    coast_time = np.where(reaches, np.where(already_inside, 0.0, coast_time), np.nan)
+
+    return coast_time, new_position, new_velocity, reaches
@@ -2,7 +2,10 @@
 
 import numpy as np
 
+from typing import Tuple
+
 from .config.physics_config import PhysicsConfig
+from .forces import create_force_models, shared_radius_and_speed
 from .spacecraft import Spacecraft
 from .planet import Planet
 
@@ -14,10 +17,34 @@ class Physics:
         self.planet = planet
         self.spacecraft = spacecraft
 
-        # Parameters set by user for a specific spacecraft
-        self.cross_sectional_area = self.spacecraft.cross_sect_area
-        self.drag_coefficient = self.spacecraft.drag_coefficient
-        self.mass = self.spacecraft.mass
+        # The enabled force models are worked out once here, so every acceleration evaluation
+        # is just a run through this list (gravity always comes first).
+        self.force_models = create_force_models(self)
+        self._sensed_models = [model for model in self.force_models if model.sensed]
+
+
+    # Parameters set by user for a specific spacecraft.
+    # These read through to the spacecraft object (instead of being copied once) so that
+    # a SpacecraftEnsemble which drops its finished members stays in sync with the physics.
+    @property
+    def cross_sectional_area(self):
+        return self.spacecraft.cross_sect_area
+
+    @property
+    def drag_coefficient(self):
+        return self.spacecraft.drag_coefficient
+
+    @property
+    def mass(self):
+        return self.spacecraft.mass
+
+    @property
+    def lift_coefficient(self):
+        return self.spacecraft.lift_coefficient
+
+    @property
+    def bank_angle(self):
+        return self.spacecraft.bank_angle
 
 
     def get_acceleration(self, spacecraft_position: np.ndarray, spacecraft_velocity: np.ndarray):
@@ -25,6 +52,9 @@ class Physics:
         Houses all of the calls to the acceleration calculations the simulation takes into account.
         Specified explicitly by the user in the config file.
 
+        Works on a single spacecraft ((3,) vectors) as well as on an ensemble ((N, 3) arrays),
+        in which case every row is one member and the result has the same shape.
+
         Args:
             spacecraft_position (np.ndarray): a vector for the position of the spacecraft
             spacecraft_velocity (np.ndarray): a vector for the velocity of the spacecraft
@@ -34,24 +64,66 @@ class Physics:
         """
         
         # Local variable which will hold the force thats calculated.
-        total_acceleration = np.zeros((3))
+        total_acceleration = np.zeros(np.shape(spacecraft_position))
 
-        # Gravity (included by default)
-        total_acceleration += self.get_gravity(spacecraft_position)
-    
-        # Drag
-        if self.config.include_drag:
-            total_acceleration += self.get_drag(spacecraft_position, spacecraft_velocity)
-        
-        # NOTE(TA 07dec2024): add extra forces the craft could experience here later on
+        # Every force model the user turned on in the config file, gravity first
+        for model in self.force_models:
+            total_acceleration += model(spacecraft_position, spacecraft_velocity)
 
         return total_acceleration
 
 
+    def has_fast_path(self) -> bool:
+        """
+        Whether every enabled force model can be evaluated by get_acceleration_components().
+        """
+        return all(model.has_components() for model in self.force_models)
+
+
+    def get_acceleration_components(self, x: float, y: float, z: float,
+                                    vx: float, vy: float, vz: float) -> Tuple[float, float, float]:
+        """
+        Fast path of get_acceleration() for a single spacecraft, working on plain floats.
+
+        For 3-vectors the NumPy call overhead (temporaries, norms, broadcasting) costs far more
+        than the math itself, so this does the same math one component at a time, with the
+        radius and speed worked out once and shared between the force models. Every operation
+        is done in the same order as in get_acceleration() (and the transcendental functions
+        are still NumPys), so the result is bit-for-bit the same.
+
+        Only usable when has_fast_path() is True.
+
+        Returns:
+            Tuple[float, float, float]: the acceleration components.
+        """
+        radius, speed = shared_radius_and_speed(x, y, z, vx, vy, vz)
+
+        ax = ay = az = 0.0
+        for model in self.force_models:
+            dx, dy, dz = model.components(x, y, z, vx, vy, vz, radius, speed)
+            ax += dx
+            ay += dy
+            az += dz
+
+        return ax, ay, az
+
+
+    def get_sensed_acceleration(self, spacecraft_position: np.ndarray, spacecraft_velocity: np.ndarray):
+        """
+        The part of the acceleration felt on board (the aerodynamic forces), which leaves out
+        gravity and the apparent forces of a rotating frame.
+        """
+        sensed_acceleration = np.zeros(np.shape(spacecraft_position))
+        for model in self._sensed_models:
+            sensed_acceleration += model(spacecraft_position, spacecraft_velocity)
+
+        return sensed_acceleration
+
+
     def get_gravity(self, spacecraft_position: np.ndarray):
         """
-        Handles calling the planets classes calculate_gravity function in order to calculate
-        the gravity that the object feels at a particular position.
+        Calculates the gravity that the object feels at a particular position, with the
+        gravity model picked in the config file.
 
         Args:
             spacecraft_position (np.ndarray): a vector for the position of the spacecraft
@@ -59,7 +131,7 @@ class Physics:
         Returns:
             np.ndarray: acceleration due to gravity the spacecraft is experiencing.
         """
-        return self.planet.calculate_gravity(spacecraft_position)
+        return self.force_models[0](spacecraft_position, None)
     
 
     def get_drag(self, spacecraft_position: np.ndarray, spacecraft_velocity: np.ndarray):
@@ -80,20 +152,27 @@ class Physics:
         # user specified in the config file.
         air_density = self.planet.get_atmospheric_density(spacecraft_position)
 
-        velocity_magnitude = np.linalg.norm(spacecraft_velocity)
+        velocity_magnitude = np.linalg.norm(spacecraft_velocity, axis=-1, keepdims=True)
 
         # Drag works in the opposite direction of motion. So this unit vector is used to get
         # the directional aspect of the motion so we can tell how that drag force is divied up 
         # along the three cartesian coordinates.
-        unit_vector_opposite_to_velocity = -spacecraft_velocity / np.linalg.norm(spacecraft_velocity)
+        unit_vector_opposite_to_velocity = -spacecraft_velocity / velocity_magnitude
+
+        # The density and the design parameters are one value per spacecraft (scalars, or (N,)
+        # arrays for an ensemble), so give them a trailing axis to line up with the vectors.
+        air_density = np.expand_dims(air_density, -1)
+        drag_coefficient = np.expand_dims(self.drag_coefficient, -1)
+        cross_sectional_area = np.expand_dims(self.cross_sectional_area, -1)
+        mass = np.expand_dims(self.mass, -1)
 
         # Actual drag force, taking in all the variables previously retrieved & calculated
-        drag_force = (0.5 * self.drag_coefficient * self.cross_sectional_area * 
+        drag_force = (0.5 * drag_coefficient * cross_sectional_area * 
                       air_density * (velocity_magnitude**2) * 
                       unit_vector_opposite_to_velocity)
         
 
-        drag_acceleration = drag_force / self.mass
+        drag_acceleration = drag_force / mass
 
         
         return drag_acceleration
\ No newline at end of file
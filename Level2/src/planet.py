@@ -1,9 +1,14 @@
 
 import numpy as np
 
+from .atmosphere import create_atmosphere
 from .config.planet_config import PlanetConfig
 
 
+# the gravitational constant
+GRAVITATIONAL_CONSTANT = 6.67430e-11
+
+
 class Planet:
     """
     All parameters pertaining to the planet that youre wanting to use.
@@ -20,8 +25,15 @@ class Planet:
         # Default planet parameters that are used throughout program
         self.mass = config.mass
         self.radius = config.radius
+        self.gravitational_parameter = GRAVITATIONAL_CONSTANT * self.mass  # G*M, used by the Kepler solver
+        self.j2 = config.j2
+        self.rotation_rate = config.rotation_rate
         self.atmospheric_density_model = config.atmospheric_model
 
+        # The atmosphere model is built (and tabulated, if it is a tabulated one) once here,
+        # so evaluating it never has to look at the model name again.
+        self.atmosphere = create_atmosphere(config)
+
     def calculate_gravity(self, position_of_object: np.ndarray) -> np.ndarray:
         """
         Calculates, given the position of the spacecraft, the gravitational force
@@ -31,6 +43,7 @@ class Planet:
         
         Args:
             position_of_object: the array specifying the position of the spacecraft currently.
+                Either a single (3,) vector or an (N, 3) array of positions for an ensemble.
 
         Raises:
             ZeroDivisionError: In case the simulation calculates the position of the 
@@ -43,53 +56,44 @@ class Planet:
         """
 
 
-        # the gravitational constant
-        G = 6.67430e-11
+        G = GRAVITATIONAL_CONSTANT
 
-        dist = np.linalg.norm(position_of_object)
+        # Norm along the last axis (with the axis kept) so that a single vector and a
+        # whole (N, 3) batch of positions go through the exact same math.
+        dist = np.linalg.norm(position_of_object, axis=-1, keepdims=True)
 
-        if dist == 0:
+        if np.any(dist == 0):
             raise ZeroDivisionError("Position vector cannot be zero.")
         
         return -G * self.mass * position_of_object / (dist**3)
 
 
-    def get_atmospheric_density(self, position_of_object: np.ndarray):
+    def get_altitude(self, position_of_object: np.ndarray):
         """
-        Calls the atmospheric density model represented by what the user 
-        specified in the config file.
+        Height above the surface of the planet (assuming the planet is a perfect sphere a.t.m.),
+        a float for a (3,) position or an (N,) array for (N, 3) positions.
         """
+        return np.linalg.norm(position_of_object, axis=-1) - self.radius
 
-        if self.atmospheric_density_model == "exponential_decay":
-            return self.atmosphere_exponential_decay(position_of_object)
-        
-        
-        raise ValueError("You did not select a currently programmed atmospheric model.")
-    
 
-    def atmosphere_exponential_decay(self, position_of_object: np.ndarray):
+    def get_atmospheric_density(self, position_of_object: np.ndarray):
         """
-        The exponential decay model for determining the  air density as a 
-        function of altitude for a planet.
-        Simplest model.
+        The air density (kg/m^3) at the spacecrafts position, from the atmospheric
+        density model the user specified in the config file.
 
         Args:
-            position_of_object (np.ndarray): the position of the spacecraft
-        
+            position_of_object (np.ndarray): the position of the spacecraft, (3,) or (N, 3)
+
         Returns:
-            air_density (float): the scalar value of the density of the air 
-                at the specified altitude. (in kg/m^3)
-        
+            air_density (float | np.ndarray): the density at that position, or an (N,) array
+                of them for a batch.
         """
-        scale_height = self.config.scale_height        
-        sea_level_density = self.config.sea_level_density
-
+        return self.atmosphere.density(self.get_altitude(position_of_object))
 
-        # The distance the spacecraft is from the surface of the planet
-        # (assuming the planet is a perfect sphere a.t.m.)
-        height_from_surface = np.linalg.norm(position_of_object) - self.radius
-        print("height: ", height_from_surface)
 
-        density = sea_level_density * np.exp(-height_from_surface/scale_height)
-
-        return density
\ No newline at end of file
+    def get_atmospheric_properties(self, position_of_object: np.ndarray):
+        """
+        The air density (kg/m^3), temperature (K) and speed of sound (m/s) at the spacecrafts
+        position. The models that only describe the density give nan for the other two.
+        """
+        return self.atmosphere.properties(self.get_altitude(position_of_object))
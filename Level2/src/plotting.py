@@ -1,30 +1,103 @@
 
-from typing import List, Tuple, Optional
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple, Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
-import plotly.express as px
-import pandas as pd
+
+from .config.plotting_config import PlottingConfig
+from .decimation import lttb_indices
+from .geodesy import impact_latitude_longitude
+
+# matplotlib, plotly and pandas are only imported once something is actually plotted (see
+# _pyplot), they take about a second to import, which batch runs and the worker processes
+# of the dispersions and sweeps that never plot shouldnt pay for.
+
+
+def _pyplot(headless: bool):
+    """
+    matplotlib.pyplot, switched to the non-interactive Agg backend first when headless, so no
+    GUI library is ever loaded and plt.show cant block.
+    """
+    import matplotlib
+    if headless:
+        matplotlib.use("Agg")
+
+    import matplotlib.pyplot as plt
+    return plt
 
 
 class Plotting:
     """
     A class to house all plotting related materials needed at times throughout the project.
-    
+
+    The curves are decimated (largest-triangle-three-buckets, see decimation.py) down to
+    max_points before being handed to matplotlib, since a plot a few hundred pixels wide cant
+    show more than that anyway. Pass max_points=None to plot every stored point.
+
+    Saved plots go to output_directory, once per format (e.g. plots/landing_heatmap.pdf), and
+    their paths are kept in `written`. Headless, display_plot is ignored: nothing is ever
+    shown and every figure is closed once it is saved.
     """
 
-    def simple_orbital_trajectory(self, list_of_positions: List[np.ndarray], display_plot: bool):
+    # Default number of points a curve is decimated down to
+    POINT_BUDGET = 2000
+
+    def __init__(self, headless: bool = False, output_directory: Path = "plots", formats: Sequence[str] = ("pdf",)):
+
+        self.headless = headless
+        self.output_directory = Path(output_directory)
+        self.formats = list(formats)
+        self.written: List[Path] = []
+
+
+    @classmethod
+    def from_config(cls, config: PlottingConfig) -> "Plotting":
+        return cls(config.headless, config.output_directory, config.formats)
+
+
+    @property
+    def plt(self):
+        return _pyplot(self.headless)
+
+
+    def _finish(self, fig, name: str, display_plot: bool, save_plot: bool) -> None:
+        """
+        Saves a matplotlib figure (in every image format asked for) and/or shows it, then
+        closes it if it isnt going to be shown.
+        """
+        plt = self.plt
+        if save_plot:
+            self.output_directory.mkdir(parents=True, exist_ok=True)
+            for plot_format in self.formats:
+                if plot_format != "html":
+                    path = self.output_directory / f"{name}.{plot_format}"
+                    fig.savefig(path, bbox_inches='tight')
+                    self.written.append(path)
+
+        if display_plot and not self.headless:
+            plt.show()
+        else:
+            plt.close(fig)
+
+    def simple_orbital_trajectory(self, list_of_positions: np.ndarray, display_plot: bool,
+                                  max_points: Optional[int] = POINT_BUDGET,
+                                  save_plot: bool = False,
+                                  name: str = "orbital_trajectory"):
         """
         Plotting a list of the spacecrafts positions calculated over the simulation,
         and adding in a blank sphere to mimic the Earth.
 
         Args:
-            list_of_positions (list): the positions (x,y,z) of the spacecraft that were saved
+            list_of_positions (np.ndarray): the (T, 3) positions (x,y,z) of the spacecraft that were saved
+                (a list of positions works too)
             display_plot (bool): stating whether you want the plot to show. True for yes, False for no.
+            max_points (Optional[int]): how many points the trajectory is decimated down to.
+            save_plot (bool): whether to save the plot, as `name`.
         
         """
 
-        
+        if not (display_plot or save_plot):
+            return
 
 
         # Making a sphere to represent the Earths surface
@@ -36,69 +109,49 @@ class Plotting:
     
         
 
-        # Extracting the x,y,z positions from the list received
-        x_positions = [item[0] for item in list_of_positions]
-        y_positions = [item[1] for item in list_of_positions]
-        z_positions = [item[2] for item in list_of_positions]
+        # Extracting the x,y,z positions from the (decimated) trajectory received
+        positions = self._decimated(np.asarray(list_of_positions, dtype=float), max_points)
+        x_positions, y_positions, z_positions = positions[:, 0], positions[:, 1], positions[:, 2]
 
        
 
         
 
-        if display_plot:
-            fig = plt.figure(figsize=(10, 8))
-            ax = fig.add_subplot(111, projection='3d')
+        fig = self.plt.figure(figsize=(10, 8))
+        ax = fig.add_subplot(111, projection='3d')
 
-            ax.set_xlim(-1e7, 1e7)
-            ax.set_ylim(-1e7, 1e7)
+        ax.set_xlim(-1e7, 1e7)
+        ax.set_ylim(-1e7, 1e7)
 
-            ax.plot_surface(x_sphere, y_sphere, z_sphere, alpha=0.3)
-            ax.plot(x_positions, y_positions, z_positions)
-            plt.show()
+        ax.plot_surface(x_sphere, y_sphere, z_sphere, alpha=0.3)
+        ax.plot(x_positions, y_positions, z_positions)
+
+        self._finish(fig, name, display_plot, save_plot)
 
     def crash_point_latLon_on_actual_earth(self, crash_location_on_sphere: np.ndarray, time_elapsed: float):
         """
         Mathematically determining the latitude and longitude of the crash spot on the actual Earth.
 
-        The simulation reference frame is oriented the same as an Earth based one, where its tilted
-        23.5 degrees, and starting at time=0, theyre x-axes are pointing in the same direction. The x-axis
-        for the Earth based frame is 0 degrees longitude.
-        So with the information of how long the simulation ran, I rotate the Earth by that amount of time about the z-axis 
-        in order to get where the spacecraft would have hit on the actual Earth.
+        The simulation reference frame is oriented the same as an Earth based one, and starting at
+        time=0, theyre x-axes are pointing in the same direction. The x-axis for the Earth based frame
+        is 0 degrees longitude. So with the information of how long the simulation ran, the Earth is
+        rotated by that amount of time about the z-axis in order to get where the spacecraft would have
+        hit on the actual Earth. (This is just one point of geodesy.impact_latitude_longitude, which
+        does whole arrays of them.)
 
         Args:
             crash_location_on_sphere (np.ndarray): the vector which represents where the craft hit the blank sphere
                 that has the same radius of the Earth.
             time_elapsed (float): the time from when the simulation began to when it was terminated.
         """
+        latitude, longitude = impact_latitude_longitude(crash_location_on_sphere, time_elapsed)
 
-        earths_tilt_degrees = 23.5  
-        earths_rotation_rate = 360 / (24*60*60)  # degrees/second
-    
-        point_on_earth = np.zeros(3)
-        x_sphere, y_sphere, z_sphere = crash_location_on_sphere[0], crash_location_on_sphere[1], crash_location_on_sphere[2]
-
-        # Total amount the earth rotated in that time, in radians
-        total_rotation = np.radians(earths_rotation_rate * time_elapsed)
-
-        # The point on the earth which is where that collision point would be equal to.
-        # Connecting a non rotating reference frame to earths actual ref. frame
-        point_on_earth[0] = x_sphere * np.cos(total_rotation) - y_sphere * np.sin(total_rotation)
-        point_on_earth[1] = x_sphere * np.cos(total_rotation) + y_sphere * np.cos(total_rotation)
-        point_on_earth[2] = z_sphere
+        return float(latitude), float(longitude)
 
-        r = np.linalg.norm(point_on_earth)
-        latitude = np.asin(point_on_earth[2] / r)
-        longitude = np.atan2(point_on_earth[1], point_on_earth[0])
-
-        
-
-
-        return np.rad2deg(latitude), np.rad2deg(longitude)
-    
 
 
-    def plot_point_on_map(self, latitude:float, longitude:float, display_plot:bool):
+    def plot_point_on_map(self, latitude:float, longitude:float, display_plot:bool,
+                          save_plot: bool = False, name: str = "crash_point"):
         """
         At least for now, this function plots the crash point on an actual map of the Earth.
 
@@ -106,6 +159,7 @@ class Plotting:
             latitude (float): the latitude of the crash location on the Earth.
             longitude (float): the longitude of the crash location on the Earth.
             display_plot (bool): a conditional stating whether the user wants the plot to display.
+            save_plot (bool): whether to save the map as `name`.html (if html is one of the formats).
 
         TODO: I would like to eventually add a dotted line on the same plot so that 
         one can see its trajectory before it hits. A spherical or standard mercadian underlying plot,
@@ -113,6 +167,12 @@ class Plotting:
         
         """
 
+        if not (display_plot or save_plot):
+            return
+
+        import pandas as pd
+        import plotly.express as px
+
         columns = ['latitude', 'longitude']
         data = [(latitude, longitude)]
 
@@ -123,19 +183,79 @@ class Plotting:
                              lon=empty['longitude'],
                              zoom=1)
         
-        if display_plot:
+        if save_plot and "html" in self.formats:
+            self.output_directory.mkdir(parents=True, exist_ok=True)
+            path = self.output_directory / f"{name}.html"
+            fig.write_html(path)
+            self.written.append(path)
+        if display_plot and not self.headless:
             fig.show()
 
 
-    def simple_2d_plot(self, list_of_positions: List[np.ndarray], display_plot: bool):
+    def plot_landing_heatmap(self, heatmap, display_plot: bool, save_plot: bool, probability: float = 0.95,
+                             name: str = "landing_heatmap"):
+        """
+        Heat map of where the spacecraft is likely to land, drawn straight from the accumulated
+        grid of a LandingHeatmap (so no individual landing points are needed), with the mean
+        landing point and its footprint ellipse on top.
+
+        Args:
+            heatmap (LandingHeatmap): the accumulated landings.
+            display_plot (bool): a conditional stating whether the user wants the plot to display.
+            save_plot (bool): whether to save the plot, as `name`.
+            probability (float): fraction of the landings the drawn footprint ellipse should hold.
+        """
+
+        fig, ax = self.plt.subplots(figsize=(10, 5))
+        ax.set_xlabel("Longitude (degrees)")
+        ax.set_ylabel("Latitude (degrees)")
+        ax.set_title(f"Landing locations ({heatmap.count} landings)")
+
+        # Bins with no landings are left blank
+        density = np.ma.masked_equal(heatmap.density(), 0)
+        mesh = ax.pcolormesh(heatmap.longitude_edges, heatmap.latitude_edges, density, cmap="inferno")
+        fig.colorbar(mesh, ax=ax, label="Fraction of landings")
+
+        if heatmap.count >= 2:
+            mean_latitude, mean_longitude = heatmap.mean_latitude_longitude()
+            semi_major, semi_minor, heading = heatmap.footprint_ellipse(probability)
+
+            # The ellipse in the plane tangent at the mean landing point, converted to degrees
+            u = np.linspace(0, 2 * np.pi, 100)
+            heading = np.deg2rad(heading)
+            along, across = semi_major * np.cos(u), semi_minor * np.sin(u)
+            north = along * np.cos(heading) - across * np.sin(heading)
+            east = along * np.sin(heading) + across * np.cos(heading)
+
+            ellipse_latitude = mean_latitude + np.rad2deg(north / heatmap.planet_radius)
+            ellipse_longitude = mean_longitude + np.rad2deg(east / (heatmap.planet_radius * np.cos(np.deg2rad(mean_latitude))))
+
+            ax.plot(mean_longitude, mean_latitude, "c+")
+            ax.plot(ellipse_longitude, ellipse_latitude, "c--", label=f"{probability:.0%} footprint")
+            ax.legend()
+
+            # Zoom in on the footprint, it is usually tiny compared to the whole globe
+            margin = 3 * max(np.ptp(ellipse_latitude), np.ptp(ellipse_longitude), 0.1)
+            ax.set_xlim([mean_longitude - margin, mean_longitude + margin])
+            ax.set_ylim([mean_latitude - margin, mean_latitude + margin])
+
+        self._finish(fig, name, display_plot, save_plot)
+
+
+    def simple_2d_plot(self, list_of_positions: np.ndarray, display_plot: bool,
+                       max_points: Optional[int] = POINT_BUDGET,
+                       save_plot: bool = False,
+                       name: str = "trajectory_2d"):
         """
         Simple 2-dimensional plot of the spacecrafts trajectory. Can only handle the spacecraft
         orbiting on the z=0 plane at the moment, so set initial conditions carefully.
 
         Args:
-            list_of_positions (List[np.ndarray]): list of the positions that the spacecraft was calculated
-                to go to. This function unpacks that list in order to get the components separately.
+            list_of_positions (np.ndarray): the (T, 3) positions that the spacecraft was calculated
+                to go to (or a list of them). This function splits them up to get the components separately.
             display_plot (bool): Boolean stating whether you want the plot to display on screen or not.
+            max_points (Optional[int]): how many points the trajectory is decimated down to.
+            save_plot (bool): whether to save the plot, as `name`.
         
         Returns:
             None: Generates a plot without returning anything to the caller.
@@ -147,7 +267,10 @@ class Plotting:
         
         """
 
-        fig, ax = plt.subplots(figsize=(7, 7))
+        if not (display_plot or save_plot):
+            return
+
+        fig, ax = self.plt.subplots(figsize=(7, 7))
 
         # Generating a circle representing the surface of the Earth
         u = np.linspace(0, 2 * np.pi, 100)
@@ -156,10 +279,10 @@ class Plotting:
         y_circle = radius_of_planet * np.sin(u)
 
 
-        # Extracting the x,y,z positions from the list received
-        x_positions = [item[0] for item in list_of_positions]
-        y_positions = [item[1] for item in list_of_positions]
-        # z_positions = [item[2] for item in list_of_positions]
+        # Extracting the x,y positions from the (decimated) trajectory received
+        positions = np.asarray(list_of_positions, dtype=float)[:, :2]
+        positions = self._decimated(positions, max_points)
+        x_positions, y_positions = positions[:, 0], positions[:, 1]
 
         # TODO: change these limits to represent the actual orbital limits
         # of the spacecrafts' initial positions.
@@ -171,32 +294,92 @@ class Plotting:
         ax.set_xlim([-x_max-scale_factor*x_max, x_max+scale_factor*x_max])
         ax.set_ylim([-y_max-scale_factor*y_max, y_max+scale_factor*y_max])
         
-        if display_plot:
-            ax.plot(x_circle, y_circle)
-            ax.plot(x_positions, y_positions)
-            plt.show()
+        ax.plot(x_circle, y_circle)
+        ax.plot(x_positions, y_positions)
+
+        self._finish(fig, name, display_plot, save_plot)
 
 
-    def plot_velocity_distribution(self, list_of_velocities: List[np.ndarray],
-                                   list_of_times: List[float],
+    def plot_velocity_distribution(self, list_of_velocities: np.ndarray,
+                                   list_of_times: np.ndarray,
                                    display_plot: bool,
-                                   save_plot: bool):
+                                   save_plot: bool,
+                                   max_points: Optional[int] = POINT_BUDGET,
+                                   name: str = "velocity_vs_time_atmosphere"):
+        """
+        Speed of the spacecraft against time.
+
+        Args:
+            list_of_velocities (np.ndarray): the (T, 3) velocities that were saved (or a list of them).
+            list_of_times (np.ndarray): the (T,) times they were saved at.
+            display_plot (bool): whether to show the plot.
+            save_plot (bool): whether to save the plot, as `name` (whether its shown or not).
+            max_points (Optional[int]): how many points the curve is decimated down to.
+        """
 
+        if not (display_plot or save_plot):
+            return
 
-        fig, ax = plt.subplots(figsize=(7, 7))
+        fig, ax = self.plt.subplots(figsize=(7, 7))
         ax.set_xlabel("Time (seconds)")
         ax.set_ylabel("Velocity magnitude (m/s)")
         ax.set_ylim([0, 10000])
 
         ax.set_title("Velocity vs. Time of Spacecraft w/ atmosphere")
         # Get the magnitude of the velocity of the spacecraft
-        total_velocity = [np.linalg.norm(item) for item in list_of_velocities]
+        total_velocity = np.linalg.norm(np.asarray(list_of_velocities, dtype=float), axis=1)
+        curve = self._decimated(np.column_stack([np.asarray(list_of_times, dtype=float), total_velocity]), max_points)
+
+        ax.plot(curve[:, 0], curve[:, 1])
+
+        self._finish(fig, name, display_plot, save_plot)
+
+
+    def plot_ensemble_altitudes(self, trajectories: Iterable[Tuple[np.ndarray, np.ndarray]],
+                                display_plot: bool,
+                                save_plot: bool,
+                                planet_radius: float = 6371000,
+                                max_points: Optional[int] = 500,
+                                name: str = "ensemble_altitudes"):
+        """
+        Altitude against time of many trajectories (e.g. the members of a dispersion or the
+        contents of a TrajectoryStore) overlaid on one plot. Every trajectory is decimated and
+        they all go into a single LineCollection, which matplotlib draws far faster than one
+        line per trajectory.
+
+        Args:
+            trajectories (Iterable[Tuple[np.ndarray, np.ndarray]]): the (times, positions) of every
+                trajectory, e.g. TrajectoryStore.trajectories().
+            display_plot (bool): a conditional stating whether the user wants the plot to display.
+            save_plot (bool): whether to save the plot, as `name`.
+            planet_radius (float): radius (m) the altitudes are measured from.
+            max_points (Optional[int]): how many points each trajectory is decimated down to.
+        """
+        segments = []
+        for times, positions in trajectories:
+            altitudes = (np.linalg.norm(np.asarray(positions, dtype=float), axis=1) - planet_radius) / 1000
+            segments.append(self._decimated(np.column_stack([np.asarray(times, dtype=float), altitudes]), max_points))
+
+        from matplotlib.collections import LineCollection
+
+        fig, ax = self.plt.subplots(figsize=(10, 6))
+        ax.set_xlabel("Time (seconds)")
+        ax.set_ylabel("Altitude (km)")
+        ax.set_title(f"Altitude vs. Time ({len(segments)} trajectories)")
 
-        if display_plot:
-            ax.plot(list_of_times, total_velocity)
+        # Faint lines, so where many trajectories overlap shows up darker
+        alpha = min(1.0, max(0.05, 20 / max(len(segments), 1)))
+        ax.add_collection(LineCollection(segments, linewidths=0.8, colors="tab:blue", alpha=alpha))
+        ax.autoscale_view()
 
-            if save_plot:
-                plt.savefig("plots/velocity_vs_time_atmosphere.pdf", bbox_inches='tight')
-                plt.show()
-            else:
-                plt.show()
\ No newline at end of file
+        self._finish(fig, name, display_plot, save_plot)
+
+
+    @staticmethod
+    def _decimated(points: np.ndarray, max_points: Optional[int]) -> np.ndarray:
+        """
+        The points of a curve decimated down to max_points (all of them if its None).
+        """
+        if max_points is None:
+            return points
+        return points[lttb_indices(points, max_points)]
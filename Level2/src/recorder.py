@@ -0,0 +1,203 @@
+
+import numpy as np
+
+from typing import Optional, Tuple
+
+from .events import StepInterpolant
+from .trajectory_store import TrajectoryStoreWriter
+
+
+class TrajectoryRecorder:
+    """
+    Stores the history of a simulation in one contiguous (T, 7) float64 buffer, with the
+    columns [time, x, y, z, vx, vy, vz], instead of lists of small arrays.
+
+    The buffer is preallocated and doubled whenever it fills up, and it can be decimated in
+    one of two ways:
+        - save_frequency = k: only every k-th integrator step is stored.
+        - output_interval = dt: the state is stored on a regular time grid (start_time, start_time + dt, ...),
+          interpolated within the steps, independent of the step sizes the integrator takes.
+
+    The get_* accessors hand back views into the buffer, so no copies are made. They are only
+    valid until the next write that has to grow the buffer.
+
+    With a trajectory store the buffer is instead written out to the store every time it fills
+    up, so memory use stays at initial_capacity states however long the run is, and once the
+    run is finished the get_* accessors hand back (memory mapped) views of the store.
+    """
+
+    COLUMNS = 7
+
+    def __init__(self,
+                 save_frequency: int = 1,
+                 output_interval: Optional[float] = None,
+                 start_time: float = 0.0,
+                 initial_capacity: int = 1024,
+                 store: Optional[TrajectoryStoreWriter] = None):
+
+        self.save_frequency = save_frequency
+        self.output_interval = output_interval
+
+        self._buffer = np.empty((initial_capacity, self.COLUMNS), dtype=np.float64)
+        self._size = 0
+
+        # Where the states go when streaming to a store, and how many were written out already
+        self.store = store
+        self.trajectory_number: Optional[int] = None
+        self._written = 0
+        self._finished = False
+        self._last_time: Optional[float] = None
+
+        # Steps taken since the last one that was stored (save_frequency mode)
+        self._steps_since_saved = 0
+
+        # Index of the next point of the output grid to be stored (output_interval mode)
+        self._start_time = start_time
+        self._next_output_index = 0
+
+
+    def __len__(self) -> int:
+        return self._written + self._size
+
+
+    def record(self, time: float, position: np.ndarray, velocity: np.ndarray) -> None:
+        """
+        Stores one state no matter what the decimation settings are. Used for the initial
+        and final states and anything else that must always end up in the history.
+        """
+        if self._size == self._buffer.shape[0]:
+            if self.store is not None:
+                self._write_out()
+            else:
+                self._grow()
+
+        row = self._buffer[self._size]
+        row[0] = time
+        row[1:4] = position
+        row[4:7] = velocity
+        self._size += 1
+        self._last_time = time
+
+
+    def record_step(self, interpolant: StepInterpolant, end_time: Optional[float] = None) -> None:
+        """
+        Called after every integrator step, stores whatever the decimation settings ask for
+        from within that step.
+
+        Args:
+            interpolant (StepInterpolant): interpolant over the step that was just taken.
+            end_time (Optional[float]): where the step was cut short (by a terminal event),
+                if it was. Output grid points after it are not stored.
+        """
+        if end_time is None:
+            end_time = interpolant.end_time
+
+        if self.output_interval is None:
+            self._steps_since_saved += 1
+            if self._steps_since_saved >= self.save_frequency and end_time == interpolant.end_time:
+                self.record(interpolant.end_time, interpolant.end_position, interpolant.end_velocity)
+                self._steps_since_saved = 0
+            return
+
+        # Every output grid time that falls within this step
+        while True:
+            output_time = self._start_time + self._next_output_index * self.output_interval
+            if output_time > end_time:
+                break
+
+            if output_time > interpolant.start_time:
+                position, velocity = interpolant(output_time)
+                self.record(output_time, position, velocity)
+
+            self._next_output_index += 1
+
+
+    def finish(self, time: float, position: np.ndarray, velocity: np.ndarray, **metadata) -> None:
+        """
+        Makes sure the final state of the run is in the history, even if the decimation
+        would otherwise have skipped it. When streaming to a store, the rest of the buffer is
+        written out and the trajectory is ended there, with the given metadata.
+        """
+        if self._last_time is None or self._last_time != time:
+            self.record(time, position, velocity)
+
+        if self.store is not None:
+            self._write_out()
+            self.store.end_trajectory(**metadata)
+            self._finished = True
+
+
+    def get_state(self) -> Tuple[np.ndarray, dict]:
+        """
+        Everything needed to carry on recording from here after a restart (see checkpoint.py):
+        the states stored so far and where the decimation is up to.
+        """
+        if self.store is not None:
+            raise ValueError("The history streamed to a trajectory store cant be checkpointed.")
+
+        return self._buffer[:self._size], {"steps_since_saved": self._steps_since_saved,
+                                            "next_output_index": self._next_output_index,
+                                            "last_time": self._last_time}
+
+
+    def set_state(self, states: np.ndarray, state: dict) -> None:
+        """
+        Puts back what get_state saved, replacing anything recorded so far.
+        """
+        self._buffer = np.empty((max(self._buffer.shape[0], len(states)), self.COLUMNS), dtype=np.float64)
+        self._buffer[:len(states)] = states
+        self._size = len(states)
+
+        self._steps_since_saved = state["steps_since_saved"]
+        self._next_output_index = state["next_output_index"]
+        self._last_time = state["last_time"]
+
+
+    def _write_out(self) -> None:
+        """
+        Moves the states in the buffer out to the store, emptying the buffer.
+        """
+        if self.trajectory_number is None:
+            self.trajectory_number = self.store.begin_trajectory()
+
+        self.store.append(self._buffer[:self._size])
+        self._written += self._size
+        self._size = 0
+
+
+    def _grow(self) -> None:
+        """
+        Doubles the capacity of the buffer.
+        """
+        new_buffer = np.empty((2 * self._buffer.shape[0], self.COLUMNS), dtype=np.float64)
+        new_buffer[:self._size] = self._buffer[:self._size]
+        self._buffer = new_buffer
+
+
+    def get_states(self) -> np.ndarray:
+        """
+        The whole (T, 7) history [time, x, y, z, vx, vy, vz] (a view, not a copy).
+        """
+        if self._finished:
+            return self.store.states(self.trajectory_number)
+        if self._written > 0:
+            raise ValueError("The history is being streamed to the trajectory store, it can be read once the run is finished.")
+        return self._buffer[:self._size]
+
+    def get_times(self) -> np.ndarray:
+        """
+        The (T,) stored times (a view, not a copy).
+        """
+        return self.get_states()[:, 0]
+
+    def get_positions(self) -> np.ndarray:
+        """
+        The (T, 3) stored positions (a view, not a copy).
+        """
+        return self.get_states()[:, 1:4]
+
+    def get_velocities(self) -> np.ndarray:
+        """
+        The (T, 3) stored velocities (a view, not a copy).
+        """
+        return self.get_states()[:, 4:7]
@@ -0,0 +1,110 @@
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+from .config.plotting_config import PlottingConfig, RenderPlotConfig
+from .heatmap import LandingHeatmap
+from .plotting import Plotting
+from .trajectory_store import TrajectoryStore
+
+
+# File names of the plots when the job doesnt give one
+DEFAULT_NAMES = {"velocity": "velocity_vs_time_atmosphere",
+                 "trajectory_2d": "trajectory_2d",
+                 "trajectory_3d": "orbital_trajectory",
+                 "crash_point": "crash_point",
+                 "ensemble": "ensemble_altitudes",
+                 "heatmap": "landing_heatmap"}
+
+
+def render_plot(plotter: Plotting, plot: RenderPlotConfig, point_budget: int) -> None:
+    """
+    Draws and saves one plot of a render job from its saved results.
+
+    Args:
+        plotter (Plotting): a headless Plotting saving to the jobs output directory and formats.
+        plot (RenderPlotConfig): which plot, from which results.
+        point_budget (int): how many points each curve is decimated down to (None for all).
+    """
+    name = plot.name or DEFAULT_NAMES[plot.plot]
+
+    if plot.plot == "heatmap":
+        plotter.plot_landing_heatmap(LandingHeatmap.load(plot.source), display_plot=False, save_plot=True, name=name)
+        return
+
+    store = TrajectoryStore(plot.source)
+    trajectories = plot.trajectories if plot.trajectories is not None else range(len(store))
+    for trajectory in trajectories:
+        if trajectory >= len(store):
+            raise ValueError(f"{plot.source} only has {len(store)} trajectories, there is no trajectory {trajectory}.")
+
+    if plot.plot == "ensemble":
+        plotter.plot_ensemble_altitudes(((store.times(trajectory), store.positions(trajectory))
+                                         for trajectory in trajectories),
+                                        display_plot=False, save_plot=True, name=name)
+        return
+
+    for trajectory in trajectories:
+        trajectory_name = f"{name}_{trajectory}"
+
+        if plot.plot == "velocity":
+            plotter.plot_velocity_distribution(store.velocities(trajectory), store.times(trajectory),
+                                               display_plot=False, save_plot=True,
+                                               max_points=point_budget, name=trajectory_name)
+        elif plot.plot == "trajectory_2d":
+            plotter.simple_2d_plot(store.positions(trajectory), display_plot=False, save_plot=True,
+                                   max_points=point_budget, name=trajectory_name)
+        elif plot.plot == "trajectory_3d":
+            plotter.simple_orbital_trajectory(store.positions(trajectory), display_plot=False, save_plot=True,
+                                              max_points=point_budget, name=trajectory_name)
+        elif plot.plot == "crash_point":
+            states = store.states(trajectory)
+            latitude, longitude = plotter.crash_point_latLon_on_actual_earth(states[-1, 1:4], states[-1, 0])
+            plotter.plot_point_on_map(latitude, longitude, display_plot=False, save_plot=True, name=trajectory_name)
+
+
+def _render_plot(task: Tuple[PlottingConfig, RenderPlotConfig]) -> List[Path]:
+    """
+    Worker function: draws one plot of the job headless and hands back the files it wrote.
+    """
+    config, plot = task
+    plotter = Plotting(headless=True, output_directory=config.output_directory, formats=config.formats)
+    render_plot(plotter, plot, config.point_budget)
+
+    return plotter.written
+
+
+class Renderer:
+    """
+    Batch rendering of plots from saved results (trajectory stores, landing heat maps), as
+    described by a render job (the layout of the `plotting:` section with a `plots:` list, see
+    run_render.py). Always headless, so it runs fine without a display, and the plots of the
+    job are spread over a pool of worker processes when there are several workers.
+    """
+
+    def __init__(self, config: PlottingConfig):
+        self.config = config
+
+
+    def number_of_workers(self) -> int:
+        return self.config.workers or os.cpu_count() or 1
+
+
+    def run(self) -> List[Path]:
+        """
+        Draws every plot of the job.
+
+        Returns:
+            List[Path]: the files written, in the order of the plots in the job.
+        """
+        tasks = [(self.config, plot) for plot in self.config.plots]
+
+        if self.number_of_workers() == 1 or len(tasks) <= 1:
+            batches = list(map(_render_plot, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.number_of_workers(), len(tasks))) as executor:
+                batches = list(executor.map(_render_plot, tasks))
+
+        return [path for written in batches for path in written]
@@ -1,11 +1,22 @@
 
+import time
+
 import numpy as np
 
 from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from abc import ABC, abstractmethod
 
+from .checkpoint import Checkpoint, fingerprint, load_checkpoint, remove_checkpoint, save_checkpoint
 from .config.simulation_config import SimulationConfig
+from .instrumentation import Instrumentation
+from .integrators import create_integrator
+from .kepler import coast_to_radius, periapsis_radius, propagate
+from .recorder import TrajectoryRecorder
+from .trajectory_store import TrajectoryStoreWriter
+from .termination import TerminationCriterion, create_termination_criteria, create_termination_events
+from .events import (Event, EventRecord, StepInterpolant, SurfaceImpact, AltitudeCrossing,
+                     PeakDeceleration, PeakHeating, PeakDynamicPressure, find_event_time)
 from .spacecraft import Spacecraft
 from .planet import Planet
 from .physics import Physics
@@ -14,8 +25,9 @@ class Simulation:
     """
     A class that performs the numerical simulation of spacecraft dynamics around a planet.
 
-    This simulation uses a 4th-order Runge-Kutta method to solve the equations of motion
-    for a spacecraft under the gravitational influence of a planet.
+    This simulation uses a 4th-order Runge-Kutta method (or the adaptive Dormand-Prince one,
+    if chosen in the config file) to solve the equations of motion for a spacecraft under
+    the gravitational influence of a planet.
     
     
     """
@@ -24,7 +36,8 @@ class Simulation:
                  config: SimulationConfig, 
                  spacecraft: Spacecraft, 
                  planet: Planet,
-                 physics: Physics) -> None:
+                 physics: Physics,
+                 trajectory_store: Optional[TrajectoryStoreWriter] = None) -> None:
         """
         Initialize the simulation with configuration parameters and objects.
 
@@ -33,8 +46,12 @@ class Simulation:
                 - "time_step_size": Time step for numerical integration.
                 - "start_time": Initial simulation time.
                 - "end_time": Final simulation time.
+                - "integrator": Which integrator to use and its tolerances.
             spacecraft (Spacecraft): Spacecraft object with initial conditions.
             plaet (Planet): Planet object providing for planet characteristics such as gravity.
+            trajectory_store (Optional[TrajectoryStoreWriter]): a store shared by several runs to
+                stream the history into, as one more trajectory. Otherwise the history is streamed
+                to the `output: trajectory_store` of the config file, if one is given, or kept in memory.
 
         Raises:
             KeyError: If required configuration parameters are missing from the config file.
@@ -44,159 +61,436 @@ class Simulation:
         self.planet = planet
         self.physics = physics
         self.config = config
+
+        # Counters, timers and the diagnostic trace (all quiet unless asked for in the config)
+        self.instrumentation = Instrumentation(self.config.instrumentation)
+
+        # The RK4 float fast path, if every enabled force model has one
+        acceleration_components = self.physics.get_acceleration_components if self.physics.has_fast_path() else None
+        self.integrator = create_integrator(self.config.integrator,
+                                            self.instrumentation.traced_acceleration(self.physics.get_acceleration, self.planet),
+                                            self.instrumentation.traced_acceleration(acceleration_components, self.planet))
         
 
 
         # Initialize simulation history arrays
         self.time_elapsed = self.config.end_time  # Updated if the simulation terminates early
-        self._times: List[float] = []
-        self._position: List[np.ndarray] = []
-        self._velocity: List[np.ndarray] = []
+        # The store the history is streamed to, closed at the end of the run if its our own
+        self._owns_store = trajectory_store is None and self.config.output.trajectory_store is not None
+        if self._owns_store:
+            trajectory_store = TrajectoryStoreWriter(self.config.output.trajectory_store,
+                                                     chunk_rows=self.config.output.store_chunk_rows)
+
+        self._recorder = TrajectoryRecorder(save_frequency=self.config.output.save_frequency,
+                                            output_interval=self.config.output.output_interval,
+                                            start_time=self.config.start_time,
+                                            store=trajectory_store)
 
         self._is_complete: bool = False
         self._termination_reason: str = "Not started."
 
+        # Events located precisely during the run. Hitting the surface is always one of them.
+        self._events: List[Event] = [SurfaceImpact(self.planet)]
+        self._event_log: List[EventRecord] = []
+        self._register_configured_events()
+
+        # Conditions checked at the end of every step that stop the run once carrying on is
+        # pointless (back out of the atmosphere for good, out of wall clock time, ...)
+        self._termination_criteria: List[TerminationCriterion] = create_termination_criteria(
+            self.config, self.planet, rotating_frame=self.physics.config.include_coriolis)
+
+        # The settings the run starts from, a checkpoint of any other run is refused
+        self._checkpoint_tag = None
+        if self.config.checkpoint.file is not None:
+            settings = {name: value for name, value in vars(self.config).items()
+                        if name not in ("checkpoint", "instrumentation")}
+            self._checkpoint_tag = fingerprint(settings, self.physics.config, self.planet.config, self.spacecraft)
+
+
+    def add_event(self, event: Event) -> None:
+        """
+        Registers an extra event to be located during the run (see events.py for the built in
+        ones, or subclass StateEvent or Event for your own). Terminal events stop the simulation.
+        """
+        self._events.append(event)
+
+
+    def add_termination_criterion(self, criterion: TerminationCriterion) -> None:
+        """
+        Registers an extra condition, checked at the end of every step, that stops the run
+        (see termination.py).
+        """
+        self._termination_criteria.append(criterion)
+
+
+    def _register_configured_events(self) -> None:
+        """
+        Adds the optional events the user switched on in the config file.
+        """
+        events_config = self.config.events
+
+        for altitude in events_config.altitude_crossings:
+            self.add_event(AltitudeCrossing(self.planet, altitude))
+
+        if events_config.peak_deceleration:
+            self.add_event(PeakDeceleration(self.physics))
+
+        if events_config.peak_heating:
+            self.add_event(PeakHeating(self.planet, self.spacecraft.nose_radius))
+
+        if events_config.peak_dynamic_pressure:
+            self.add_event(PeakDynamicPressure(self.planet))
+
+        # The termination conditions that get located exactly (altitude floor, g and heating limits)
+        for event in create_termination_events(self.config, self.planet, self.physics, self.spacecraft.nose_radius):
+            self.add_event(event)
+
 
     def run(self):# -> None:
         """
-        Execute the simulation using a 4th order Runge-Kutta integrator.
+        Execute the simulation using the integrator chosen in the config file
+        (the 4th order Runge-Kutta one by default).
 
         The simulation rungs from start_time to end_time unless terminated early
-        due to impact of the planets surface. Position and velocity histories are stored
-        for later analysis.
+        due to impact of the planets surface, a terminal event or one of the termination
+        criteria (see the `termination:` block of the config file). Position and velocity
+        histories are stored for later analysis.
+
+        With a checkpoint file in the config, the state is saved there every so often and a
+        run of the same settings carries on from the last checkpoint (see checkpoint.py).
 
         Returns:
-            None: Results are stored in self._position and self._velocity.
+            None: Results are stored in the trajectory recorder (see get_trajectory etc.).
 
         
         """
 
         current_time = self.config.start_time      
+        step_size = self.config.time_step_size
+
+        instrumentation = self.instrumentation
+        lap = instrumentation.lap
+        trace_steps = instrumentation.enabled("steps")
+        run_start = time.perf_counter()
+
+        criteria = self._termination_criteria
+        for criterion in criteria:
+            criterion.start()
+
+        checkpoint_file = self.config.checkpoint.file
+        checkpoint = None
+        if checkpoint_file is not None and self.config.checkpoint.resume:
+            checkpoint = load_checkpoint(checkpoint_file, self._checkpoint_tag)
+
+        if checkpoint is not None:
+            current_time, step_size, acceleration = self._restore_checkpoint(checkpoint)
+        else:
+            self._store_state(current_time)
+
+            # Skip the vacuum arc down to the top of the atmosphere, if the user asked for it
+            if self.config.coast.enabled:
+                lap(None)
+                current_time = self._coast_to_entry_interface(current_time)
+                lap("coast")
+
+            # Acceleration at the current state. Its needed at both ends of every step for the
+            # interpolant the events are located on, and handed to the integrator so it doesnt
+            # have to work it out again.
+            acceleration = self.integrator.evaluate(self.spacecraft.position, self.spacecraft.velocity)
+
+        self._termination_reason = "Simulation complete."
+        last_checkpoint = time.perf_counter()
 
         # Main simulation loop
+        lap(None)
         while current_time < self.config.end_time:
+
+            # Adaptive integrators land exactly on end_time instead of stepping past it
+            if self.integrator.adaptive:
+                step_size = min(step_size, self.config.end_time - current_time)
             
             # Advance one time step
             try:
-                self._integrate_step()
+                result = self.integrator.step(self.spacecraft.position, self.spacecraft.velocity,
+                                              step_size, acceleration)
             except ValueError as e:
                 self._termination_reason = f"Integration error: {str(e)}"
+                break
 
-            current_time += self.config.time_step_size
-            self._store_state(current_time)
+            end_acceleration = result.acceleration
+            if end_acceleration is None:
+                end_acceleration = self.integrator.evaluate(result.position, result.velocity)
+            lap("integrator")
+
+            if trace_steps:
+                instrumentation.trace("steps", "step", current_time,
+                                      step_size=result.step_size,
+                                      altitude=self.planet.get_altitude(result.position),
+                                      speed=np.linalg.norm(result.velocity))
 
-            # Check for termination conditions.
+            interpolant = StepInterpolant(current_time, current_time + result.step_size,
+                                          self.spacecraft.position, self.spacecraft.velocity, acceleration,
+                                          result.position, result.velocity, end_acceleration)
+
+            # Check for events within the step, the terminal ones being the termination conditions.
             # (i.e. it hit the planets surface)
-            if self._check_surface_impact():
-                print("Surface Impact")
-                self._termination_reason = "Surface Impact"
+            terminal_event = self._locate_events(interpolant)
+            lap("events")
+
+            if terminal_event is not None:
+                self._termination_reason = terminal_event.name
+                self.spacecraft.position[:] = terminal_event.position
+                self.spacecraft.velocity[:] = terminal_event.velocity
+                current_time = terminal_event.time
+                self.time_elapsed = current_time
+                self._recorder.record_step(interpolant, end_time=current_time)
                 break
 
-        self._termination_reason = "Simulation complete."
+            self.spacecraft.position[:] = result.position
+            self.spacecraft.velocity[:] = result.velocity
+            acceleration = end_acceleration
+            step_size = result.next_step_size
+
+            current_time += result.step_size
+            self._recorder.record_step(interpolant)
+            lap("recording")
+
+            if criteria:
+                reason = self._check_termination_criteria(current_time)
+                if reason is not None:
+                    self._termination_reason = reason
+                    self.time_elapsed = current_time
+                    break
+
+            if checkpoint_file is not None and time.perf_counter() - last_checkpoint >= self.config.checkpoint.interval:
+                self._save_checkpoint(current_time, step_size, acceleration)
+                last_checkpoint = time.perf_counter()
+
+        # The final state is always kept, whatever the output decimation is
+        self._recorder.finish(current_time, self.spacecraft.position, self.spacecraft.velocity,
+                              termination_reason=self._termination_reason,
+                              start_time=self.config.start_time,
+                              end_time=current_time)
+        if self._owns_store:
+            self._recorder.store.close()
+        if checkpoint_file is not None:
+            remove_checkpoint(checkpoint_file)
+
+        self._is_complete = True
+
+        instrumentation.trace("events", "termination", current_time, reason=self._termination_reason)
+        for name, value in self.integrator.get_statistics().items():
+            instrumentation.count(name, value)
+        instrumentation.count("events", len(self._event_log))
+        instrumentation.count("stored_states", len(self._recorder))
+        instrumentation.add_time("run", time.perf_counter() - run_start)
+        instrumentation.close()
+
+
+    def _save_checkpoint(self, current_time: float, step_size: float, acceleration: np.ndarray) -> None:
+        """
+        Saves everything the rest of the run depends on, at the end of a step.
 
+        Args:
+            current_time (float): the time the run is at.
+            step_size (float): the size of the next step.
+            acceleration (np.ndarray): the acceleration at the current state.
+        """
+        states, recorder_state = self._recorder.get_state()
+
+        checkpoint = Checkpoint({"position": self.spacecraft.position,
+                                 "velocity": self.spacecraft.velocity,
+                                 "acceleration": np.asarray(acceleration, dtype=float),
+                                 "states": states},
+                                {"time": current_time,
+                                 "step_size": step_size,
+                                 "recorder": recorder_state,
+                                 "events": [record.to_dict() for record in self._event_log],
+                                 "integrator_statistics": self.integrator.get_statistics(),
+                                 "criteria": [criterion.get_state() for criterion in self._termination_criteria]})
+        save_checkpoint(self.config.checkpoint.file, checkpoint, self._checkpoint_tag)
+
+
+    def _restore_checkpoint(self, checkpoint: Checkpoint) -> Tuple[float, float, np.ndarray]:
+        """
+        Puts the run back to where the checkpoint was saved.
 
-    def _integrate_step(self) -> None:
+        Returns:
+            Tuple[float, float, np.ndarray]: the time, the next step size and the acceleration there.
         """
-        Gets the k terms and then updates the positions and velocities of the spacecraft
+        arrays, summary = checkpoint.arrays, checkpoint.summary
+
+        self.spacecraft.position[:] = arrays["position"]
+        self.spacecraft.velocity[:] = arrays["velocity"]
+        self._recorder.set_state(arrays["states"], summary["recorder"])
+        self._event_log = [EventRecord.from_dict(record) for record in summary["events"]]
+        self.integrator.set_statistics(summary["integrator_statistics"])
+
+        if len(summary["criteria"]) != len(self._termination_criteria):
+            raise ValueError("The checkpoint was written by a run with other termination criteria.")
+        for criterion, state in zip(self._termination_criteria, summary["criteria"]):
+            criterion.set_state(state)
+
+        return summary["time"], summary["step_size"], arrays["acceleration"].copy()
+
+
+    def _locate_events(self, interpolant: StepInterpolant) -> Optional[EventRecord]:
+        """
+        Checks every registered event for a sign change of its function over the step, root finds
+        the exact time of the ones that happened and logs them in the order they happened.
+
+        Returns:
+            Optional[EventRecord]: the first terminal event within the step, if there was one.
+                Nothing after it is logged, since the simulation stops there.
         """
-        k_r, k_v = self._calculate_rungeKutta4_terms()
+        happened = []
 
-        # Update the spacecraft state using RK4 weighted averages
-        self.spacecraft.position += ((self.config.time_step_size / 6.0) * (k_r[1] + 2*k_r[2] + 2*k_r[3] + k_r[4]))
-        self.spacecraft.velocity += ((self.config.time_step_size / 6.0) * (k_v[1] + 2*k_v[2] + 2*k_v[3] + k_v[4]))
+        for event in self._events:
+            start_value = event.evaluate(interpolant, interpolant.start_time)
+            end_value = event.evaluate(interpolant, interpolant.end_time)
 
-    
-    def _calculate_rungeKutta4_terms(self) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+            if event.triggered(start_value, end_value):
+                happened.append((find_event_time(event, interpolant, start_value, end_value), event))
+
+        for time, event in sorted(happened, key=lambda item: item[0]):
+            position, velocity = interpolant(time)
+            record = EventRecord(event.name, time, position, velocity, event.value(time, position, velocity))
+            self._event_log.append(record)
+            self.instrumentation.trace("events", "event", time, name=event.name, value=record.value,
+                                       position=position, velocity=velocity)
+
+            if event.terminal:
+                return record
+
+        return None
+
+
+    def _check_termination_criteria(self, time: float) -> Optional[str]:
+        """
+        The reason of the first termination criterion met by the current state, if any.
+        """
+        for criterion in self._termination_criteria:
+            reason = criterion.check(time, self.spacecraft.position, self.spacecraft.velocity)
+            if reason is not None:
+                return reason
+
+        return None
+
+
+    def _coast_to_entry_interface(self, current_time: float) -> float:
         """
-        The math for calculating each of the interconnected components k terms,
-        that are needed for the runge kutta implementation.
+        Moves the spacecraft along its two-body (Kepler) orbit down to the entry interface
+        altitude in one go, since above the atmosphere gravity is the only force acting on it.
+        A number of points along that arc are stored in the history so the plots still look right.
 
-        The k terms represent the slopes at
-        different points within the time step.
+        Nothing happens if the spacecraft already starts inside the entry interface, or if its
+        orbit never comes down to it.
+
+        Args:
+            current_time (float): the simulation time at the start of the coast.
 
         Returns:
-            k_r & k_v (numpy ndarray): Two numpy arrays containing the RK4 terms for 
-                position and velocity respectively. Each array has shape (5,3) where 
-                index 0 is unused and indices 1-4 correspond to the four RK4 stages.
-        
+            float: the simulation time at the end of the coast.
         """
+        entry_radius = self.planet.radius + self.config.coast.entry_interface_altitude
+        mu = self.planet.gravitational_parameter
+
+        coast_time, position, velocity, reaches = coast_to_radius(self.spacecraft.position,
+                                                                  self.spacecraft.velocity,
+                                                                  entry_radius, mu)
+        if not reaches or coast_time == 0:
+            return current_time
+
+        start_position = self.spacecraft.position.copy()
+        start_velocity = self.spacecraft.velocity.copy()
 
+        # Dont coast past the end of the simulation
+        if coast_time > self.config.end_time - current_time:
+            coast_time = self.config.end_time - current_time
+            position, velocity = propagate(start_position, start_velocity, coast_time, mu)
 
-        # Arrays storing the k terms
-        k_r = np.zeros((5, 3))
-        k_v = np.zeros((5, 3))
+        sample_times = np.linspace(0.0, float(coast_time), self.config.coast.samples + 1)[1:-1]
+        if len(sample_times) > 0:
+            sample_positions, sample_velocities = propagate(start_position, start_velocity, sample_times, mu)
 
-        # First stage
-        k_v[1] = self.physics.get_acceleration(self.spacecraft.position, self.spacecraft.velocity)
-        k_r[1] = self.spacecraft.velocity
+            for time, sample_position, sample_velocity in zip(sample_times, sample_positions, sample_velocities):
+                self.spacecraft.position[:] = sample_position
+                self.spacecraft.velocity[:] = sample_velocity
+                self._store_state(current_time + time)
 
-        # Second stage
-        k_v[2] = self.physics.get_acceleration( (self.spacecraft.position + (self.config.time_step_size / 2.0)*k_r[1]), 
-                                         (self.spacecraft.velocity + k_v[1] * (self.config.time_step_size / 2.0)) )
-        k_r[2] = self.spacecraft.velocity + k_v[1] * (self.config.time_step_size / 2.0)
+        self.spacecraft.position[:] = position
+        self.spacecraft.velocity[:] = velocity
 
-        # Third stage
-        k_v[2] = self.physics.get_acceleration( (self.spacecraft.position + (self.config.time_step_size / 2.0)*k_r[2]), 
-                                         (self.spacecraft.velocity + k_v[2] * (self.config.time_step_size / 2.0)) )
-        k_r[3] = self.spacecraft.velocity + k_v[2] * (self.config.time_step_size / 2.0)
+        current_time += float(coast_time)
+        self._store_state(current_time)
 
-        # Fourth stage
-        k_v[2] = self.physics.get_acceleration( (self.spacecraft.position + (self.config.time_step_size)*k_r[3]), 
-                                         (self.spacecraft.velocity + k_v[3] * self.config.time_step_size) )
-        k_r[4] = self.spacecraft.velocity + k_v[3] * self.config.time_step_size
+        return current_time
+
+
+    def get_integrator_statistics(self) -> Dict[str, int]:
+        """
+        How many steps the integrator accepted and rejected, and how many times
+        the accelerations had to be evaluated to get there.
+        """
+        return self.integrator.get_statistics()
+
+
+    def get_instrumentation(self) -> Instrumentation:
+        """
+        The counters, phase timings and diagnostic trace of the run (see instrumentation.py
+        and the `instrumentation:` block of the config file).
+        """
+        return self.instrumentation
 
-        return k_r, k_v
 
     def _store_state(self, time:float) -> None:
         """
         Stores the time, position, and velocity of the spacecraft for other analysis purposes.
         """
-        self._times.append(time)
-        self._position.append(self.spacecraft.position.copy())
-        self._velocity.append(self.spacecraft.velocity.copy())
+        self._recorder.record(time, self.spacecraft.position, self.spacecraft.velocity)
         
 
-    def _check_surface_impact(self) -> bool:
-        """
-        Checks to see whether the distance from the center of the planet to the spacecrafts
-        current position is less than its radius, and given its a sphere, that would mean
-        it has "hit" the surface.
-        
-        """
-        return (np.linalg.norm(self.spacecraft.position) <= self.planet.radius)
-    
-    def get_trajectory(self) -> List[np.ndarray]:
+    def get_trajectory(self) -> np.ndarray:
         """ 
         A public, safe way for the position history of the spacecraft that was stored, to be accessed
-        for use in external applications.
+        for use in external applications. A (T, 3) view into the recorders buffer.
         """
-        return self._position
+        return self._recorder.get_positions()
     
-    def get_velocities(self) -> List[np.ndarray]:
-        """ 
-        Returns the velocities that were calculated for the spacecraft.
+    def get_termination_reason(self) -> str:
         """
-        return self._velocity
-    
-    def get_times(self) -> List[float]:
+        Why the simulation stopped (e.g. "Surface Impact" or "Simulation complete.").
         """
-        Returns the times recorded during the simulation calculations.
-        
+        return self._termination_reason
+
+    def get_events(self) -> List[EventRecord]:
         """
-        return self._times
-    
+        Every event that happened during the run (impact, altitude crossings, peaks, ...),
+        in the order they happened.
+        """
+        return self._event_log
 
+    def get_velocities(self) -> np.ndarray:
+        """ 
+        Returns the velocities that were calculated for the spacecraft, a (T, 3) view.
+        """
+        return self._recorder.get_velocities()
 
-    def get_times(self) -> List[np.ndarray]:
+    def get_times(self) -> np.ndarray:
         """ 
         A public, safe way for the time history of the simulation that was periodically stored, to be accessed
-        for use in external applications.
+        for use in external applications. A (T,) view.
         """
-        return self._times
+        return self._recorder.get_times()
 
 
-    # TODO: I believe this needs to be rewritten as the logic is flawed, or rather not complete.
     def _check_if_will_eventually_hit_planet(self) -> bool:
-        return (np.linalg.norm(self.spacecraft.velocity)) < np.sqrt( ((6.674e-11) * self.planet.mass) / np.linalg.norm(self.spacecraft.position))
+        """
+        Whether the two-body orbit through the current state goes below the surface, i.e. the
+        spacecraft comes down even without any drag. (Only gravity is taken into account, and in
+        the rotating frame the velocity is taken as is.)
+        """
+        return bool(periapsis_radius(self.spacecraft.position, self.spacecraft.velocity,
+                                     self.planet.gravitational_parameter) < self.planet.radius)
     
 
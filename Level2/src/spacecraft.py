@@ -14,6 +14,81 @@ class Spacecraft:
         self.mass = config.mass
         self.drag_coefficient = config.drag_coeff
         self.cross_sect_area = config.cross_sect_area
+        self.nose_radius = config.nose_radius
+        self.lift_coefficient = config.lift_coefficient
+        self.bank_angle = config.bank_angle
         
 
-        
\ No newline at end of file
+        
+
+class SpacecraftEnsemble:
+    """
+    A group of N spacecraft held as contiguous arrays instead of N Spacecraft objects.
+
+    Positions and velocities are (N, 3) arrays (one row per member) and the design parameters
+    are (N,) arrays, so the physics can act on every member at once. It quacks like a Spacecraft
+    (same attribute names), which is what lets Physics and Planet be reused unchanged.
+    """
+    def __init__(self,
+                 positions: np.ndarray,
+                 velocities: np.ndarray,
+                 mass,
+                 drag_coefficient,
+                 cross_sect_area,
+                 lift_coefficient=0.0,
+                 bank_angle=0.0):
+
+        self.position = np.array(positions, dtype=float).reshape(-1, 3)
+        self.velocity = np.array(velocities, dtype=float).reshape(-1, 3)
+
+        if self.position.shape != self.velocity.shape:
+            raise ValueError("Need the same number of positions and velocities for the ensemble.")
+
+        number_of_members = self.position.shape[0]
+
+        # Scalars are broadcast so every member gets the same value
+        self.mass = np.broadcast_to(np.asarray(mass, dtype=float), (number_of_members,)).copy()
+        self.drag_coefficient = np.broadcast_to(np.asarray(drag_coefficient, dtype=float),
+                                                (number_of_members,)).copy()
+        self.cross_sect_area = np.broadcast_to(np.asarray(cross_sect_area, dtype=float),
+                                               (number_of_members,)).copy()
+        self.lift_coefficient = np.broadcast_to(np.asarray(lift_coefficient, dtype=float),
+                                                (number_of_members,)).copy()
+        self.bank_angle = np.broadcast_to(np.asarray(bank_angle, dtype=float), (number_of_members,)).copy()
+
+        # Which member of the original ensemble each row is, so results can still be
+        # matched back up after members have been dropped.
+        self.member_index = np.arange(number_of_members)
+
+
+    @classmethod
+    def from_config(cls, config: SpacecraftConfig, number_of_members: int) -> "SpacecraftEnsemble":
+        """
+        Builds an ensemble where every member starts as a copy of the spacecraft in the config file.
+        """
+        return cls(positions=np.tile(np.asarray(config.position, dtype=float), (number_of_members, 1)),
+                   velocities=np.tile(np.asarray(config.velocity, dtype=float), (number_of_members, 1)),
+                   mass=config.mass,
+                   drag_coefficient=config.drag_coeff,
+                   cross_sect_area=config.cross_sect_area,
+                   lift_coefficient=config.lift_coefficient,
+                   bank_angle=config.bank_angle)
+
+
+    def __len__(self) -> int:
+        return self.position.shape[0]
+
+
+    def keep_only(self, keep: np.ndarray) -> None:
+        """
+        Drops every member whose entry in the boolean mask `keep` is False, compacting
+        all of the per-member arrays so later calculations only touch the active members.
+        """
+        self.position = self.position[keep]
+        self.velocity = self.velocity[keep]
+        self.mass = self.mass[keep]
+        self.drag_coefficient = self.drag_coefficient[keep]
+        self.cross_sect_area = self.cross_sect_area[keep]
+        self.lift_coefficient = self.lift_coefficient[keep]
+        self.bank_angle = self.bank_angle[keep]
+        self.member_index = self.member_index[keep]
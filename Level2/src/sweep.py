@@ -0,0 +1,337 @@
+import copy
+import csv
+import itertools
+import os
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .cache import CacheEntry, ResultCache, config_key
+from .config.configuration_manager import ConfigurationManager
+from .config.sweep_config import SweepConfig
+from .spacecraft import Spacecraft
+from .planet import Planet
+from .physics import Physics
+from .simulation import Simulation
+
+
+# The parameters of a case, in the order of SweepConfig.PARAMETERS
+PARAMETER_DTYPE = np.dtype([(name, np.float64) for name in SweepConfig.PARAMETERS])
+
+# One row of the sweep results: the case, its parameters and what came out of it
+RESULT_DTYPE = np.dtype([("case", np.int64)] +
+                        [(name, np.float64) for name in SweepConfig.PARAMETERS] +
+                        [("impacted", np.bool_),
+                         ("time_of_flight", np.float64),          # seconds
+                         ("peak_deceleration", np.float64),       # g's
+                         ("peak_dynamic_pressure", np.float64),   # Pa
+                         ("downrange", np.float64),               # meters along the surface
+                         ("termination_reason", "U32")])
+
+
+def nominal_entry(config: ConfigurationManager) -> Tuple[float, float, float]:
+    """
+    The entry altitude (m), flight path angle (degrees, negative descending) and speed (m/s)
+    of the initial state in the config file.
+    """
+    position = np.asarray(config.spacecraft.position, dtype=float)
+    velocity = np.asarray(config.spacecraft.velocity, dtype=float)
+
+    radius = np.linalg.norm(position)
+    speed = np.linalg.norm(velocity)
+    flight_path_angle = np.degrees(np.arcsin(np.clip(np.dot(position, velocity) / (radius * speed), -1.0, 1.0)))
+
+    return float(radius - config.planet.radius), float(flight_path_angle), float(speed)
+
+
+def entry_state(config: ConfigurationManager, altitude: float, flight_path_angle: float,
+                speed: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The initial position and velocity for the given entry conditions. The position stays in
+    the direction of the one in the config file, and the velocity stays in the plane of the
+    configs position and velocity (for a purely radial one, the plane through the z-axis).
+    """
+    position = np.asarray(config.spacecraft.position, dtype=float)
+    velocity = np.asarray(config.spacecraft.velocity, dtype=float)
+
+    up = position / np.linalg.norm(position)
+    horizontal = velocity - np.dot(velocity, up) * up
+    if np.linalg.norm(horizontal) < 1e-9 * max(np.linalg.norm(velocity), 1.0):
+        horizontal = np.cross([0.0, 0.0, 1.0], up) if abs(up[2]) < 0.9 else np.cross([1.0, 0.0, 0.0], up)
+    horizontal = horizontal / np.linalg.norm(horizontal)
+
+    angle = np.radians(flight_path_angle)
+    entry_position = (config.planet.radius + altitude) * up
+    entry_velocity = speed * (np.sin(angle) * up + np.cos(angle) * horizontal)
+
+    return entry_position, entry_velocity
+
+
+def sweep_cases(config: ConfigurationManager) -> np.ndarray:
+    """
+    The parameters of every case of the sweep, a structured array (PARAMETER_DTYPE). The
+    parameters that arent swept keep their nominal values.
+
+    A grid sweep is every combination of the swept values. A latin hypercube splits every
+    parameters range into number_of_cases equal strata and draws one value from each, in a
+    random order per parameter (seeded, so the cases are the same every time).
+    """
+    sweep = config.sweep
+    _, nominal_angle, nominal_speed = nominal_entry(config)
+    nominal = {"flight_path_angle": nominal_angle,
+               "entry_speed": nominal_speed,
+               "mass": config.spacecraft.mass,
+               "cross_sectional_area": config.spacecraft.cross_sect_area,
+               "drag_coefficient": config.spacecraft.drag_coeff}
+
+    swept = [name for name in SweepConfig.PARAMETERS if name in sweep.parameters]
+
+    if sweep.method == "grid":
+        axes = []
+        for name in swept:
+            parameter = sweep.parameters[name]
+            if parameter.values is not None:
+                axes.append([float(value) for value in parameter.values])
+            else:
+                axes.append(list(np.linspace(parameter.minimum, parameter.maximum, parameter.count)))
+        combinations = list(itertools.product(*axes))
+        columns = {name: np.array([combination[i] for combination in combinations], dtype=float)
+                   for i, name in enumerate(swept)}
+        number_of_cases = len(combinations)
+
+    else:
+        rng = np.random.default_rng(sweep.seed)
+        number_of_cases = sweep.number_of_cases
+        columns = {}
+        for name in swept:
+            parameter = sweep.parameters[name]
+            strata = (rng.permutation(number_of_cases) + rng.uniform(size=number_of_cases)) / number_of_cases
+            columns[name] = parameter.minimum + strata * (parameter.maximum - parameter.minimum)
+
+    cases = np.empty(number_of_cases, dtype=PARAMETER_DTYPE)
+    for name in SweepConfig.PARAMETERS:
+        cases[name] = columns[name] if name in columns else nominal[name]
+
+    return cases
+
+
+def case_config(base_config: ConfigurationManager, parameters: np.void) -> ConfigurationManager:
+    """
+    A copy of the base configuration with the parameters of one case put in.
+    """
+    config = copy.deepcopy(base_config)
+
+    altitude = config.sweep.entry_altitude
+    if altitude is None:
+        altitude, _, _ = nominal_entry(config)
+
+    position, velocity = entry_state(config, altitude, float(parameters["flight_path_angle"]),
+                                     float(parameters["entry_speed"]))
+    config.spacecraft.position = position.tolist()
+    config.spacecraft.velocity = velocity.tolist()
+    config.spacecraft.mass = float(parameters["mass"])
+    config.spacecraft.cross_sect_area = float(parameters["cross_sectional_area"])
+    config.spacecraft.drag_coeff = float(parameters["drag_coefficient"])
+
+    # The peaks are part of the results, so make sure theyre being located
+    config.simulation.events.peak_deceleration = True
+    config.simulation.events.peak_dynamic_pressure = True
+
+    # The sweep picks up where it was from its results file, not from checkpoints of each case
+    config.simulation.checkpoint.file = None
+
+    return config
+
+
+def downrange_distance(start_position: np.ndarray, end_position: np.ndarray, planet_radius: float) -> float:
+    """
+    Distance (m) along the surface between the points below two positions, in the simulation
+    frame (so over the ground only when the simulation is done in the rotating frame).
+    """
+    cosine = np.dot(start_position, end_position) / (np.linalg.norm(start_position) * np.linalg.norm(end_position))
+    return float(planet_radius * np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def run_case(base_config: ConfigurationManager, case: int, parameters: np.void,
+             cache: Optional[ResultCache] = None) -> tuple:
+    """
+    Runs the simulation of one case of the sweep.
+
+    Args:
+        cache (Optional[ResultCache]): if given, a case that was already run with the same
+            config is read back from it instead of running it again.
+
+    Returns:
+        tuple: the results of the case, in the order of RESULT_DTYPE.
+    """
+    config = case_config(base_config, parameters)
+
+    # Like the cases of a dispersion, the cases cant share one trajectory store
+    config.simulation.output.trajectory_store = None
+
+    if cache is not None:
+        key = config_key(config, kind="sweep_case")
+        entry = cache.get(key)
+        if entry is not None:
+            return (case, *parameters.tolist(), *entry.summary["row"])
+
+    spacecraft = Spacecraft(config.spacecraft)
+    planet = Planet(config.planet)
+    physics = Physics(config.physics, planet, spacecraft)
+    simulation = Simulation(config.simulation,
+                            spacecraft = spacecraft,
+                            planet = planet,
+                            physics = physics)
+    simulation.run()
+
+    trajectory = simulation.get_trajectory()
+    impacted = simulation.get_termination_reason() == "Surface Impact"
+    time_of_flight = simulation.get_times()[-1] - config.simulation.start_time
+
+    peaks: Dict[str, float] = {"Peak deceleration": 0.0, "Peak dynamic pressure": 0.0}
+    for event in simulation.get_events():
+        if event.name in peaks:
+            peaks[event.name] = max(peaks[event.name], event.value)
+
+    row = (bool(impacted), float(time_of_flight), peaks["Peak deceleration"], peaks["Peak dynamic pressure"],
+           downrange_distance(trajectory[0], trajectory[-1], config.planet.radius),
+           simulation.get_termination_reason())
+    if cache is not None:
+        cache.put(key, CacheEntry(summary={"row": row}))
+
+    return (case, *parameters.tolist(), *row)
+
+
+def _run_cases(task: Tuple[ConfigurationManager, np.ndarray, np.ndarray]) -> np.ndarray:
+    """
+    What a worker process runs: a batch of cases, returned as rows of the results array.
+    """
+    base_config, case_numbers, parameters = task
+    cache = ResultCache.from_config(base_config.cache)
+
+    rows = np.empty(len(case_numbers), dtype=RESULT_DTYPE)
+    for i, (case, case_parameters) in enumerate(zip(case_numbers, parameters)):
+        rows[i] = run_case(base_config, int(case), case_parameters, cache)
+
+    return rows
+
+
+def _parse(name: str, text: str):
+    """
+    One value of a results file row back into the type of its column.
+    """
+    if name == "impacted":
+        return text == "True"
+    if RESULT_DTYPE[name].kind == "U":
+        return text
+    return float(text)
+
+
+def read_results(path: Path) -> np.ndarray:
+    """
+    The results written to a sweep results file so far (RESULT_DTYPE), empty if there is none.
+    """
+    if not Path(path).exists():
+        return np.empty(0, dtype=RESULT_DTYPE)
+
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames != list(RESULT_DTYPE.names):
+            raise ValueError(f"{path} is not a sweep results file (or was written by another version).")
+        rows = [tuple(_parse(name, row[name]) for name in RESULT_DTYPE.names) for row in reader]
+
+    return np.array(rows, dtype=RESULT_DTYPE)
+
+
+class SweepRunner:
+    """
+    Parameter sweep over the entry conditions (flight path angle, speed) and the design of the
+    spacecraft (mass, area, drag coefficient), as described in the `sweep:` section of the
+    config file, spread over a pool of worker processes.
+
+    Each finished batch of cases is appended to the results file straight away, so an
+    interrupted sweep can be carried on (resume) without running those cases again.
+    """
+
+    def __init__(self, config: ConfigurationManager):
+        self.config = config
+        self.sweep = config.sweep
+        self.cases = sweep_cases(config)
+
+
+    def number_of_workers(self) -> int:
+        return self.sweep.workers or os.cpu_count() or 1
+
+
+    def completed(self) -> np.ndarray:
+        """
+        The results of the cases already in the results file, when resuming.
+
+        Raises:
+            ValueError: if the file is from a different sweep (its cases have other parameters).
+        """
+        if not self.sweep.resume:
+            return np.empty(0, dtype=RESULT_DTYPE)
+
+        results = read_results(self.sweep.results_file)
+        for name in SweepConfig.PARAMETERS:
+            if (np.any(results["case"] >= len(self.cases)) or
+                    not np.allclose(results[name], self.cases[name][results["case"]], rtol=1e-12, atol=0)):
+                raise ValueError(f"{self.sweep.results_file} holds the results of a different sweep. "
+                                 "Move it out of the way or turn resume off.")
+
+        return results
+
+
+    def tasks(self, remaining: np.ndarray) -> List[Tuple[ConfigurationManager, np.ndarray, np.ndarray]]:
+        """
+        Splits the cases still to be run up into the batches that get handed to the workers.
+        """
+        size = self.sweep.cases_per_task
+        return [(self.config, remaining[start:start + size], self.cases[remaining[start:start + size]])
+                for start in range(0, len(remaining), size)]
+
+
+    def run(self) -> np.ndarray:
+        """
+        Runs every case not already in the results file.
+
+        Returns:
+            np.ndarray: structured array (RESULT_DTYPE) with one row per case, sorted by case.
+        """
+        done = self.completed()
+        remaining = np.setdiff1d(np.arange(len(self.cases)), done["case"])
+        tasks = self.tasks(remaining)
+
+        results_file = Path(self.sweep.results_file)
+        results_file.parent.mkdir(parents=True, exist_ok=True)
+        if len(done) == 0:
+            with open(results_file, "w", newline="") as f:
+                csv.writer(f).writerow(RESULT_DTYPE.names)
+
+        if self.number_of_workers() == 1 or len(tasks) <= 1:
+            results = self._collect(map(_run_cases, tasks), results_file)
+        else:
+            with ProcessPoolExecutor(max_workers=self.number_of_workers()) as executor:
+                results = self._collect(executor.map(_run_cases, tasks), results_file)
+
+        results = np.concatenate([done] + results)
+        return results[np.argsort(results["case"])]
+
+
+    def _collect(self, batches, results_file: Path) -> List[np.ndarray]:
+        """
+        Gathers the finished batches, appending each one to the results file as it comes back.
+        """
+        results = []
+        for rows in batches:
+            with open(results_file, "a", newline="") as f:
+                writer = csv.writer(f)
+                for row in rows.tolist():
+                    writer.writerow([repr(value) if isinstance(value, float) else value for value in row])
+            results.append(rows)
+
+        return results
@@ -0,0 +1,164 @@
+import numpy as np
+
+from abc import ABC, abstractmethod
+from time import perf_counter
+from typing import List, Optional
+
+from .config.simulation_config import SimulationConfig
+from .events import Event, AltitudeCrossing, DecelerationLimit, HeatingLimit
+from .kepler import coast_to_radius, periapsis_radius, specific_energy
+from .planet import Planet
+from .physics import Physics
+
+
+class TerminationCriterion(ABC):
+    """
+    A condition that stops a run early, checked at the end of every step. Unlike a terminal
+    Event it isnt root found within the step, its for conditions where the exact moment doesnt
+    matter, only that the outcome of the run is already decided (or it has run for too long).
+    """
+
+    def start(self) -> None:
+        """
+        Called when the run starts, for criteria that keep track of something over the run.
+        """
+
+
+    def get_state(self) -> dict:
+        """
+        What the criterion keeps track of over the run (JSON-able), saved in checkpoints so a
+        resumed run decides exactly the same. Nothing by default.
+        """
+        return {}
+
+
+    def set_state(self, state: dict) -> None:
+        """
+        Puts back what get_state saved, when a run is resumed from a checkpoint.
+        """
+
+
+    @abstractmethod
+    def check(self, time: float, position: np.ndarray, velocity: np.ndarray) -> Optional[str]:
+        """
+        The termination reason if the run should stop at this state, otherwise nothing.
+        """
+
+
+class LeftAtmosphere(TerminationCriterion):
+    """
+    The spacecraft is above the top of the atmosphere and its two-body orbit doesnt bring it
+    back into it within the simulated time: an open orbit it is climbing out on (orbital energy
+    >= 0), an orbit whose periapsis is above the atmosphere, or one that only comes back down
+    after end_time. Above the atmosphere gravity is the only force left (as far as the outcome
+    goes), so nothing after that changes how the run ends.
+    """
+
+    def __init__(self, planet: Planet, atmosphere_top: float, end_time: float, rotating_frame: bool = False):
+        self.mu = planet.gravitational_parameter
+        self.top_radius = planet.radius + atmosphere_top
+        self.end_time = end_time
+
+        # In the rotating frame the velocity is relative to the ground, the orbit needs the inertial one
+        self.rotation = np.array([0.0, 0.0, planet.rotation_rate if rotating_frame else 0.0])
+
+        # When the spacecraft comes back down to the atmosphere, worked out once per time it leaves
+        self._return_time: Optional[float] = None
+
+
+    def start(self):
+        self._return_time = None
+
+
+    def get_state(self):
+        return {"return_time": self._return_time}
+
+
+    def set_state(self, state):
+        self._return_time = state["return_time"]
+
+
+    def check(self, time, position, velocity):
+
+        if np.linalg.norm(position) <= self.top_radius:
+            self._return_time = None
+            return None
+
+        velocity = velocity + np.cross(self.rotation, position)
+
+        climbing = np.dot(position, velocity) >= 0
+        if climbing and specific_energy(position, velocity, self.mu) >= 0:
+            return "Escape"
+
+        if periapsis_radius(position, velocity, self.mu) > self.top_radius:
+            return "Orbit above the atmosphere"
+
+        if self._return_time is None:
+            coast_time, _, _, _ = coast_to_radius(position, velocity, self.top_radius, self.mu)
+            self._return_time = time + float(coast_time)
+        if self._return_time > self.end_time:
+            return "Skip out"
+
+        return None
+
+
+class WallClockBudget(TerminationCriterion):
+    """
+    The run has taken more than `budget` seconds of real time.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self._start = perf_counter()
+
+
+    def start(self):
+        self._start = perf_counter()
+
+
+    def check(self, time, position, velocity):
+        if perf_counter() - self._start > self.budget:
+            return "Wall clock budget exceeded"
+        return None
+
+
+def create_termination_events(config: SimulationConfig, planet: Planet, physics: Physics,
+                              nose_radius: float) -> List[Event]:
+    """
+    The terminal events for the termination conditions switched on in the `termination:` block
+    of the config file that are located exactly within the step (altitude floor, limits).
+    """
+    termination = config.termination
+    events: List[Event] = []
+
+    if termination.minimum_altitude is not None:
+        events.append(AltitudeCrossing(planet, termination.minimum_altitude, direction=-1, terminal=True,
+                                       name="Minimum altitude reached"))
+
+    if termination.max_deceleration is not None:
+        events.append(DecelerationLimit(physics, termination.max_deceleration))
+
+    if termination.max_heating is not None:
+        events.append(HeatingLimit(planet, nose_radius, termination.max_heating))
+
+    return events
+
+
+def create_termination_criteria(config: SimulationConfig, planet: Planet,
+                                rotating_frame: bool = False) -> List[TerminationCriterion]:
+    """
+    The end of step termination criteria switched on in the `termination:` block of the config file.
+    """
+    termination = config.termination
+    criteria: List[TerminationCriterion] = []
+
+    if termination.skip_out:
+        atmosphere_top: Optional[float] = termination.atmosphere_top
+        if atmosphere_top is None:
+            atmosphere_top = config.coast.entry_interface_altitude
+        criteria.append(LeftAtmosphere(planet, atmosphere_top, config.end_time, rotating_frame))
+
+    if termination.wall_clock_budget is not None:
+        criteria.append(WallClockBudget(termination.wall_clock_budget))
+
+    return criteria
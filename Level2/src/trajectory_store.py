@@ -0,0 +1,301 @@
+
+import bisect
+import json
+import os
+
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# The store is a directory with the states in chunk files (plain .npy, so they can be memory
+# mapped) and a small JSON index saying where each trajectory is:
+#
+#   index.json        {"format_version", "columns", "chunks": [{"file", "start", "rows"}],
+#                      "trajectories": [{"offset", "rows", "metadata"}]}
+#   chunk_00000.npy   (rows, 7) float64 states [time, x, y, z, vx, vy, vz]
+#   chunk_00001.npy   ...
+#
+# The states of all the trajectories are one long run of rows split over the chunks, and
+# a trajectory is the `rows` rows starting at row `offset` (it can span chunks).
+
+FORMAT_VERSION = 1
+COLUMNS = ("time", "x", "y", "z", "vx", "vy", "vz")
+INDEX_FILE = "index.json"
+
+
+def _gather(chunks: List[np.ndarray], starts: List[int], offset: int, rows: int) -> np.ndarray:
+    """
+    The rows [offset, offset + rows) of the chunked states. A view into the chunk (memory map)
+    if they are all in one chunk, otherwise a copy joined together from the chunks.
+    """
+    if rows == 0:
+        return np.empty((0, len(COLUMNS)))
+
+    first = bisect.bisect_right(starts, offset) - 1
+    last = bisect.bisect_right(starts, offset + rows - 1) - 1
+
+    if first == last:
+        start = offset - starts[first]
+        return chunks[first][start:start + rows]
+
+    pieces = []
+    for chunk in range(first, last + 1):
+        start = max(offset - starts[chunk], 0)
+        stop = min(offset + rows - starts[chunk], len(chunks[chunk]))
+        pieces.append(chunks[chunk][start:stop])
+
+    return np.concatenate(pieces)
+
+
+class TrajectoryStore:
+    """
+    Read access to a trajectory store written by TrajectoryStoreWriter. The chunks are memory
+    mapped (only opened once they are needed), so opening even a very large store is instant
+    and only the parts that are looked at get read from disk.
+
+    Trajectories are numbered in the order they were written.
+    """
+
+    def __init__(self, path: Path):
+
+        self.path = Path(path)
+        with open(self.path / INDEX_FILE) as f:
+            self.index = json.load(f)
+
+        if self.index.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a trajectory store this version can read.")
+
+        self._starts = [chunk["start"] for chunk in self.index["chunks"]]
+        self._chunks: List[Optional[np.ndarray]] = [None] * len(self.index["chunks"])
+
+
+    def __len__(self) -> int:
+        return len(self.index["trajectories"])
+
+
+    def _chunk(self, number: int) -> np.ndarray:
+
+        if self._chunks[number] is None:
+            chunk = self.index["chunks"][number]
+            self._chunks[number] = np.load(self.path / chunk["file"], mmap_mode="r")[:chunk["rows"]]
+
+        return self._chunks[number]
+
+
+    def metadata(self, trajectory: int) -> dict:
+        return self.index["trajectories"][trajectory]["metadata"]
+
+
+    def states(self, trajectory: int) -> np.ndarray:
+        """
+        The (T, 7) states [time, x, y, z, vx, vy, vz] of a trajectory: a read only memory mapped
+        view if it sits within one chunk, a copy if it spans several.
+        """
+        entry = self.index["trajectories"][trajectory]
+        first = bisect.bisect_right(self._starts, entry["offset"]) - 1
+        last = bisect.bisect_right(self._starts, entry["offset"] + max(entry["rows"], 1) - 1) - 1
+        chunks = [self._chunk(number) if first <= number <= last else None for number in range(len(self._chunks))]
+
+        return _gather(chunks, self._starts, entry["offset"], entry["rows"])
+
+
+    def times(self, trajectory: int) -> np.ndarray:
+        return self.states(trajectory)[:, 0]
+
+    def positions(self, trajectory: int) -> np.ndarray:
+        return self.states(trajectory)[:, 1:4]
+
+    def velocities(self, trajectory: int) -> np.ndarray:
+        return self.states(trajectory)[:, 4:7]
+
+    def trajectories(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        The (times, positions) of every stored trajectory in turn, e.g. for
+        Plotting.plot_ensemble_altitudes.
+        """
+        for trajectory in range(len(self)):
+            states = self.states(trajectory)
+            yield states[:, 0], states[:, 1:4]
+
+
+class TrajectoryStoreWriter:
+    """
+    Writes trajectories into a store as they are being simulated, a block of states at a time,
+    so the whole history never has to fit in memory. Any number of trajectories can go into
+    one store, one after the other:
+
+        writer.begin_trajectory()
+        writer.append(states)   # as many times as needed
+        writer.end_trajectory(termination_reason="Surface Impact")
+        ...
+        writer.close()
+
+    The chunk being filled is a memory mapped .npy file, so appended states go straight to
+    disk. The index is rewritten whenever a trajectory ends or a chunk fills up, so whatever
+    was finished is readable even if the run is interrupted.
+
+    Args:
+        path (Path): directory of the store (created if needed).
+        chunk_rows (int): states per chunk file.
+        append (bool): add to an existing store instead of starting a new one.
+    """
+
+    def __init__(self, path: Path, chunk_rows: int = 65536, append: bool = False):
+
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be a positive integer.")
+
+        self.path = Path(path)
+        self.chunk_rows = chunk_rows
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._chunks: List[np.ndarray] = []
+        self._starts: List[int] = []
+        self.index = {"format_version": FORMAT_VERSION, "columns": list(COLUMNS), "chunks": [], "trajectories": []}
+
+        if append and (self.path / INDEX_FILE).exists():
+            existing = TrajectoryStore(self.path)
+            self.index = existing.index
+            self._starts = list(existing._starts)
+            self._chunks = [existing._chunk(number) for number in range(len(self._starts))]
+        else:
+            for old_file in self.path.glob("chunk_*.npy"):
+                old_file.unlink()
+
+        # Rows written so far, and how many of them the current chunk holds
+        self._total_rows = sum(chunk["rows"] for chunk in self.index["chunks"])
+        self._chunk_used = self.chunk_rows  # no open chunk yet, the first append opens one
+
+        # Whether the last chunk is one this writer opened (and can still write to)
+        self._writing_chunk = False
+
+        self._current: Optional[Dict] = None
+        self._closed = False
+
+
+    def __enter__(self) -> "TrajectoryStoreWriter":
+        return self
+
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+    def __len__(self) -> int:
+        return len(self.index["trajectories"])
+
+
+    def begin_trajectory(self, **metadata) -> int:
+        """
+        Starts a new trajectory, returning its number in the store.
+        """
+        if self._current is not None:
+            raise ValueError("The previous trajectory has to be ended before the next one is started.")
+
+        self._current = {"offset": self._total_rows, "rows": 0, "metadata": dict(metadata)}
+        return len(self.index["trajectories"])
+
+
+    def append(self, states: np.ndarray) -> None:
+        """
+        Adds a (n, 7) block of states on to the end of the current trajectory.
+        """
+        if self._current is None:
+            raise ValueError("begin_trajectory() has to be called before states are appended.")
+
+        written = 0
+        while written < len(states):
+            if self._chunk_used == self.chunk_rows:
+                self._open_chunk(self._total_rows + written)
+
+            count = min(len(states) - written, self.chunk_rows - self._chunk_used)
+            self._chunks[-1][self._chunk_used:self._chunk_used + count] = states[written:written + count]
+
+            self._chunk_used += count
+            self.index["chunks"][-1]["rows"] = self._chunk_used
+            written += count
+
+        self._current["rows"] += len(states)
+        self._total_rows += len(states)
+
+
+    def end_trajectory(self, **metadata) -> int:
+        """
+        Finishes the current trajectory, adding any metadata known only at the end (e.g. why
+        the run stopped). Returns its number in the store.
+        """
+        if self._current is None:
+            raise ValueError("There is no trajectory to end.")
+
+        self._current["metadata"].update(metadata)
+        self.index["trajectories"].append(self._current)
+        self._current = None
+
+        self._write_index()
+        return len(self.index["trajectories"]) - 1
+
+
+    def states(self, trajectory: int) -> np.ndarray:
+        """
+        The (T, 7) states of a trajectory already ended, straight from the chunks.
+        """
+        entry = self.index["trajectories"][trajectory]
+        return _gather(self._chunks, self._starts, entry["offset"], entry["rows"])
+
+
+    def _open_chunk(self, start: int) -> None:
+        """
+        Starts the next chunk file, its first row being row `start` of the store, after
+        flushing the full one to disk.
+        """
+        if self._writing_chunk:
+            self._chunks[-1].flush()
+
+        name = f"chunk_{len(self.index['chunks']):05d}.npy"
+        self._chunks.append(np.lib.format.open_memmap(self.path / name, mode="w+", dtype=np.float64,
+                                                      shape=(self.chunk_rows, len(COLUMNS))))
+        self._starts.append(start)
+        self.index["chunks"].append({"file": name, "start": start, "rows": 0})
+        self._chunk_used = 0
+        self._writing_chunk = True
+
+        self._write_index()
+
+
+    def _write_index(self) -> None:
+        """
+        Rewrites the index, atomically, so a reader never sees half of one.
+        """
+        temporary = self.path / f"{INDEX_FILE}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.index, f)
+        os.replace(temporary, self.path / INDEX_FILE)
+
+
+    def close(self) -> None:
+        """
+        Flushes everything to disk and trims the last chunk file down to the rows it holds.
+        States already handed out stay readable.
+        """
+        if self._closed:
+            return
+        if self._current is not None:
+            self.end_trajectory()
+
+        if self._writing_chunk and self._chunk_used < self.chunk_rows:
+            last = self.index["chunks"][-1]
+            used = np.array(self._chunks[-1][:self._chunk_used])
+
+            temporary = self.path / f"{last['file']}.tmp"
+            with open(temporary, "wb") as f:
+                np.save(f, used)
+            os.replace(temporary, self.path / last["file"])
+            self._chunks[-1] = np.load(self.path / last["file"], mmap_mode="r")
+        elif self._writing_chunk:
+            self._chunks[-1].flush()
+
+        self._writing_chunk = False
+        self._write_index()
+        self._closed = True
@@ -0,0 +1,89 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.config.configuration_manager import ConfigurationManager
+from src.spacecraft import Spacecraft
+from src.planet import Planet
+from src.physics import Physics
+from src.simulation import Simulation
+
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config" / "config.yaml"
+
+
+class Killed(Exception):
+    """
+    Stands in for the process being killed part way through a run.
+    """
+
+
+def build_simulation(integrator: str, checkpoint_file=None) -> Simulation:
+    """
+    An inclined entry from 100 km down to the surface, with every step stored and, with a
+    checkpoint file, checkpointed after every step.
+    """
+    config = ConfigurationManager(CONFIG_FILE)
+    config.spacecraft.position = [config.planet.radius + 100000.0, 0.0, 0.0]
+    config.spacecraft.velocity = [-2000.0, 7000.0, 1000.0]
+    config.spacecraft.mass = 10000.0
+    config.simulation.time_step_size = 0.05
+    config.simulation.integrator.type = integrator
+    config.simulation.events.peak_deceleration = True
+    config.simulation.output.save_frequency = 1
+    config.simulation.checkpoint.file = None if checkpoint_file is None else str(checkpoint_file)
+    config.simulation.checkpoint.interval = 1e-12
+
+    spacecraft = Spacecraft(config.spacecraft)
+    planet = Planet(config.planet)
+    physics = Physics(config.physics, planet, spacecraft)
+    return Simulation(config.simulation,
+                      spacecraft = spacecraft,
+                      planet = planet,
+                      physics = physics)
+
+
+@pytest.mark.parametrize("integrator", ["RK4", "DOPRI45"])
+def test_killed_and_resumed_run_matches_uninterrupted_run(integrator, tmp_path, monkeypatch):
+
+    reference = build_simulation(integrator)
+    reference.run()
+
+    # Killed about half way, every step being stored and checkpointed
+    kill_after = len(reference.get_times()) // 2
+    checkpoint_file = tmp_path / "checkpoint.npz"
+    save_checkpoint = Simulation._save_checkpoint
+    restore_checkpoint = Simulation._restore_checkpoint
+    saves = []
+    restored = []
+
+    def save_then_kill(self, *args):
+        saves.append(args[0])
+        save_checkpoint(self, *args)
+        if len(saves) == kill_after:
+            raise Killed()
+
+    def record_restore(self, checkpoint):
+        restored.append(checkpoint)
+        return restore_checkpoint(self, checkpoint)
+
+    monkeypatch.setattr(Simulation, "_save_checkpoint", save_then_kill)
+    with pytest.raises(Killed):
+        build_simulation(integrator, checkpoint_file).run()
+    assert checkpoint_file.exists()
+
+    # Started again from scratch, it picks up from the checkpoint
+    monkeypatch.setattr(Simulation, "_save_checkpoint", save_checkpoint)
+    monkeypatch.setattr(Simulation, "_restore_checkpoint", record_restore)
+    resumed = build_simulation(integrator, checkpoint_file)
+    resumed.run()
+
+    assert len(restored) == 1
+    assert not checkpoint_file.exists()
+    assert resumed.get_termination_reason() == reference.get_termination_reason() == "Surface Impact"
+    assert np.array_equal(resumed.get_times(), reference.get_times())
+    assert np.array_equal(resumed.get_trajectory(), reference.get_trajectory())
+    assert np.array_equal(resumed.get_velocities(), reference.get_velocities())
+    assert ([(event.name, event.time, event.value) for event in resumed.get_events()] ==
+            [(event.name, event.time, event.value) for event in reference.get_events()])
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import numpy as np
+
+from src.config.configuration_manager import ConfigurationManager
+from src.spacecraft import Spacecraft
+from src.planet import Planet
+from src.physics import Physics
+from src.simulation import Simulation
+
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config" / "config.yaml"
+
+
+def run_entry(time_step_size: float) -> Simulation:
+    """
+    A heavy entry from 100 km straight down, which hits the surface within seconds, so even
+    a fine step reference is quick to run.
+    """
+    config = ConfigurationManager(CONFIG_FILE)
+    config.spacecraft.position = [config.planet.radius + 100000.0, 0.0, 0.0]
+    config.spacecraft.velocity = [-8000.0, 0.0, 0.0]
+    config.spacecraft.mass = 10000.0
+    config.simulation.time_step_size = time_step_size
+    config.simulation.integrator.type = "RK4"
+    config.simulation.events.altitude_crossings = [50000.0]
+
+    spacecraft = Spacecraft(config.spacecraft)
+    planet = Planet(config.planet)
+    physics = Physics(config.physics, planet, spacecraft)
+    simulation = Simulation(config.simulation,
+                            spacecraft = spacecraft,
+                            planet = planet,
+                            physics = physics)
+    simulation.run()
+
+    return simulation
+
+
+def event_times(simulation: Simulation) -> dict:
+    return {event.name: event.time for event in simulation.get_events()}
+
+
+def test_impact_time_matches_fine_step_reference():
+
+    coarse = run_entry(0.5)
+    reference = run_entry(0.002)
+
+    coarse_times = event_times(coarse)
+    reference_times = event_times(reference)
+
+    # The event times are root found on the step, so they dont depend on the step size
+    assert set(coarse_times) == {"Surface Impact", "Altitude crossing 50000 m"}
+    for name, time in reference_times.items():
+        assert abs(coarse_times[name] - time) < 1e-5
+
+    # The run ends at the impact, exactly on the surface
+    impact = coarse.get_events()[-1]
+    assert impact.name == "Surface Impact"
+    assert coarse.get_times()[-1] == impact.time
+    assert abs(np.linalg.norm(coarse.get_trajectory()[-1]) - coarse.planet.radius) < 1e-3
+
+
+def test_impact_is_not_a_step_boundary():
+
+    simulation = run_entry(0.5)
+    impact = simulation.get_events()[-1]
+
+    # Without root finding the impact would be at the end of the step it happens in
+    assert impact.time % 0.5 > 1e-6
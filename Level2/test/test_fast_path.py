@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.config.configuration_manager import ConfigurationManager
+from src.integrators import FastRungeKutta4Integrator
+from src.spacecraft import Spacecraft
+from src.planet import Planet
+from src.physics import Physics
+from src.simulation import Simulation
+
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config" / "config.yaml"
+
+
+def run_entry(fast_path: bool, velocity, atmosphere: str) -> Simulation:
+    """
+    An entry from 100 km, down to the surface, with every step stored.
+    """
+    config = ConfigurationManager(CONFIG_FILE)
+    config.spacecraft.position = [config.planet.radius + 100000.0, 0.0, 0.0]
+    config.spacecraft.velocity = velocity
+    config.spacecraft.mass = 10000.0
+    config.planet.atmospheric_model = atmosphere
+    config.simulation.time_step_size = 0.01
+    config.simulation.integrator.type = "RK4"
+    config.simulation.integrator.fast_path = fast_path
+    config.simulation.output.save_frequency = 1
+
+    spacecraft = Spacecraft(config.spacecraft)
+    planet = Planet(config.planet)
+    physics = Physics(config.physics, planet, spacecraft)
+    simulation = Simulation(config.simulation,
+                            spacecraft = spacecraft,
+                            planet = planet,
+                            physics = physics)
+    assert isinstance(simulation.integrator, FastRungeKutta4Integrator) == fast_path
+    simulation.run()
+
+    return simulation
+
+
+@pytest.mark.parametrize("velocity", [[-8000.0, 0.0, 0.0], [-2000.0, 7000.0, 1000.0]], ids=["radial", "inclined"])
+@pytest.mark.parametrize("atmosphere", ["exponential_decay", "us_standard_1976"])
+def test_fast_path_matches_array_path_bit_for_bit(velocity, atmosphere):
+
+    fast = run_entry(True, velocity, atmosphere)
+    array = run_entry(False, velocity, atmosphere)
+
+    assert np.array_equal(fast.get_times(), array.get_times())
+    assert np.array_equal(fast.get_trajectory(), array.get_trajectory())
+    assert np.array_equal(fast.get_velocities(), array.get_velocities())
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from src.dispersion import impact_latitude_longitude as dispersion_latitude_longitude
+from src.geodesy import (EARTH_ROTATION_RATE, WGS84_FLATTENING, WGS84_SEMI_MAJOR_AXIS,
+                         impact_latitude_longitude)
+
+
+EARTH_RADIUS = 6371000.0
+SIDEREAL_DAY = 86164.0905  # seconds
+
+
+def test_rotation_rate_is_sidereal():
+
+    assert 2 * np.pi / EARTH_ROTATION_RATE == pytest.approx(SIDEREAL_DAY, abs=0.01)
+
+
+def test_x_axis_is_longitude_zero_when_the_frames_line_up():
+
+    latitude, longitude = impact_latitude_longitude(np.array([EARTH_RADIUS, 0.0, 0.0]), 0.0)
+
+    assert latitude == 0.0
+    assert longitude == 0.0
+
+
+@pytest.mark.parametrize("convert", [impact_latitude_longitude, dispersion_latitude_longitude],
+                         ids=["geodesy", "dispersion"])
+def test_x_axis_drifts_west_a_quarter_sidereal_day_later(convert):
+
+    # The Earth turns east under the simulation frame, so a fixed point of the frame drifts west
+    latitude, longitude = convert(np.array([EARTH_RADIUS, 0.0, 0.0]), SIDEREAL_DAY / 4)
+
+    assert latitude == pytest.approx(0.0, abs=1e-9)
+    assert longitude == pytest.approx(-90.0, abs=1e-6)
+
+
+def test_dispersion_uses_the_rotation_rate_it_is_given():
+
+    # Ten times as fast, a tenth of the time it takes the Earth to turn half way round
+    half_turn = np.pi / EARTH_ROTATION_RATE
+    _, longitude = dispersion_latitude_longitude(np.array([EARTH_RADIUS, 0.0, 0.0]), half_turn / 10,
+                                                 rotation_rate=10 * EARTH_ROTATION_RATE)
+
+    assert abs(longitude) == pytest.approx(180.0, abs=1e-9)
+
+
+def on_ellipsoid(latitude: float, longitude: float, height: float = 0.0) -> np.ndarray:
+    """
+    The Earth fixed position of a geodetic latitude, longitude (degrees) and height (m).
+    """
+    eccentricity_squared = WGS84_FLATTENING * (2 - WGS84_FLATTENING)
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    prime_vertical_radius = WGS84_SEMI_MAJOR_AXIS / np.sqrt(1 - eccentricity_squared * np.sin(latitude)**2)
+
+    return np.array([(prime_vertical_radius + height) * np.cos(latitude) * np.cos(longitude),
+                     (prime_vertical_radius + height) * np.cos(latitude) * np.sin(longitude),
+                     (prime_vertical_radius * (1 - eccentricity_squared) + height) * np.sin(latitude)])
+
+
+@pytest.mark.parametrize("position, latitude, longitude",
+                         [([WGS84_SEMI_MAJOR_AXIS, 0.0, 0.0], 0.0, 0.0),
+                          ([0.0, -WGS84_SEMI_MAJOR_AXIS, 0.0], 0.0, -90.0),
+                          ([0.0, 0.0, WGS84_SEMI_MAJOR_AXIS * (1 - WGS84_FLATTENING)], 90.0, None),
+                          (on_ellipsoid(45.0, 30.0), 45.0, 30.0),
+                          (on_ellipsoid(-33.9, 151.2, 58.0), -33.9, 151.2),
+                          (on_ellipsoid(51.4779, -0.0015, 10000.0), 51.4779, -0.0015)],
+                         ids=["equator", "equator_west", "north_pole", "45N", "sydney", "greenwich_10km"])
+def test_wgs84_geodetic_latitude_at_known_points(position, latitude, longitude):
+
+    found_latitude, found_longitude = impact_latitude_longitude(np.asarray(position), 0.0, geodetic=True)
+
+    assert found_latitude == pytest.approx(latitude, abs=1e-9)
+    if longitude is not None:
+        assert found_longitude == pytest.approx(longitude, abs=1e-9)
+
+
+def test_geodetic_and_geocentric_latitude_differ_by_the_flattening():
+
+    # At 45 degrees geodetic the geocentric latitude is atan((1 - e^2) tan 45) = 44.80757 degrees
+    geocentric, _ = impact_latitude_longitude(on_ellipsoid(45.0, 0.0), 0.0)
+
+    assert geocentric == pytest.approx(44.80757, abs=1e-5)
+
+
+@pytest.mark.parametrize("geodetic", [False, True])
+@pytest.mark.parametrize("obliquity", [0.0, 23.5])
+def test_vectorized_path_matches_one_point_at_a_time(geodetic, obliquity):
+
+    rng = np.random.default_rng(0)
+    directions = rng.normal(size=(200, 3))
+    positions = EARTH_RADIUS * directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    times = rng.uniform(0.0, 3 * SIDEREAL_DAY, 200)
+
+    latitudes, longitudes = impact_latitude_longitude(positions, times, obliquity=obliquity, geodetic=geodetic)
+
+    assert latitudes.shape == longitudes.shape == (200,)
+    for position, time_elapsed, latitude, longitude in zip(positions, times, latitudes, longitudes):
+        single_latitude, single_longitude = impact_latitude_longitude(position, time_elapsed,
+                                                                      obliquity=obliquity, geodetic=geodetic)
+        assert single_latitude == pytest.approx(latitude, abs=1e-12)
+        assert single_longitude == pytest.approx(longitude, abs=1e-12)
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+import yaml
+
+from src.config.overrides import apply_setting, merge_settings
+
+
+CONFIG_FILE = Path(__file__).resolve().parent.parent / "config" / "config.yaml"
+
+
+@pytest.fixture
+def raw_config() -> dict:
+    with open(CONFIG_FILE) as f:
+        return yaml.safe_load(f)
+
+
+def test_settings_in_the_file_and_optional_ones_can_be_set(raw_config):
+
+    apply_setting(raw_config, "simulation.end_time", 2000)
+    apply_setting(raw_config, "spacecraft.initial_state.position.0", 7100000.0)
+    apply_setting(raw_config, "simulation.integrator.max_step_size", 60)  # commented out in the file
+    apply_setting(raw_config, "dispersion.perturbations.cross_sectional_area.half_width", 0.1)
+
+    assert raw_config["simulation"]["end_time"] == 2000
+    assert raw_config["spacecraft"]["initial_state"]["position"][0] == 7100000.0
+    assert raw_config["simulation"]["integrator"]["max_step_size"] == 60
+    assert raw_config["dispersion"]["perturbations"]["cross_sectional_area"] == {"half_width": 0.1}
+
+
+@pytest.mark.parametrize("path", ["simulation.end_tme", "simulation.integrator.tpye", "planet.atmosphere.scale_hieght"])
+def test_misspelled_setting_is_rejected(raw_config, path):
+
+    with pytest.raises(ValueError, match="not a setting of the config file"):
+        apply_setting(raw_config, path, 1)
+
+
+def test_settings_of_a_new_section_are_checked(raw_config):
+
+    del raw_config["cache"]
+    apply_setting(raw_config, "cache.enabled", True)
+    assert raw_config["cache"] == {"enabled": True}
+
+    with pytest.raises(ValueError, match="cache.enabeld"):
+        apply_setting(raw_config, "cache.enabeld", True)
+
+
+def test_override_files_are_checked_the_same_way(raw_config):
+
+    del raw_config["cache"]
+    merged = merge_settings(raw_config, {"cache": {"enabled": True}, "simulation": {"end_time": 10}})
+    assert merged["cache"] == {"enabled": True}
+    assert merged["simulation"]["end_time"] == 10
+
+    with pytest.raises(ValueError, match="simulation.integrator.tpye"):
+        merge_settings(raw_config, {"simulation": {"integrator": {"tpye": "RK4"}}})
+    with pytest.raises(ValueError, match="cache.enabeld"):
+        merge_settings(raw_config, {"cache": {"enabeld": True}})